@@ -0,0 +1,273 @@
+"""
+Precomputed soil x season x location table for /advise-crop.
+
+The advisory inputs are small categorical spaces: a handful of soil types,
+three seasons and a bounded list of districts. An offline batch job asks
+Gemini once for every combination, validates each answer, and stores it in
+advisory_matrix.db (SQLite, one zlib-compressed JSON row per combination).
+The API loads the table into a dict at startup, so a lookup is one hash
+probe. A combination that isn't in the table is generated live, and a
+valid answer is written back if it is a listed soil, season and district,
+so the next request for it is a lookup too. Other inputs (free text,
+typos, "unknown") are answered live but not stored, so the table stays
+bounded by soils x seasons x districts.
+
+    python advisory_matrix.py build                # every soil x season x district, resumable
+    python advisory_matrix.py build --districts my_districts.txt --rpm 30
+    python advisory_matrix.py stats
+
+The build uses PRITHVI_LLM_BACKEND (llm_backend.py) like the API, so
+PRITHVI_LLM_BACKEND=replay runs it offline; the live backend needs
+GOOGLE_API_KEY.
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(BASE_DIR, "advisory_matrix.db")
+DEFAULT_DISTRICTS = os.path.join(BASE_DIR, "advisory_districts.txt")
+
+SOILS = ["Black", "Red", "Alluvial", "Clay", "Loamy", "Sandy", "Laterite"]
+SEASONS = ["Kharif", "Rabi", "Zaid"]
+SEASON_ALIASES = {"monsoon": "kharif", "winter": "rabi", "summer": "zaid"}
+KNOWN_SOILS = {soil.lower() for soil in SOILS}
+KNOWN_SEASONS = {season.lower() for season in SEASONS}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS advisory (
+    soil       TEXT NOT NULL,
+    season     TEXT NOT NULL,
+    location   TEXT NOT NULL,
+    payload    BLOB NOT NULL,
+    origin     TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (soil, season, location)
+) WITHOUT ROWID;
+"""
+
+
+def normalize(soil: str, season: str, location: str) -> tuple:
+    """('black', 'kharif', 'nagpur, maharashtra') from 'Black', 'Kharif (Monsoon)', ' Nagpur,Maharashtra '."""
+    soil_words = re.findall(r"[a-z]+", str(soil or "").lower())
+    soil_key = soil_words[0] if soil_words else "unknown"
+    season_words = [SEASON_ALIASES.get(w, w) for w in re.findall(r"[a-z]+", str(season or "").lower())]
+    season_key = next((w for w in season_words if w in ("kharif", "rabi", "zaid")),
+                      season_words[0] if season_words else "unknown")
+    parts = [" ".join(p.split()) for p in str(location or "india").lower().split(",")]
+    parts = [p for p in parts if p]
+    if len(parts) > 1 and parts[-1] == "india":
+        parts.pop()
+    return soil_key, season_key, ", ".join(parts) or "india"
+
+
+def validate(advisory) -> list:
+    """Problems that keep an answer out of the table (empty list = valid)."""
+    if not isinstance(advisory, dict):
+        return ["not an object"]
+    recs = advisory.get("recommendations")
+    if not isinstance(recs, list) or not recs:
+        return ["no recommendations"]
+    problems = []
+    for i, rec in enumerate(recs):
+        if not isinstance(rec, dict) or not rec.get("name"):
+            problems.append(f"recommendation {i}: no name")
+            continue
+        suitability = rec.get("suitability")
+        if not isinstance(suitability, (int, float)) or not 0 <= suitability <= 100:
+            problems.append(f"recommendation {i}: suitability {suitability!r}")
+        if rec.get("marketTrend") not in ("Up", "Down", "Stable"):
+            problems.append(f"recommendation {i}: marketTrend {rec.get('marketTrend')!r}")
+        if rec.get("waterRequirement") not in ("Low", "Medium", "High"):
+            problems.append(f"recommendation {i}: waterRequirement {rec.get('waterRequirement')!r}")
+    for key in ("seasonalTips", "warnings"):
+        if not isinstance(advisory.get(key), str):
+            problems.append(f"{key} missing")
+    return problems
+
+
+class AdvisoryMatrix:
+    def __init__(self, db_path: str = DEFAULT_DB, districts_path: str = DEFAULT_DISTRICTS):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+        # District name alone ("nagpur") -> the listed "nagpur, maharashtra".
+        self.districts = {}
+        for location in load_districts(districts_path):
+            key = normalize("", "", location)[2]
+            self.districts.setdefault(key.split(",")[0], key)
+        self.locations = set(self.districts.values())
+        self.table = {}
+        unlisted = []
+        for soil, season, location, payload, origin in self._connect().execute(
+            "SELECT soil, season, location, payload, origin FROM advisory"
+        ):
+            if origin == "live" and not self.known((soil, season, location)):
+                unlisted.append((soil, season, location))  # written back before keys were checked
+            else:
+                self.table[(soil, season, location)] = payload
+        if unlisted:
+            self._connect().executemany(
+                "DELETE FROM advisory WHERE soil = ? AND season = ? AND location = ? AND origin = 'live'", unlisted
+            )
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def key(self, soil: str, season: str, location: str) -> tuple:
+        soil_key, season_key, location_key = normalize(soil, season, location)
+        return soil_key, season_key, self.districts.get(location_key, location_key)
+
+    def known(self, key: tuple) -> bool:
+        """Whether a normalized key is a listed soil x season x district combination."""
+        soil, season, location = key
+        return soil in KNOWN_SOILS and season in KNOWN_SEASONS and location in self.locations
+
+    def get(self, soil: str, season: str, location: str):
+        key = self.key(soil, season, location)
+        payload = self.table.get(key)
+        if payload is None:
+            # Written back by another worker since this one loaded the table?
+            row = self._connect().execute(
+                "SELECT payload FROM advisory WHERE soil = ? AND season = ? AND location = ?", key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            payload = self.table[key] = row[0]
+        self.hits += 1
+        return json.loads(zlib.decompress(payload))
+
+    def put(self, soil: str, season: str, location: str, advisory: dict, origin: str = "live") -> bool:
+        """
+        Store a validated answer; returns False (and stores nothing) if it
+        doesn't validate, or if a live answer isn't for a listed combination.
+        """
+        if validate(advisory):
+            return False
+        key = self.key(soil, season, location)
+        if origin == "live" and not self.known(key):
+            return False
+        payload = zlib.compress(json.dumps(advisory, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), 9)
+        self._connect().execute(
+            "INSERT OR REPLACE INTO advisory (soil, season, location, payload, origin, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (*key, payload, origin, time.time()),
+        )
+        self.table[key] = payload
+        return True
+
+    def stats(self) -> dict:
+        rows = self._connect().execute(
+            "SELECT origin, COUNT(*), SUM(LENGTH(payload)) FROM advisory GROUP BY origin"
+        ).fetchall()
+        return {
+            "entries": {origin: count for origin, count, _ in rows},
+            "payload_kb": round(sum(size or 0 for _, _, size in rows) / 1024, 1),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+
+def load_districts(path: str) -> list:
+    if not os.path.exists(path):
+        return ["India"]
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+# ----- offline batch build -----
+
+def build(args):
+    from gemini_scheduler import GeminiScheduler
+    from llm_backend import create_llm
+    from prompts import render, generation_config
+
+    backend = os.environ.get("PRITHVI_LLM_BACKEND", "gemini")
+    if backend == "gemini":
+        import google.generativeai as genai
+        genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+    model = create_llm(backend, args.model, {"temperature": 0.4, "max_output_tokens": 8192})
+
+    matrix = AdvisoryMatrix(args.db, args.districts)
+    combos = [(soil, season, location) for location in load_districts(args.districts)
+              for soil in args.soils for season in SEASONS]
+    todo = [c for c in combos if matrix.key(*c) not in matrix.table]
+    print(f"🧮 {len(combos)} combinations, {len(combos) - len(todo)} already built, {len(todo)} to generate")
+
+    # One batch class: no practical deadline or queue cap, just the quota.
+    scheduler = GeminiScheduler(args.rpm, concurrency=args.concurrency, classes={
+        "batch": {"priority": 0, "deadline": 7 * 24 * 3600.0, "max_queue": len(todo) + 1, "share": 1.0},
+    })
+
+    def generate(soil: str, season: str, location: str):
+        prompt = render("advise_crop", soil=soil, season=season, location=location)
+        problems = []
+        for _ in range(args.attempts):
+            try:
+                response = model.generate_content(prompt, generation_config=generation_config("advise_crop"))
+                advisory = json.loads(response.text)
+            except Exception as e:
+                problems = [f"{type(e).__name__}: {e}"]
+                continue
+            problems = validate(advisory)
+            if not problems:
+                matrix.put(soil, season, location, advisory, origin="batch")
+                return None
+        return problems
+
+    start = time.time()
+    futures = [(combo, scheduler.submit("batch", generate, *combo)) for combo in todo]
+    failed = 0
+    for i, (combo, future) in enumerate(futures, 1):
+        problems = future.result()
+        if problems:
+            failed += 1
+            print(f"⚠️ {' / '.join(combo)}: {'; '.join(problems[:3])}")
+        if i % 50 == 0 or i == len(futures):
+            print(f"   {i}/{len(futures)} done ({time.time() - start:.0f}s, {failed} failed)")
+    scheduler.close()
+    print(f"✅ {len(matrix)} combinations in {args.db}: {matrix.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="generate every missing soil x season x district combination")
+    b.add_argument("--districts", default=DEFAULT_DISTRICTS)
+    b.add_argument("--soils", nargs="+", default=SOILS)
+    b.add_argument("--rpm", type=float, default=60, help="Gemini requests per minute")
+    b.add_argument("--concurrency", type=int, default=4)
+    b.add_argument("--attempts", type=int, default=2, help="tries per combination before giving up")
+    b.add_argument("--model", default="gemini-3-flash-preview")
+    b.add_argument("--db", default=DEFAULT_DB)
+    s = sub.add_parser("stats", help="entry counts and size")
+    s.add_argument("--db", default=DEFAULT_DB)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(args)
+    else:
+        matrix = AdvisoryMatrix(args.db)
+        print(json.dumps({"combinations": len(matrix), **matrix.stats()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
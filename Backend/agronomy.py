@@ -0,0 +1,383 @@
+"""
+Rules engine for the quantitative half of the execution plan.
+
+Seed quantity, the N-P-K dose converted into Urea / DAP / MOP bags, the
+split schedule and the critical irrigation and pest windows are plain
+arithmetic over per-acre package-of-practice numbers. They are computed
+here in microseconds, exactly, for any land size, instead of asking
+Gemini to do sums. Gemini only writes the narrative (limiting factor,
+variety and per-stage tips), which depends on crop, soil and water but
+not on land size or sowing date, so main.py caches it per combination.
+
+Per-acre figures are ICAR / state-university recommendations converted
+from per-hectare values (1 ha = 2.47 acres), rounded.
+"""
+import datetime
+import re
+
+# Nutrient content of the straight fertilizers the plan is written in.
+UREA_N = 0.46
+DAP_N, DAP_P2O5 = 0.18, 0.46
+MOP_K2O = 0.60
+BAG_KG = {"Urea": 45, "DAP": 50, "MOP": 50}
+
+# seed_kg: per acre. npk: kg N, P2O5, K2O per acre. yield_qtl: per-acre
+# potential under good management. n_split / k_split: (day, fraction) from
+# sowing. irrigation / pests: (day, stage). harvest: (first day, last day).
+CROPS = {
+    "rice": {
+        "aliases": ["paddy", "dhan", "chawal"],
+        "seed_kg": 16, "seed_note": "nursery for transplanting; treat with Carbendazim 2 g/kg",
+        "varieties": "Pusa Basmati 1509, MTU 1010, Swarna",
+        "npk": (48, 24, 16), "n_split": [(0, 0.5), (25, 0.25), (50, 0.25)], "k_split": [(0, 1.0)],
+        "micronutrients": {"Zinc Sulphate (21% Zn)": 10},
+        "yield_qtl": 24,
+        "irrigation": [(20, "Tillering"), (55, "Panicle Initiation"), (80, "Flowering"), (95, "Grain Filling")],
+        "pests": [(30, "Stem borer and leaf folder"), (70, "Brown plant hopper and blast")],
+        "harvest": (120, 135),
+    },
+    "wheat": {
+        "aliases": ["gehu", "gehun", "gahu"],
+        "seed_kg": 40, "seed_note": "line sowing at 20 cm; treat with Thiram 2.5 g/kg",
+        "varieties": "HD 2967, HD 3086, GW 322",
+        "npk": (48, 24, 16), "n_split": [(0, 0.5), (21, 0.25), (45, 0.25)], "k_split": [(0, 1.0)],
+        "micronutrients": {"Zinc Sulphate (21% Zn)": 10},
+        "yield_qtl": 20,
+        "irrigation": [(21, "Crown Root Initiation"), (45, "Tillering"), (65, "Jointing"),
+                       (85, "Flowering"), (105, "Dough Stage")],
+        "pests": [(35, "Aphids and termites"), (75, "Yellow rust")],
+        "harvest": (120, 140),
+    },
+    "maize": {
+        "aliases": ["corn", "makka", "makki", "bhutta"],
+        "seed_kg": 8, "seed_note": "60 x 20 cm spacing; treat with Thiram 3 g/kg",
+        "varieties": "DHM 117, NK 6240, Pioneer 3396",
+        "npk": (60, 30, 20), "n_split": [(0, 0.3), (25, 0.4), (50, 0.3)], "k_split": [(0, 1.0)],
+        "micronutrients": {"Zinc Sulphate (21% Zn)": 10},
+        "yield_qtl": 24,
+        "irrigation": [(25, "Knee High"), (50, "Tasseling"), (60, "Silking"), (80, "Grain Filling")],
+        "pests": [(20, "Fall armyworm in whorls"), (45, "Stem borer")],
+        "harvest": (95, 110),
+    },
+    "cotton": {
+        "aliases": ["kapas", "narma"],
+        "seed_kg": 0.9, "seed_note": "two 450 g Bt hybrid packets; plant refuge rows as supplied",
+        "varieties": "RCH 659 BG-II, Ajeet 155 BG-II",
+        "npk": (48, 24, 24), "n_split": [(0, 0.2), (30, 0.4), (60, 0.4)], "k_split": [(0, 0.5), (60, 0.5)],
+        "micronutrients": {"Magnesium Sulphate": 10, "Borax": 2},
+        "yield_qtl": 10,
+        "irrigation": [(45, "Square Formation"), (75, "Flowering"), (105, "Boll Development")],
+        "pests": [(35, "Sucking pests (jassid, whitefly)"), (70, "Pink bollworm (set pheromone traps)")],
+        "harvest": (160, 180),
+    },
+    "soybean": {
+        "aliases": ["soya", "soyabean"],
+        "seed_kg": 30, "seed_note": "treat with Rhizobium + PSB culture 5 g/kg after fungicide",
+        "varieties": "JS 20-34, JS 95-60, NRC 37",
+        "npk": (8, 24, 16), "n_split": [(0, 1.0)], "k_split": [(0, 1.0)],
+        "micronutrients": {"Sulphur (Bentonite 90%)": 8},
+        "yield_qtl": 10,
+        "irrigation": [(40, "Flowering"), (65, "Pod Filling")],
+        "pests": [(25, "Girdle beetle and stem fly"), (50, "Defoliators and semilooper")],
+        "harvest": (95, 105),
+    },
+    "tomato": {
+        "aliases": ["tamatar"],
+        "seed_kg": 0.06, "seed_note": "hybrid seed for nursery; transplant 25-day seedlings",
+        "varieties": "Arka Rakshak, Abhinav, Pusa Rohini",
+        "npk": (72, 40, 48), "n_split": [(0, 0.34), (30, 0.33), (60, 0.33)], "k_split": [(0, 0.5), (45, 0.5)],
+        "micronutrients": {"Borax": 4, "Calcium Nitrate": 10},
+        "yield_qtl": 120,
+        "irrigation": [(20, "Establishment"), (45, "Flowering"), (70, "Fruit Set"), (90, "Fruit Development")],
+        "pests": [(30, "Whitefly (leaf curl virus vector)"), (60, "Fruit borer and early blight")],
+        "harvest": (75, 140),
+    },
+    "potato": {
+        "aliases": ["aloo", "alu"],
+        "seed_kg": 1200, "seed_note": "30-40 g whole seed tubers, sprouted; treat with Mancozeb dip",
+        "varieties": "Kufri Jyoti, Kufri Pukhraj, Kufri Chipsona-1",
+        "npk": (72, 32, 40), "n_split": [(0, 0.5), (30, 0.5)], "k_split": [(0, 1.0)],
+        "micronutrients": {"Zinc Sulphate (21% Zn)": 10},
+        "yield_qtl": 100,
+        "irrigation": [(10, "Sprouting"), (30, "Stolon Formation"), (45, "Tuber Initiation"), (65, "Tuber Bulking")],
+        "pests": [(40, "Aphids (virus vector)"), (55, "Late blight in cool humid weather")],
+        "harvest": (90, 110),
+    },
+    "onion": {
+        "aliases": ["pyaz", "pyaaz", "kanda"],
+        "seed_kg": 3, "seed_note": "nursery; transplant 6-week seedlings at 15 x 10 cm",
+        "varieties": "Bhima Super, Agrifound Light Red, N-53",
+        "npk": (40, 20, 20), "n_split": [(0, 0.5), (30, 0.25), (45, 0.25)], "k_split": [(0, 1.0)],
+        "micronutrients": {"Sulphur (Bentonite 90%)": 12},
+        "yield_qtl": 100,
+        "irrigation": [(15, "Establishment"), (45, "Bulb Initiation"), (75, "Bulb Development")],
+        "pests": [(35, "Thrips"), (60, "Purple blotch")],
+        "harvest": (110, 130),
+    },
+    "chilli": {
+        "aliases": ["chili", "mirch", "mirchi", "chilly"],
+        "seed_kg": 0.2, "seed_note": "hybrid seed for nursery; transplant 35-day seedlings",
+        "varieties": "Guntur Sannam (Teja), Pusa Jwala, Arka Meghana",
+        "npk": (48, 24, 24), "n_split": [(0, 0.34), (30, 0.33), (60, 0.33)], "k_split": [(0, 0.5), (60, 0.5)],
+        "micronutrients": {"Borax": 4},
+        "yield_qtl": 10,
+        "irrigation": [(20, "Establishment"), (50, "Flowering"), (80, "Fruit Development")],
+        "pests": [(30, "Thrips and mites (leaf curl)"), (75, "Fruit borer and anthracnose")],
+        "harvest": (120, 180),
+    },
+    "sugarcane": {
+        "aliases": ["sugar cane", "ganna", "oos", "kabbu"],
+        "seed_kg": 3000, "seed_note": "about 16,000 three-bud setts; dip in Carbendazim 0.1%",
+        "varieties": "Co 86032, Co 0238, CoM 0265",
+        "npk": (100, 46, 46), "n_split": [(0, 0.2), (45, 0.4), (90, 0.4)], "k_split": [(0, 0.5), (90, 0.5)],
+        "micronutrients": {"Zinc Sulphate (21% Zn)": 10, "Ferrous Sulphate": 10},
+        "yield_qtl": 400,
+        "irrigation": [(30, "Germination"), (90, "Tillering"), (150, "Grand Growth"), (240, "Maturity")],
+        "pests": [(60, "Early shoot borer"), (150, "Top borer and woolly aphid")],
+        "harvest": (330, 365),
+    },
+    "groundnut": {
+        "aliases": ["peanut", "moongfali", "shenga"],
+        "seed_kg": 40, "seed_note": "kernels; treat with Trichoderma 4 g/kg and Rhizobium",
+        "varieties": "TG 37A, Kadiri Lepakshi, GJG 32",
+        "npk": (8, 16, 16), "n_split": [(0, 1.0)], "k_split": [(0, 1.0)],
+        "micronutrients": {"Gypsum": 200},
+        "yield_qtl": 10,
+        "irrigation": [(30, "Flowering"), (50, "Pegging"), (75, "Pod Development")],
+        "pests": [(30, "Leaf miner and thrips"), (60, "Tikka leaf spot")],
+        "harvest": (100, 120),
+    },
+    "mustard": {
+        "aliases": ["sarson", "rai", "rapeseed"],
+        "seed_kg": 2, "seed_note": "thin to 15 cm plant spacing at 20 days",
+        "varieties": "Pusa Bold, RH 749, Giriraj",
+        "npk": (32, 16, 16), "n_split": [(0, 0.5), (30, 0.5)], "k_split": [(0, 1.0)],
+        "micronutrients": {"Sulphur (Bentonite 90%)": 16},
+        "yield_qtl": 8,
+        "irrigation": [(30, "Branching"), (60, "Flowering"), (85, "Pod Filling")],
+        "pests": [(50, "Aphids"), (70, "White rust and Alternaria blight")],
+        "harvest": (110, 140),
+    },
+    "chickpea": {
+        "aliases": ["chana", "gram", "bengal gram"],
+        "seed_kg": 30, "seed_note": "treat with Rhizobium + Trichoderma; sow 30 cm rows",
+        "varieties": "JG 11, Pusa 256, JAKI 9218",
+        "npk": (8, 16, 8), "n_split": [(0, 1.0)], "k_split": [(0, 1.0)],
+        "micronutrients": {"Sulphur (Bentonite 90%)": 8},
+        "yield_qtl": 8,
+        "irrigation": [(45, "Branching"), (75, "Pod Development")],
+        "pests": [(60, "Pod borer (Helicoverpa)"), (40, "Wilt, remove affected plants")],
+        "harvest": (95, 110),
+    },
+    "pigeonpea": {
+        "aliases": ["tur", "toor", "arhar", "red gram"],
+        "seed_kg": 6, "seed_note": "treat with Rhizobium; 90 x 20 cm spacing",
+        "varieties": "ICPL 87119 (Asha), BSMR 736, Pusa 992",
+        "npk": (8, 20, 8), "n_split": [(0, 1.0)], "k_split": [(0, 1.0)],
+        "micronutrients": {"Sulphur (Bentonite 90%)": 8},
+        "yield_qtl": 8,
+        "irrigation": [(60, "Branching"), (110, "Flowering"), (140, "Pod Filling")],
+        "pests": [(110, "Pod borer and pod fly"), (60, "Wilt and sterility mosaic")],
+        "harvest": (160, 180),
+    },
+}
+
+# n / k: dose multipliers. yield: change in potential %. amendments: kg per acre.
+SOILS = {
+    "alluvial": {"n": 1.0, "k": 1.0, "yield": 0, "amendments": {},
+                 "limit": "Balanced soil; nutrient timing and weeds set the ceiling"},
+    "loamy": {"n": 1.0, "k": 1.0, "yield": 0, "amendments": {},
+              "limit": "Well-drained loam; weed control in the first 45 days matters most"},
+    "black": {"n": 1.0, "k": 0.75, "yield": -3, "amendments": {"Zinc Sulphate (21% Zn)": 8},
+              "limit": "Black soil cracks when dry and waterlogs when wet; drainage and timely irrigation decide yield"},
+    "red": {"n": 1.0, "k": 1.0, "yield": -6, "amendments": {"Agricultural Lime": 200, "Zinc Sulphate (21% Zn)": 10},
+            "limit": "Red soil is low in organic matter and water holding; FYM and mulching protect yield"},
+    "clay": {"n": 1.0, "k": 0.85, "yield": -5, "amendments": {"Gypsum": 100},
+             "limit": "Heavy clay waterlogs; raised beds or drainage channels prevent root damage"},
+    "sandy": {"n": 1.15, "k": 1.1, "yield": -10, "amendments": {},
+              "limit": "Sandy soil leaches nitrogen and dries fast; split fertilizer and irrigate lightly but often"},
+    "laterite": {"n": 1.0, "k": 1.0, "yield": -8, "amendments": {"Agricultural Lime": 400, "Borax": 4},
+                 "limit": "Acidic laterite locks up phosphorus; liming before sowing is essential"},
+}
+
+# n: dose multiplier (fertigation is more efficient). yield: change in potential %.
+WATER = {
+    "canal": {"n": 1.0, "yield": 0, "rainfed": False},
+    "borewell": {"n": 1.0, "yield": 0, "rainfed": False},
+    "drip": {"n": 0.8, "yield": 4, "rainfed": False},
+    "sprinkler": {"n": 0.9, "yield": 2, "rainfed": False},
+    "rainfed": {"n": 0.8, "yield": -18, "rainfed": True},
+}
+
+BASE_POTENTIAL = 92
+
+
+def _key(value) -> str:
+    return str(value or "").strip().lower()
+
+
+def resolve_crop(name: str):
+    """Table key for a crop name ("Wheat", "gehu", "Paddy (Basmati)", "Red Gram"), or None."""
+    words = re.sub(r"[^a-z ]", " ", _key(name)).split()
+    text = " ".join(words)
+    names = [(alias, key) for key, crop in CROPS.items() for alias in (key, *crop["aliases"])]
+    # Multi-word names first, so "red gram" isn't read as "gram".
+    for alias, key in sorted(names, key=lambda pair: -len(pair[0].split())):
+        if (" " in alias and alias in text) or alias in words:
+            return key
+    return None
+
+
+def resolve_soil(name: str):
+    """SOILS key for a soil description ("Black", "red loamy soil"), or None; the first known word wins."""
+    for word in re.sub(r"[^a-z ]", " ", _key(name)).split():
+        if word in SOILS:
+            return word
+    return None
+
+
+def parse_acres(value):
+    """Land size in acres from 2, "2.5", "3 acres" or "1 hectare"; None if unreadable."""
+    match = re.search(r"\d+(?:\.\d+)?", str(value))
+    if not match:
+        return None
+    acres = float(match.group())
+    if re.search(r"hect|\bha\b", str(value).lower()):
+        acres *= 2.47
+    return acres if acres > 0 else None
+
+
+def _kg(value: float) -> str:
+    if value < 1:
+        return f"{value * 1000:.0f} g"
+    return f"{value:,.0f} kg" if value >= 10 else f"{value:.1f} kg"
+
+
+def _bags(product: str, kg: float) -> str:
+    bags = kg / BAG_KG[product]
+    return f"{_kg(kg)} (~{bags:.1f} bags of {BAG_KG[product]} kg)"
+
+
+def fertilizer_doses(n: float, p2o5: float, k2o: float) -> dict:
+    """Total kg of DAP (all the P), Urea (N not supplied by DAP) and MOP (all the K)."""
+    dap = p2o5 / DAP_P2O5
+    urea = max(0.0, n - dap * DAP_N) / UREA_N
+    mop = k2o / MOP_K2O
+    return {"DAP": dap, "Urea": urea, "MOP": mop}
+
+
+def _day_label(day: int, sowing) -> str:
+    if day == 0:
+        return f"Day 0 (Sowing, {sowing:%d %b})" if sowing else "Day 0 (Sowing)"
+    return f"Day {day} ({sowing + datetime.timedelta(days=day):%d %b})" if sowing else f"Day {day}"
+
+
+def calculate_execution_plan(crop_name: str, land_size, soil_type: str = "", water_source: str = "",
+                             sowing_date: str = "", variety: str = ""):
+    """
+    The execution plan in the /generate-execution-plan response shape, or
+    None if the crop, soil or land size isn't known (the caller then asks
+    Gemini for the whole plan rather than dosing for a soil we assumed).
+    """
+    crop_key = resolve_crop(crop_name)
+    soil_key = resolve_soil(soil_type)
+    acres = parse_acres(land_size)
+    if crop_key is None or soil_key is None or acres is None:
+        return None
+    crop = CROPS[crop_key]
+    soil = SOILS[soil_key]
+    water = WATER.get(_key(water_source), WATER["borewell"])
+    try:
+        sowing = datetime.date.fromisoformat(str(sowing_date)[:10])
+    except ValueError:
+        sowing = None
+
+    n, p2o5, k2o = crop["npk"]
+    n *= soil["n"] * water["n"] * acres
+    p2o5 *= acres
+    k2o *= soil["k"] * acres
+    doses = fertilizer_doses(n, p2o5, k2o)
+
+    potential = max(50, min(98, BASE_POTENTIAL + soil["yield"] + water["yield"]))
+    output_qtl = crop["yield_qtl"] * acres * potential / 100
+    output = f"{output_qtl:,.1f} quintals" if output_qtl >= 10 else f"{output_qtl * 100:,.0f} kg"
+
+    seed_kg = crop["seed_kg"] * acres
+    variety_note = f"Variety {variety}" if variety else f"Recommended: {crop['varieties']}"
+    inputs = [{"item": "Seeds", "quantity": _kg(seed_kg), "note": f"{variety_note}; {crop['seed_note']}"}]
+    inputs.append({"item": "DAP (18-46-0)", "quantity": _bags("DAP", doses["DAP"]),
+                   "note": f"Full dose as basal; supplies {p2o5:.0f} kg P2O5 and {doses['DAP'] * DAP_N:.0f} kg N"})
+    if doses["Urea"] > 0:
+        inputs.append({"item": "Urea (46% N)", "quantity": _bags("Urea", doses["Urea"]),
+                       "note": f"Remaining N in {len(crop['n_split'])} dose(s), see timeline; total N {n:.0f} kg"})
+    inputs.append({"item": "MOP (60% K2O)", "quantity": _bags("MOP", doses["MOP"]),
+                   "note": f"Supplies {k2o:.0f} kg K2O" + (" in split doses" if len(crop["k_split"]) > 1 else " as basal")})
+    extras = {**crop["micronutrients"], **soil["amendments"]}
+    for item, per_acre in extras.items():
+        inputs.append({"item": item, "quantity": _kg(per_acre * acres), "note": "Basal, mixed with FYM before sowing"})
+
+    # N from DAP goes in at sowing, so the basal Urea is only what's left of the basal N share.
+    events = {}
+    dap_n = doses["DAP"] * DAP_N
+    for day, share in crop["n_split"]:
+        n_needed = n * share - (dap_n if day == 0 else 0)
+        urea = max(0.0, n_needed) / UREA_N
+        events.setdefault(day, []).append(("urea", urea))
+    for day, share in crop["k_split"]:
+        events.setdefault(day, []).append(("mop", doses["MOP"] * share))
+
+    timeline = []
+    for day in sorted(events):
+        parts = [f"{_kg(kg)} {name.upper() if name == 'mop' else 'Urea'}" for name, kg in events[day] if kg >= 0.5]
+        if day == 0:
+            detail = f"Apply full DAP ({_kg(doses['DAP'])})" + (f", {', '.join(parts)}" if parts else "") + \
+                     (f" and {', '.join(extras)}" if extras else "") + f" for {acres:g} acres, then sow."
+            timeline.append((0, {"action": "Basal Dose & Sowing", "detail": detail, "icon": "mix"}))
+        elif parts:
+            detail = f"Broadcast {' + '.join(parts)} with adequate soil moisture."
+            timeline.append((day, {"action": "Top Dressing", "detail": detail, "icon": "fertilizer"}))
+    for day, stage in crop["irrigation"]:
+        if water["rainfed"]:
+            detail = f"{stage} is moisture-critical; give a protective irrigation if there is a dry spell."
+        else:
+            detail = f"Critical irrigation at {stage.lower()}; do not let the field dry out."
+        timeline.append((day, {"action": f"Irrigation: {stage}", "detail": detail, "icon": "irrigation"}))
+    for day, pest in crop["pests"]:
+        detail = f"Scout for {pest}; treat only above the economic threshold."
+        timeline.append((day, {"action": "Pest Watch", "detail": detail, "icon": "spray"}))
+    first, last = crop["harvest"]
+    harvest_day = f"Day {first}-{last}"
+    if sowing:
+        harvest_day += f" ({sowing + datetime.timedelta(days=first):%d %b} - {sowing + datetime.timedelta(days=last):%d %b})"
+    timeline.sort(key=lambda event: event[0])
+    timeline = [{"day": _day_label(day, sowing), **event} for day, event in timeline]
+    timeline.append({"day": harvest_day, "action": "Harvest",
+                     "detail": f"Harvest at physiological maturity; expect about {output}.", "icon": "harvest"})
+
+    limit = soil["limit"]
+    if water["rainfed"]:
+        limit = f"Rainfed: a dry spell at {crop['irrigation'][0][1].lower()} can cut yield by ~20%"
+    return {
+        "yield_forecast": {
+            "potential_percentage": potential,
+            "estimated_output": f"{output} for {acres:g} acres",
+            "limiting_factor": f"{limit}.",
+        },
+        "input_requirements": inputs,
+        "critical_timeline": timeline,
+    }
+
+
+def apply_narrative(plan: dict, narrative: dict) -> dict:
+    """Merge Gemini's narrative (limiting factor, variety, stage tips) into a calculated plan."""
+    if narrative.get("limiting_factor"):
+        plan["yield_forecast"]["limiting_factor"] = narrative["limiting_factor"]
+    seeds = plan["input_requirements"][0]
+    if narrative.get("variety") and not seeds["note"].startswith("Variety "):
+        seeds["note"] = f"Recommended: {narrative['variety']}; " + seeds["note"].split("; ", 1)[-1]
+    tips = {_key(tip.get("action")): tip.get("tip") for tip in narrative.get("stage_tips", [])}
+    for event in plan["critical_timeline"]:
+        tip = tips.get(_key(event["action"]))
+        if tip:
+            event["detail"] = f"{event['detail']} {tip}"
+    return plan
@@ -0,0 +1,138 @@
+"""
+CNN thread-tuning benchmark matrix.
+
+TensorFlow fixes its thread pools when the first op runs, so every
+(intra, inter, oneDNN) combination is measured in a fresh child process.
+Inside each child, batch-of-one predictions are driven from 1..N concurrent
+threads (the way the API calls the model) and latency/throughput recorded.
+
+Usage:
+    python bench_cnn_threads.py --intra 1 2 4 8 --inter 1 2 --concurrency 1 4 8
+    python bench_cnn_threads.py --format tflite --onednn 0 1 --csv results.csv
+
+Pick the row with the best throughput whose p95 still fits the latency
+budget, then set PRITHVI_TF_INTRA_THREADS / PRITHVI_TF_INTER_THREADS /
+PRITHVI_TF_ONEDNN for that machine class.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL = os.environ.get("PRITHVI_MODEL_PATH", os.path.join(BASE_DIR, "plant_disease_model.h5"))
+
+
+def run_child(args):
+    """Measure one thread configuration at every concurrency level."""
+    from cnn_model import load_cnn, IMG_SIZE
+
+    model = load_cnn(args.model_path, args.format)
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (1, IMG_SIZE, IMG_SIZE, 3), dtype=np.uint8)
+    for _ in range(5):
+        model.predict(image)
+
+    rows = []
+    for concurrency in args.concurrency:
+        latencies = []
+        lock = threading.Lock()
+        stop_at = time.perf_counter() + args.duration
+
+        def client():
+            local = []
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                model.predict(image)
+                local.append(time.perf_counter() - start)
+            with lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        latencies.sort()
+        rows.append({
+            "concurrency": concurrency,
+            "throughput": len(latencies) / args.duration,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p95_ms": latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000,
+        })
+    print("RESULT " + json.dumps(rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default=DEFAULT_MODEL)
+    parser.add_argument("--format", default="h5", choices=["h5", "tflite"])
+    parser.add_argument("--intra", type=int, nargs="+", default=[1, 2, 4, 0], help="0 = TensorFlow default")
+    parser.add_argument("--inter", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--onednn", nargs="+", default=[""], help="1, 0 or '' for the TensorFlow default")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--cpus", default="", help="pin the benchmark to these cores, e.g. 0-3")
+    parser.add_argument("--csv", help="append results to this CSV file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    machine = f"{platform.node()} ({os.cpu_count()} cpus, {platform.processor() or platform.machine()})"
+    print(f"🖥️  {machine}")
+
+    results = []
+    inter_values = args.inter if args.format == "h5" else [0]  # TFLite only has num_threads
+    for onednn in args.onednn:
+        for intra in args.intra:
+            for inter in inter_values:
+                env = dict(os.environ,
+                           PRITHVI_TF_INTRA_THREADS=str(intra),
+                           PRITHVI_TF_INTER_THREADS=str(inter),
+                           PRITHVI_TF_ONEDNN=onednn,
+                           PRITHVI_CPU_AFFINITY=args.cpus)
+                cmd = [sys.executable, __file__, "--child", "--model-path", args.model_path,
+                       "--format", args.format, "--duration", str(args.duration),
+                       "--concurrency", *map(str, args.concurrency)]
+                print(f"⏱️  intra={intra or 'auto'} inter={inter or 'auto'} oneDNN={onednn or 'default'} ...")
+                proc = subprocess.run(cmd, cwd=BASE_DIR, env=env, capture_output=True, text=True)
+                lines = [l for l in proc.stdout.splitlines() if l.startswith("RESULT ")]
+                if proc.returncode != 0 or not lines:
+                    print(f"   ❌ failed: {proc.stderr.strip()[-300:]}")
+                    continue
+                for row in json.loads(lines[-1][len("RESULT "):]):
+                    row.update(intra=intra, inter=inter, onednn=onednn or "default")
+                    results.append(row)
+
+    print("\n=== CNN THREAD MATRIX ===")
+    print(f"{'oneDNN':>7} {'intra':>5} {'inter':>5} {'conc':>5} {'img/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for r in results:
+        print(f"{r['onednn']:>7} {r['intra'] or 'auto':>5} {r['inter'] or 'auto':>5} {r['concurrency']:>5} "
+              f"{r['throughput']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}")
+
+    if args.csv:
+        new_file = not os.path.exists(args.csv)
+        with open(args.csv, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["machine", "format", "onednn", "intra", "inter",
+                                                   "concurrency", "throughput", "p50_ms", "p95_ms"])
+            if new_file:
+                writer.writeheader()
+            for r in results:
+                writer.writerow(dict(r, machine=machine, format=args.format))
+        print(f"\n📝 Appended {len(results)} rows to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Bytes on the wire and latency over a throttled link, with and without
+compression and conditional requests.
+
+Starts the server with the replay LLM backend, puts a local TCP proxy in
+front of it that limits bandwidth and adds round-trip delay (2G/3G/4G
+presets), warms each route once, then requests it repeatedly with:
+
+- identity: no compression;
+- gzip / br: Accept-Encoding (br only if the `brotli` package is installed);
+- 304: gzip plus If-None-Match with the ETag from the last response
+  (GET routes only).
+
+    python bench_compression.py                       # 3g
+    python bench_compression.py --link 2g --repeats 3
+    python bench_compression.py --link custom --down-kbps 256 --up-kbps 64 --rtt-ms 400
+    python bench_compression.py --url http://127.0.0.1:8000   # an already running server
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from bench_workers import wait_until_ready
+from compression import brotli
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# name -> (down kbps, up kbps, round trip ms)
+LINKS = {"2g": (50, 20, 600), "3g": (750, 250, 200), "4g": (8000, 2000, 80)}
+
+# name -> (method, path, params or JSON body)
+ROUTES = {
+    "market": ("GET", "/market-trends", {"region": "Nashik, Maharashtra"}),
+    "advice_hi": ("GET", "/advise-crop", {"soil": "Black", "season": "Kharif",
+                                          "location": "Nagpur, Maharashtra", "language": "hi"}),
+    "disease": ("GET", "/advice/Tomato___Early_blight", {"language": "ta"}),
+    "execution_plan": ("POST", "/generate-execution-plan", {
+        "crop_name": "Wheat", "variety": "HD 2967", "land_size": "2", "soil_type": "Loamy",
+        "water_source": "Canal", "sowing_date": "2026-11-15"}),
+}
+
+
+class ThrottledProxy:
+    """
+    TCP proxy on 127.0.0.1:`port` -> `target`. Each direction sends at its
+    bandwidth and delivers every chunk rtt/2 later; bytes sent to the client
+    are counted in `down_bytes`.
+    """
+
+    def __init__(self, target: tuple, port: int, down_kbps: float, up_kbps: float, rtt_ms: float):
+        self.target = target
+        self.port = port
+        self.down_bps = down_kbps * 1000
+        self.up_bps = up_kbps * 1000
+        self.one_way = rtt_ms / 2000
+        self.down_bytes = 0
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", self.port))
+        self._ready.set()
+        self.loop.run_forever()
+
+    async def _handle(self, client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection(*self.target)
+        try:
+            await asyncio.gather(
+                self._pipe(client_reader, server_writer, self.up_bps, downstream=False),
+                self._pipe(server_reader, client_writer, self.down_bps, downstream=True),
+                return_exceptions=True,
+            )
+        except asyncio.CancelledError:
+            pass  # proxy shutting down
+
+    async def _pipe(self, reader, writer, bits_per_second: float, downstream: bool):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                chunk = await reader.read(1460)
+                if not chunk:
+                    break
+                await asyncio.sleep(len(chunk) * 8 / bits_per_second)  # serialization
+                if downstream:
+                    self.down_bytes += len(chunk)
+                loop.call_later(self.one_way, writer.write, chunk)  # propagation
+            await asyncio.sleep(self.one_way)
+        finally:
+            writer.close()
+
+    async def _shutdown(self):
+        self.server.close()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(timeout=10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def fetch(session, proxy: ThrottledProxy, base: str, route: str, encoding: str, etag: str = None) -> dict:
+    method, path, payload = ROUTES[route]
+    headers = {"Accept-Encoding": encoding}
+    if etag:
+        headers["If-None-Match"] = etag
+    before = proxy.down_bytes
+    start = time.perf_counter()
+    if method == "GET":
+        r = session.get(base + path, params=payload, headers=headers, timeout=300)
+    else:
+        r = session.post(base + path, json=payload, headers=headers, timeout=300)
+    r.content
+    return {
+        "ms": (time.perf_counter() - start) * 1000,
+        "wire": proxy.down_bytes - before,
+        "json": len(r.content),
+        "status": r.status_code,
+        "encoding": r.headers.get("content-encoding", "identity"),
+        "etag": r.headers.get("etag"),
+    }
+
+
+def run(proxy: ThrottledProxy, base: str, repeats: int):
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    session = requests.Session()
+    print(f"\n{'route':<16} {'mode':<9} {'status':>6} {'json B':>8} {'wire B':>8} {'saved':>6} {'median ms':>10}")
+    for route in ROUTES:
+        warm = fetch(session, proxy, base, route, "identity")  # fills the server-side caches
+        baseline = None
+        modes = encodings + (["304"] if ROUTES[route][0] == "GET" and warm["etag"] else [])
+        for mode in modes:
+            samples = [fetch(session, proxy, base, route, "gzip" if mode == "304" else mode,
+                             etag=warm["etag"] if mode == "304" else None) for _ in range(repeats)]
+            wire = statistics.median(s["wire"] for s in samples)
+            baseline = baseline or wire
+            print(f"{route:<16} {mode:<9} {samples[-1]['status']:>6} {samples[-1]['json']:>8} {wire:>8.0f} "
+                  f"{1 - wire / baseline:>6.0%} {statistics.median(s['ms'] for s in samples):>10.0f}")
+    session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="server to test (default: spawn main.py with the replay backend)")
+    parser.add_argument("--link", choices=[*LINKS, "custom"], default="3g")
+    parser.add_argument("--down-kbps", type=float, default=None)
+    parser.add_argument("--up-kbps", type=float, default=None)
+    parser.add_argument("--rtt-ms", type=float, default=None)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--proxy-port", type=int, default=8768)
+    parser.add_argument("--latency", default="fixed:200", help="replay latency distribution")
+    args = parser.parse_args()
+
+    down, up, rtt = LINKS.get(args.link, (750, 250, 200))
+    down, up, rtt = args.down_kbps or down, args.up_kbps or up, args.rtt_ms or rtt
+    base = (args.url or f"http://127.0.0.1:{args.port}").rstrip("/")
+
+    server = None
+    if not args.url:
+        env = dict(os.environ, PRITHVI_PORT=str(args.port), PRITHVI_HOST="127.0.0.1",
+                   PRITHVI_LLM_BACKEND="replay", PRITHVI_REPLAY_LATENCY=args.latency)
+        print(f"🚀 Starting server (replay backend, latency {args.latency})...")
+        server = subprocess.Popen([sys.executable, "main.py"], cwd=BASE_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    proxy = None
+    try:
+        if not wait_until_ready(base + "/"):
+            print("❌ Server did not become ready")
+            return
+        host, port = base.split("//", 1)[1].split(":")
+        proxy = ThrottledProxy((host, int(port)), args.proxy_port, down, up, rtt)
+        print(f"🐢 Link: {down:g} kbps down / {up:g} kbps up, {rtt:g} ms RTT"
+              f"{'' if brotli is not None else ' (brotli not installed: gzip only)'}")
+        run(proxy, f"http://127.0.0.1:{args.proxy_port}", args.repeats)
+    finally:
+        if proxy is not None:
+            proxy.close()
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+
+if __name__ == "__main__":
+    main()
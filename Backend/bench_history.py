@@ -0,0 +1,78 @@
+"""
+Load the scan history with synthetic scans and time the outbreak queries.
+
+Scans are spread over `--days` days and `--regions` district-sized cells
+around India; each region mostly reports its own few prevalent diseases
+(Zipf-weighted over the 38 CNN classes). They are written through ScanHistory.write_batch
+(the same path the background writer uses).
+
+Usage:
+    python bench_history.py --rows 1000000 --db /tmp/bench_history.db
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from class_index import CROP_DISPLAY_NAMES, CROP_OF_CLASS, DIAGNOSIS_NAMES
+from scan_history import ScanHistory, epoch_day, geohash
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--regions", type=int, default=300)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--db", default="bench_history.db")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    history = ScanHistory(args.db)
+
+    rng = np.random.default_rng(0)
+    centres = np.column_stack([rng.uniform(8, 32, args.regions), rng.uniform(70, 90, args.regions)])
+    weights = 1.0 / np.arange(1, len(DIAGNOSIS_NAMES) + 1) ** 1.5
+    weights /= weights.sum()
+    region_classes = np.stack([rng.permutation(len(DIAGNOSIS_NAMES)) for _ in range(args.regions)])
+    now = time.time()
+    start = time.perf_counter()
+    for offset in range(0, args.rows, args.batch):
+        n = min(args.batch, args.rows - offset)
+        ts = now - rng.uniform(0, args.days * 86400, n)
+        region = rng.integers(0, args.regions, n)
+        cls = region_classes[region, rng.choice(len(DIAGNOSIS_NAMES), size=n, p=weights)]
+        where = centres[region] + rng.normal(0, 0.05, (n, 2))
+        history.write_batch([
+            (t, epoch_day(t), CROP_DISPLAY_NAMES[CROP_OF_CLASS[c]], DIAGNOSIS_NAMES[c].lower(), 0, "High",
+             "bench", geohash(lat, lon))
+            for t, c, (lat, lon) in zip(ts, cls, where)
+        ])
+    load_s = time.perf_counter() - start
+    print(f"📥 {args.rows} rows in {load_s:.1f}s ({args.rows / load_s:,.0f} rows/s, batch {args.batch})")
+
+    queries = {
+        "30 days, all regions": dict(days=30),
+        "30 days, 2-char regions": dict(days=30, precision=2),
+        "30 days, 3-char regions": dict(days=30, precision=3),
+        "90 days, one crop": dict(days=90, crop="Tomato"),
+        "30 days, one disease": dict(days=30, disease="potato - late blight"),
+        "30 days, one region prefix": dict(days=30, region=geohash(*centres[0], precision=3)),
+    }
+    print(f"\n{'query':<28} {'rows':>6} {'p50 ms':>8} {'max ms':>8}")
+    for name, kwargs in queries.items():
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            rows = history.outbreaks(**kwargs)
+            times.append((time.perf_counter() - start) * 1000)
+        print(f"{name:<28} {len(rows):>6} {np.median(times):>8.2f} {max(times):>8.2f}")
+    history.close()
+
+
+if __name__ == "__main__":
+    main()
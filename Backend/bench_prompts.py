@@ -0,0 +1,206 @@
+"""
+Compare the legacy example-document prompts (prompts_legacy.py) with the
+compact prompts + response_schema (prompts.py): input tokens, time to first
+token, total latency and parse rate.
+
+    python bench_prompts.py --record --repeat 3   # live: needs GOOGLE_API_KEY
+    python bench_prompts.py                       # replay the recordings
+
+--record calls Gemini for every prompt in both variants (streaming, to time
+the first token) and saves response text, usage metadata and timings to
+prompt_recordings.json. Replay runs each recorded response through a stub
+model and the routes' parsing / required-key check, so the comparison is
+reproducible offline. Without recordings only estimated input tokens
+(~4 characters per token, prompt text + schema) are reported.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from prompts import PROMPTS, render, generation_config
+from prompts_legacy import LEGACY_PROMPTS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RECORDINGS = os.path.join(BASE_DIR, "prompt_recordings.json")
+DEFAULT_IMAGE = os.path.join(BASE_DIR, "..", "Zips", "test", "test", "AppleScab1.JPG")
+VARIANTS = ("legacy", "schema")
+
+SAMPLE_FIELDS = {
+    "advise_crop": {"soil": "Black", "season": "Kharif", "location": "Nagpur, Maharashtra"},
+    "farm_plan": {"soil_type": "Red", "water_source": "Borewell", "budget": 80000, "land_size": 2},
+    "smart_plan": {"land_size": "3 acres", "soil_type": "Alluvial", "budget": "₹1 Lakh",
+                   "water_source": "Canal", "season": "Rabi", "sowing_month": "November"},
+    "execution_plan": {"crop_name": "Wheat", "variety_text": " (Variety: HD 2967)", "land_size": 2,
+                       "soil_type": "Loamy", "water_source": "Canal", "sowing_date": "2026-11-15"},
+    "execution_narrative": {"crop_name": "Wheat", "variety_text": "", "soil_type": "Loamy", "water_source": "Canal",
+                            "stages": "Basal Dose & Sowing, Top Dressing, Irrigation: Crown Root Initiation, Harvest"},
+    "market_trends": {"region": "Nashik, Maharashtra"},
+    "market_note": {"region": "Nashik, Maharashtra", "last_updated": "18 Oct 2026",
+                    "summary": "Onion ₹2680 (+4.4%, up); Tomato ₹860 (-0.3%, stable); Grapes ₹4642 (-5.7%, down)"},
+    "disease_advice": {"disease": "Tomato - Early blight", "status": "Disease Detected",
+                       "task": "Give treatment advice: a specific chemical or organic medicine with dosage, "
+                               "and 3-5 actionable steps."},
+    "vision_diagnosis": {},
+}
+
+
+# Keys each route rejects the response without (its own validation).
+ROUTE_REQUIRED = {
+    "advise_crop": ["recommendations"],
+    "farm_plan": ["timeline"],
+    "smart_plan": ["summary", "timeline_weeks"],
+    "execution_plan": ["yield_forecast", "input_requirements", "critical_timeline"],
+    "execution_narrative": ["limiting_factor"],
+    "market_trends": ["crops"],
+    "market_note": ["analyst_note"],
+    "disease_advice": ["steps"],
+    "vision_diagnosis": ["is_plant"],
+}
+
+
+def variants(name: str) -> tuple:
+    """Prompts added after the registry have no legacy version to compare against."""
+    return VARIANTS if name in LEGACY_PROMPTS else ("schema",)
+
+
+def build_request(name: str, variant: str, image: bytes = None):
+    fields = SAMPLE_FIELDS[name]
+    if variant == "legacy":
+        prompt, config = LEGACY_PROMPTS[name].format(**fields), None
+    else:
+        prompt, config = render(name, **fields), generation_config(name)
+    contents = [{"mime_type": "image/jpeg", "data": image}, prompt] if name == "vision_diagnosis" else prompt
+    return contents, config
+
+
+def estimate_tokens(name: str, variant: str) -> int:
+    """Text-only estimate: prompt characters plus schema JSON, ~4 chars per token."""
+    contents, config = build_request(name, variant)
+    prompt = contents[-1] if isinstance(contents, list) else contents
+    chars = len(prompt) + (len(json.dumps(config["response_schema"])) if config else 0)
+    return int(np.ceil(chars / 4))
+
+
+def parses(name: str, text: str) -> bool:
+    """The routes' own parsing: strip fences, cut to the outer {...}, json.loads, check their keys."""
+    text = text.strip().replace("```json", "").replace("```", "").strip()
+    if "{" in text and "}" in text:
+        text = text[text.find("{"):text.rfind("}") + 1]
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return False
+    return isinstance(data, dict) and all(data.get(key) not in (None, "", []) for key in ROUTE_REQUIRED[name])
+
+
+class RecordedResponse:
+    def __init__(self, sample: dict):
+        self.text = sample["text"]
+        self.sample = sample
+
+
+class RecordedModel:
+    """Stub for genai.GenerativeModel that replays recorded responses in order."""
+
+    def __init__(self, samples: list):
+        self.samples = samples
+        self.next = 0
+
+    def generate_content(self, contents, generation_config=None, **kwargs):
+        sample = self.samples[self.next % len(self.samples)]
+        self.next += 1
+        return RecordedResponse(sample)
+
+
+def record(args) -> dict:
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+    model = genai.GenerativeModel(args.model, generation_config={
+        "temperature": 0.4, "max_output_tokens": 8192, "response_mime_type": "application/json",
+    })
+    image = open(args.image, "rb").read() if os.path.exists(args.image) else None
+
+    recordings = {}
+    for name in PROMPTS:
+        if name == "vision_diagnosis" and image is None:
+            print(f"⚠️ Skipping {name}: no image at {args.image}")
+            continue
+        for variant in variants(name):
+            contents, config = build_request(name, variant, image)
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                first, chunks = None, []
+                try:
+                    for chunk in model.generate_content(contents, generation_config=config, stream=True):
+                        first = first or time.perf_counter()
+                        chunks.append(chunk)
+                except Exception as e:
+                    print(f"⚠️ {name}/{variant}: {type(e).__name__}: {e}")
+                    continue
+                end = time.perf_counter()
+                usage = chunks[-1].usage_metadata
+                samples.append({
+                    "text": "".join(c.text for c in chunks),
+                    "prompt_tokens": usage.prompt_token_count,
+                    "output_tokens": usage.candidates_token_count,
+                    "ttft_ms": round((first - start) * 1000, 1),
+                    "total_ms": round((end - start) * 1000, 1),
+                })
+                print(f"🎙️ {name}/{variant}: {samples[-1]['prompt_tokens']} in, {samples[-1]['total_ms']:.0f} ms")
+            recordings.setdefault(name, {})[variant] = samples
+
+    with open(args.recordings, "w") as f:
+        json.dump({"model": args.model, "recorded_at": time.time(), "prompts": recordings}, f, indent=2)
+    print(f"✅ Saved {args.recordings}")
+    return recordings
+
+
+def replay(recordings: dict):
+    header = f"{'prompt':<20} {'variant':<7} {'in tokens':>10} {'out tokens':>10} {'TTFT p50':>9} {'total p50':>10} {'parsed':>7}"
+    print(header)
+    print("-" * len(header))
+    for name in PROMPTS:
+        for variant in variants(name):
+            samples = recordings.get(name, {}).get(variant, [])
+            if not samples:
+                print(f"{name:<20} {variant:<7} {'~' + str(estimate_tokens(name, variant)):>10} "
+                      f"{'-':>10} {'-':>9} {'-':>10} {'-':>7}")
+                continue
+            model = RecordedModel(samples)
+            contents, config = build_request(name, variant)
+            ok = [parses(name, model.generate_content(contents, generation_config=config).text) for _ in samples]
+            print(f"{name:<20} {variant:<7} "
+                  f"{np.median([s['prompt_tokens'] for s in samples]):>10.0f} "
+                  f"{np.median([s['output_tokens'] for s in samples]):>10.0f} "
+                  f"{np.median([s['ttft_ms'] for s in samples]):>7.0f}ms "
+                  f"{np.median([s['total_ms'] for s in samples]):>8.0f}ms "
+                  f"{sum(ok)}/{len(ok):<5}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--record", action="store_true", help="call Gemini live and save recordings")
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--model", default="gemini-3-flash-preview")
+    parser.add_argument("--image", default=DEFAULT_IMAGE, help="leaf image for vision_diagnosis")
+    args = parser.parse_args()
+
+    if args.record:
+        recordings = record(args)
+    elif os.path.exists(args.recordings):
+        with open(args.recordings, "r") as f:
+            recordings = json.load(f)["prompts"]
+    else:
+        print(f"ℹ️  No recordings at {args.recordings} (run with --record); showing estimates only.\n")
+        recordings = {}
+    replay(recordings)
+
+
+if __name__ == "__main__":
+    main()
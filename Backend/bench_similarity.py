@@ -0,0 +1,66 @@
+"""
+Brute-force vs IVF search cost for the similar-scan index.
+
+Synthetic clustered unit vectors (one cluster per "disease") stand in for
+CNN embeddings. For each index size, reports p50 query latency of exact
+search and of IVF search, plus IVF recall@k against the exact top-k.
+
+Usage:
+    python bench_similarity.py --sizes 1000 10000 100000 300000 --dim 256
+"""
+import argparse
+import time
+
+import numpy as np
+
+from similarity_index import VectorIndex
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, rng) -> np.ndarray:
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    assign = rng.integers(0, clusters, size=n)
+    return centres[assign] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def p50_ms(index: VectorIndex, queries: np.ndarray, k: int):
+    times, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        rows, _ = index.search(q, k)
+        times.append((time.perf_counter() - start) * 1000)
+        results.append(set(rows.tolist()))
+    return float(np.median(times)), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 300000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=38)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'vectors':>9} {'exact p50 ms':>13} {'IVF p50 ms':>11} {'IVF train s':>12} {'recall@k':>9}")
+    for n in args.sizes:
+        data = clustered_vectors(n, args.dim, args.clusters, rng)
+        queries = clustered_vectors(args.queries, args.dim, args.clusters, rng)
+
+        exact = VectorIndex(args.dim, ivf_min_vectors=n + 1)
+        exact.add(data)
+        exact_ms, truth = p50_ms(exact, queries, args.k)
+
+        start = time.perf_counter()
+        ivf = VectorIndex(args.dim, ivf_min_vectors=1, nprobe=args.nprobe)
+        ivf.add(data)
+        train_s = time.perf_counter() - start
+        ivf_ms, found = p50_ms(ivf, queries, args.k)
+
+        recall = np.mean([len(t & f) / len(t) for t, f in zip(truth, found)])
+        print(f"{n:>9} {exact_ms:>13.3f} {ivf_ms:>11.3f} {train_s:>12.2f} {recall*100:>8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
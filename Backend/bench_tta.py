@@ -0,0 +1,69 @@
+"""
+Measure what test-time augmentation buys and costs.
+
+Runs the CNN over a labelled folder (one sub-folder per class, e.g. the
+`valid` split of the New Plant Diseases Dataset) and compares single-view
+prediction against TTA applied below each confidence threshold.
+
+Usage:
+    python bench_tta.py --data "../Zips/New Plant Diseases Dataset(Augmented)/.../valid" --limit 20
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from cnn_model import load_cnn, preprocess_image
+from tta import predict_tta, DEFAULT_VIEWS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", required=True, help="folder with one sub-folder per class")
+    parser.add_argument("--model-path", default=os.path.join(BASE_DIR, "plant_disease_model.h5"))
+    parser.add_argument("--format", default="h5", choices=["h5", "tflite"])
+    parser.add_argument("--limit", type=int, default=20, help="images per class")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.8, 1.01])
+    args = parser.parse_args()
+
+    # Keras assigns class indices in sorted folder order, same as CLASS_NAMES.
+    classes = sorted(d for d in os.listdir(args.data) if os.path.isdir(os.path.join(args.data, d)))
+    model = load_cnn(args.model_path, args.format)
+
+    labels, single, tta, single_ms, tta_ms = [], [], [], [], []
+    for label, name in enumerate(classes):
+        folder = os.path.join(args.data, name)
+        for fname in sorted(os.listdir(folder))[:args.limit]:
+            with open(os.path.join(folder, fname), "rb") as f:
+                image = preprocess_image(f.read())
+
+            start = time.perf_counter()
+            single.append(model.predict(image[None])[0])
+            single_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            tta.append(predict_tta(model, image))
+            tta_ms.append((time.perf_counter() - start) * 1000)
+            labels.append(label)
+
+    labels, single, tta = np.array(labels), np.stack(single), np.stack(tta)
+    confidence = single.max(axis=1)
+    print(f"\n📊 {len(labels)} images, {len(classes)} classes, {len(DEFAULT_VIEWS)} TTA views")
+    print(f"   single view: {np.median(single_ms):.1f} ms/image   TTA batch: {np.median(tta_ms):.1f} ms/image")
+
+    print(f"\n{'threshold':>9} {'accuracy':>9} {'TTA rate':>9} {'avg extra ms':>13}")
+    for threshold in args.thresholds:
+        use_tta = confidence < threshold
+        probs = np.where(use_tta[:, None], tta, single)
+        accuracy = float((probs.argmax(axis=1) == labels).mean())
+        extra = float(np.mean(np.where(use_tta, tta_ms, 0.0)))
+        label = "never" if threshold <= 0 else ("always" if threshold > 1 else f"{threshold:.2f}")
+        print(f"{label:>9} {accuracy*100:>8.1f}% {use_tta.mean()*100:>8.1f}% {extra:>13.1f}")
+    print(f"{'off':>9} {float((single.argmax(axis=1) == labels).mean())*100:>8.1f}% {0:>8.1f}% {0:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
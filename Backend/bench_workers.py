@@ -0,0 +1,161 @@
+"""
+Multi-worker scaling benchmark.
+
+Starts `python main.py` with PRITHVI_WORKERS = 1, 2, 4 ... and for each
+worker count reports memory per worker process and requests/sec.
+
+RSS counts shared pages (mmap'd TFLite weights, shared libraries) once per
+process, so PSS (proportional set size, Linux only) is the fairer number for
+"how much does one more worker cost".
+
+Usage:
+    python bench_workers.py --workers 1 2 4 --duration 20 --concurrency 16
+    python bench_workers.py --path / --method GET
+"""
+import argparse
+import glob
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+try:
+    import psutil
+except ImportError:
+    print("❌ psutil is required: pip install psutil")
+    sys.exit(1)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_IMAGES = sorted(glob.glob(os.path.join(BASE_DIR, "..", "Zips", "test", "test", "*.JPG")))
+
+
+def wait_until_ready(url: str, timeout: float = 180) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def worker_memory(server: subprocess.Popen) -> list:
+    """(pid, rss_mb, pss_mb) for every process serving requests."""
+    parent = psutil.Process(server.pid)
+    procs = parent.children(recursive=True) or [parent]
+    rows = []
+    for p in procs:
+        try:
+            info = p.memory_full_info()
+            rows.append((p.pid, info.rss / 2**20, getattr(info, "pss", 0) / 2**20))
+        except psutil.Error:
+            continue
+    return rows
+
+
+def drive_load(url: str, method: str, duration: float, concurrency: int) -> dict:
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+    payloads = [open(p, "rb").read() for p in TEST_IMAGES[:8]]
+
+    def client(i: int):
+        session = requests.Session()
+        n = 0
+        while time.time() < stop_at:
+            start = time.perf_counter()
+            try:
+                if method == "GET":
+                    r = session.get(url, timeout=60)
+                else:
+                    image = payloads[(i + n) % len(payloads)] if payloads else b""
+                    r = session.post(url, files={"file": ("leaf.jpg", image, "image/jpeg")}, timeout=60)
+                ok = r.status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+            n += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+        "errors": errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--path", default="/scan_disease")
+    parser.add_argument("--method", default="POST", choices=["GET", "POST"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--env", nargs="*", default=[], help="extra KEY=VALUE settings for the server")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.workers:
+        env = dict(os.environ, PRITHVI_WORKERS=str(n), PRITHVI_PORT=str(args.port), PRITHVI_HOST="127.0.0.1")
+        env.update(kv.split("=", 1) for kv in args.env)
+        print(f"\n🚀 Starting server with {n} worker(s)...")
+        server = subprocess.Popen([sys.executable, "main.py"], cwd=BASE_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            base = f"http://127.0.0.1:{args.port}"
+            if not wait_until_ready(base + "/"):
+                print("❌ Server did not become ready")
+                continue
+            # Warm every worker once so lazy allocations are counted.
+            drive_load(base + args.path, args.method, 3, n * 2)
+            stats = drive_load(base + args.path, args.method, args.duration, args.concurrency)
+            mem = worker_memory(server)
+            rss = [m[1] for m in mem]
+            pss = [m[2] for m in mem]
+            results.append((n, stats, statistics.mean(rss), statistics.mean(pss), sum(pss)))
+            print(f"   ✓ {stats['rps']:.1f} req/s, p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms, "
+                  f"errors {stats['errors']}")
+            print(f"   ✓ per-process RSS {statistics.mean(rss):.0f} MB, PSS {statistics.mean(pss):.0f} MB "
+                  f"({len(mem)} processes)")
+        finally:
+            # Stop the supervisor first so it shuts its own workers down cleanly,
+            # then reap anything left behind.
+            children = psutil.Process(server.pid).children(recursive=True)
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+            for child in children:
+                if child.is_running():
+                    child.kill()
+
+    print("\n=== WORKER SCALING ===")
+    print(f"{'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'RSS/proc':>9} {'PSS/proc':>9} {'PSS total':>10}")
+    for n, stats, rss, pss, pss_total in results:
+        print(f"{n:>7} {stats['rps']:>8.1f} {stats['p50_ms']:>8.0f} {stats['p95_ms']:>8.0f} "
+              f"{rss:>8.0f}M {pss:>8.0f}M {pss_total:>9.0f}M")
+
+
+if __name__ == "__main__":
+    main()
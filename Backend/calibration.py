@@ -0,0 +1,129 @@
+"""
+Temperature scaling for the CNN's softmax.
+
+A CNN trained with cross-entropy is usually over-confident: "97%" is right
+much less than 97% of the time. Temperature scaling divides the logits by a
+single scalar T (fitted offline on held-out images by minimising negative
+log-likelihood), which keeps the argmax unchanged but makes the confidence
+mean what it says.
+
+The model outputs softmax, not logits, so log(p) is used as the logits; this
+is equivalent up to a per-image constant, which softmax ignores.
+
+Fit once per model:
+    python calibration.py --data "<valid split folder>" --limit 50
+which writes calibration.json next to the model.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = os.path.join(BASE_DIR, "calibration.json")
+
+
+def apply_temperature(probs: np.ndarray, temperature: float) -> np.ndarray:
+    if temperature == 1.0:
+        return probs
+    logits = np.log(np.clip(probs, 1e-12, 1.0)) / temperature
+    logits -= logits.max(axis=-1, keepdims=True)
+    scaled = np.exp(logits)
+    return scaled / scaled.sum(axis=-1, keepdims=True)
+
+
+def negative_log_likelihood(probs: np.ndarray, labels: np.ndarray) -> float:
+    return float(-np.mean(np.log(np.clip(probs[np.arange(len(labels)), labels], 1e-12, 1.0))))
+
+
+def expected_calibration_error(probs: np.ndarray, labels: np.ndarray, bins: int = 15) -> float:
+    confidence = probs.max(axis=1)
+    correct = probs.argmax(axis=1) == labels
+    bin_ids = np.minimum((confidence * bins).astype(int), bins - 1)
+    counts = np.bincount(bin_ids, minlength=bins)
+    conf_sum = np.bincount(bin_ids, weights=confidence, minlength=bins)
+    acc_sum = np.bincount(bin_ids, weights=correct, minlength=bins)
+    return float(np.abs(acc_sum - conf_sum).sum() / len(labels))
+
+
+def fit_temperature(probs: np.ndarray, labels: np.ndarray) -> float:
+    """Coarse log-spaced grid, then golden-section refinement on NLL."""
+    grid = np.logspace(-1, 1, 41)
+    nll = [negative_log_likelihood(apply_temperature(probs, t), labels) for t in grid]
+    best = int(np.argmin(nll))
+    lo, hi = grid[max(best - 1, 0)], grid[min(best + 1, len(grid) - 1)]
+
+    ratio = (np.sqrt(5) - 1) / 2
+    for _ in range(40):
+        a = hi - ratio * (hi - lo)
+        b = lo + ratio * (hi - lo)
+        if negative_log_likelihood(apply_temperature(probs, a), labels) < \
+                negative_log_likelihood(apply_temperature(probs, b), labels):
+            hi = b
+        else:
+            lo = a
+    return float((lo + hi) / 2)
+
+
+def load_temperature(path: str = DEFAULT_PATH) -> float:
+    if not os.path.exists(path):
+        return 1.0
+    with open(path, "r") as f:
+        return float(json.load(f).get("temperature", 1.0))
+
+
+def main():
+    from cnn_model import load_cnn, preprocess_image
+    from class_index import CLASS_NAMES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", required=True, help="held-out folder with one sub-folder per class")
+    parser.add_argument("--model-path", default=os.path.join(BASE_DIR, "plant_disease_model.h5"))
+    parser.add_argument("--format", default="h5", choices=["h5", "tflite"])
+    parser.add_argument("--limit", type=int, default=50, help="images per class")
+    parser.add_argument("--out", default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    model = load_cnn(args.model_path, args.format)
+    probs, labels = [], []
+    for name in sorted(os.listdir(args.data)):
+        if name not in CLASS_NAMES:
+            continue
+        folder = os.path.join(args.data, name)
+        images = []
+        for fname in sorted(os.listdir(folder))[:args.limit]:
+            with open(os.path.join(folder, fname), "rb") as f:
+                images.append(preprocess_image(f.read()))
+        if images:
+            probs.append(model.predict(np.stack(images)))
+            labels += [CLASS_NAMES.index(name)] * len(images)
+
+    if not labels:
+        print("❌ No class folders matching CLASS_NAMES found")
+        return
+
+    probs, labels = np.concatenate(probs), np.array(labels)
+    temperature = fit_temperature(probs, labels)
+    calibrated = apply_temperature(probs, temperature)
+    report = {
+        "temperature": temperature,
+        "images": int(len(labels)),
+        "accuracy": float((probs.argmax(axis=1) == labels).mean()),
+        "nll_before": negative_log_likelihood(probs, labels),
+        "nll_after": negative_log_likelihood(calibrated, labels),
+        "ece_before": expected_calibration_error(probs, labels),
+        "ece_after": expected_calibration_error(calibrated, labels),
+        "model": os.path.basename(args.model_path),
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=4)
+
+    print(f"🌡️  T = {temperature:.3f} on {report['images']} images (accuracy {report['accuracy']*100:.1f}%)")
+    print(f"   NLL {report['nll_before']:.4f} -> {report['nll_after']:.4f}, "
+          f"ECE {report['ece_before']*100:.2f}% -> {report['ece_after']*100:.2f}%")
+    print(f"✅ Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
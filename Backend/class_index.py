@@ -0,0 +1,91 @@
+"""
+The 38 PlantVillage classes served by plant_disease_model, plus lookup arrays
+precomputed once at import so per-request code never string-splits
+'Crop___Disease' names.
+
+Index i in every array below refers to CLASS_NAMES[i], the model's output
+order (sorted folder names, as Keras assigned them at training time).
+"""
+import re
+
+import numpy as np
+
+CLASS_NAMES = [
+    'Apple___Apple_scab', 'Apple___Black_rot', 'Apple___Cedar_apple_rust', 'Apple___healthy',
+    'Blueberry___healthy', 'Cherry_(including_sour)___Powdery_mildew', 'Cherry_(including_sour)___healthy',
+    'Corn_(maize)___Cercospora_leaf_spot_Gray_leaf_spot', 'Corn_(maize)___Common_rust_', 'Corn_(maize)___Northern_Leaf_Blight', 'Corn_(maize)___healthy',
+    'Grape___Black_rot', 'Grape___Esca_(Black_Measles)', 'Grape___Leaf_blight_(Isariopsis_Leaf_Spot)', 'Grape___healthy',
+    'Orange___Haunglongbing_(Citrus_greening)', 'Peach___Bacterial_spot', 'Peach___healthy',
+    'Pepper,_bell___Bacterial_spot', 'Pepper,_bell___healthy',
+    'Potato___Early_blight', 'Potato___Late_blight', 'Potato___healthy',
+    'Raspberry___healthy', 'Soybean___healthy', 'Squash___Powdery_mildew',
+    'Strawberry___Leaf_scorch', 'Strawberry___healthy',
+    'Tomato___Bacterial_spot', 'Tomato___Early_blight', 'Tomato___Late_blight', 'Tomato___Leaf_Mold',
+    'Tomato___Septoria_leaf_spot', 'Tomato___Spider_mites_Two-spotted_spider_mite', 'Tomato___Target_Spot',
+    'Tomato___Tomato_Yellow_Leaf_Curl_Virus', 'Tomato___Tomato_mosaic_virus', 'Tomato___healthy'
+]
+
+CLASS_CROPS = [name.split('___')[0] for name in CLASS_NAMES]
+CLASS_DISEASES = [name.split('___')[1].replace('_', ' ') for name in CLASS_NAMES]
+DIAGNOSIS_NAMES = [name.replace("___", " - ").replace("_", " ") for name in CLASS_NAMES]
+IS_HEALTHY = np.array(['healthy' in name.lower() for name in CLASS_NAMES])
+
+# Crop grouping: CROP_OF_CLASS[i] is the index into CROP_NAMES for class i.
+CROP_NAMES = list(dict.fromkeys(CLASS_CROPS))
+CROP_OF_CLASS = np.array([CROP_NAMES.index(c) for c in CLASS_CROPS], dtype=np.intp)
+CROP_DISPLAY_NAMES = [c.replace('_', ' ') for c in CROP_NAMES]
+
+
+def top_k(probs: np.ndarray, k: int = 3) -> np.ndarray:
+    """Indices of the k largest probabilities, highest first (O(n) partition + O(k log k) sort)."""
+    k = min(k, probs.shape[-1])
+    idx = np.argpartition(probs, -k)[-k:]
+    return idx[np.argsort(probs[idx])[::-1]]
+
+
+def crop_marginals(probs: np.ndarray) -> np.ndarray:
+    """P(crop) = sum of P(class) over that crop's classes, ordered like CROP_NAMES."""
+    return np.bincount(CROP_OF_CLASS, weights=probs, minlength=len(CROP_NAMES))
+
+
+# Words of each class name, to map free-text diagnoses ("Tomato Early Blight",
+# "Early blight of tomato") back to a class.
+_CLASS_WORDS = [
+    (set(re.findall(r"[a-z]+", crop.lower())), set(re.findall(r"[a-z]+", disease.lower())))
+    for crop, disease in zip(CLASS_CROPS, CLASS_DISEASES)
+]
+
+
+def class_for_diagnosis(text: str):
+    """
+    The CLASS_NAMES entry a free-text diagnosis refers to, or None if unclear,
+    including when two classes match equally well ("Tomato Blight").
+    """
+    words = set(re.findall(r"[a-z]+", str(text or "").lower()))
+    best, best_score, tied = None, 0.0, False
+    for name, (crop_words, disease_words) in zip(CLASS_NAMES, _CLASS_WORDS):
+        if not crop_words & words:
+            continue
+        # Share of the class's disease words present ("Spider mites" covers 2 of 5).
+        score = len(disease_words & words) / len(disease_words)
+        if score < 0.4:
+            continue
+        if score > best_score:
+            best, best_score, tied = name, score, False
+        elif score == best_score:
+            tied = True
+    return None if tied else best
+
+
+def class_for_scan(diagnosis: dict):
+    """
+    The class a scan result names. Gemini often answers just "Healthy" or
+    "Early Blight"; its `crop` and `is_healthy` fields then fill in the rest.
+    """
+    label, crop = diagnosis.get("diagnosis_name"), diagnosis.get("crop")
+    found = class_for_diagnosis(label)
+    if crop and diagnosis.get("is_healthy") is True:
+        found = class_for_diagnosis(f"{crop} healthy") or found
+    elif crop and found is None:
+        found = class_for_diagnosis(f"{crop} {label}")
+    return found
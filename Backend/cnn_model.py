@@ -0,0 +1,239 @@
+"""
+Local CNN runtime for the PrithviPulse fallback model.
+
+Wraps plant_disease_model behind a single `predict(batch)` call that takes
+uint8 NHWC batches (N, 128, 128, 3) and returns the 38-way softmax, whichever
+on-disk format is being served:
+
+- .h5      -> Keras model (needs the full TensorFlow package)
+- .tflite  -> TFLite interpreter. The flatbuffer is memory-mapped, so every
+              worker process serving the same file shares one copy of the
+              weights through the OS page cache.
+
+TensorFlow is imported lazily so that processes which never touch the model
+(uvicorn supervisors, benchmark drivers) don't pay for it.
+
+Runtime tuning (read once, before the first model load in a process):
+    PRITHVI_TF_INTRA_THREADS   threads used inside one op (TFLite: num_threads)
+    PRITHVI_TF_INTER_THREADS   ops run in parallel (Keras only)
+    PRITHVI_TF_ONEDNN          1/0 to force oneDNN kernels on/off
+    PRITHVI_CPU_AFFINITY       pin the process to cores, e.g. "0-3" or "0,2,4"
+0 / unset keeps the TensorFlow defaults (one thread per core).
+"""
+import io
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+IMG_SIZE = 128
+_runtime_configured = False
+
+try:
+    RESAMPLE_LANCZOS = Image.Resampling.LANCZOS  # PIL 10.0.0+
+except AttributeError:
+    RESAMPLE_LANCZOS = Image.LANCZOS
+
+
+# ===== 1. PREPROCESSING =====
+def preprocess_image(image_bytes: bytes, resample=RESAMPLE_LANCZOS) -> np.ndarray:
+    """Decode an upload into a (128, 128, 3) uint8 array ready for batching."""
+    img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+    img = img.resize((IMG_SIZE, IMG_SIZE), resample)
+    return np.asarray(img, dtype=np.uint8)
+
+
+def to_model_input(batch: np.ndarray) -> np.ndarray:
+    """uint8 pixels -> float32 in the 0-1 range the CNN was trained on."""
+    return batch.astype(np.float32) / 255.0
+
+
+# ===== 2. THREADING & CPU AFFINITY =====
+def parse_cpu_list(spec: str) -> list:
+    """'0-3,6' -> [0, 1, 2, 3, 6]"""
+    cpus = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-")
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def runtime_config() -> dict:
+    onednn = os.environ.get("PRITHVI_TF_ONEDNN")
+    return {
+        "intra_op_threads": int(os.environ.get("PRITHVI_TF_INTRA_THREADS", "0")),
+        "inter_op_threads": int(os.environ.get("PRITHVI_TF_INTER_THREADS", "0")),
+        "onednn": None if onednn in (None, "") else onednn == "1",
+        "cpu_affinity": parse_cpu_list(os.environ.get("PRITHVI_CPU_AFFINITY", "")),
+    }
+
+
+def configure_runtime():
+    """
+    Apply the process-wide parts of runtime_config(). oneDNN has to be chosen
+    before TensorFlow is imported, so this runs ahead of the first model load
+    and is a no-op afterwards. Thread counts are applied by each runtime.
+    """
+    global _runtime_configured
+    if _runtime_configured:
+        return
+    _runtime_configured = True
+    cfg = runtime_config()
+
+    if cfg["onednn"] is not None:
+        os.environ["TF_ENABLE_ONEDNN_OPTS"] = "1" if cfg["onednn"] else "0"
+
+    if cfg["cpu_affinity"]:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cfg["cpu_affinity"])
+            print(f"📌 Pinned to CPUs {cfg['cpu_affinity']}")
+        else:
+            print("⚠️ PRITHVI_CPU_AFFINITY is not supported on this platform - ignored")
+
+    print(f"⚙️ CNN runtime: intra={cfg['intra_op_threads'] or 'auto'}, "
+          f"inter={cfg['inter_op_threads'] or 'auto'}, oneDNN={os.environ.get('TF_ENABLE_ONEDNN_OPTS', 'default')}")
+
+
+# ===== 3. RUNTIMES =====
+class KerasCNN:
+    """plant_disease_model.h5 loaded through tf.keras."""
+
+    format = "h5"
+
+    def __init__(self, path: str):
+        configure_runtime()
+        import tensorflow as tf
+        self._apply_threads(tf)
+        self.path = path
+        self.model = tf.keras.models.load_model(path)
+        self._dual = None
+
+    @staticmethod
+    def _apply_threads(tf):
+        cfg = runtime_config()
+        try:
+            if cfg["intra_op_threads"]:
+                tf.config.threading.set_intra_op_parallelism_threads(cfg["intra_op_threads"])
+            if cfg["inter_op_threads"]:
+                tf.config.threading.set_inter_op_parallelism_threads(cfg["inter_op_threads"])
+        except RuntimeError:
+            # Thread pools are fixed once TensorFlow has run its first op.
+            print("⚠️ TensorFlow already initialised - thread settings not applied")
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # model.predict() builds a tf.data pipeline per call, which dominates
+        # batch-of-one latency; calling the model directly skips that.
+        return self.model(to_model_input(batch), training=False).numpy()
+
+    def predict_with_embedding(self, batch: np.ndarray):
+        """
+        One forward pass returning (softmax, penultimate-layer features).
+        The feature layer is the last rank-2 layer before the classifier head.
+        """
+        if self._dual is None:
+            self._dual = self._build_dual_model()
+        probs, features = self._dual(to_model_input(batch), training=False)
+        return probs.numpy(), features.numpy()
+
+    def _build_dual_model(self):
+        import tensorflow as tf
+
+        if isinstance(self.model, tf.keras.Sequential):
+            # Sequential models loaded from .h5 have no symbolic outputs until
+            # re-traced, so chain the layers over a fresh Input.
+            inputs = tf.keras.Input(shape=self.model.input_shape[1:])
+            x, features = inputs, None
+            for layer in self.model.layers:
+                if len(x.shape) == 2:
+                    features = x
+                x = layer(x)
+            return tf.keras.Model(inputs, [x, features])
+
+        feature_layer = next(layer for layer in reversed(self.model.layers[:-1])
+                             if len(layer.output.shape) == 2)
+        return tf.keras.Model(self.model.inputs, [self.model.outputs[0], feature_layer.output])
+
+
+class TFLiteCNN:
+    """
+    TFLite export of the CNN. Loading by path (not by bytes) lets the
+    interpreter mmap the file read-only instead of copying it onto the heap.
+    """
+
+    format = "tflite"
+
+    def __init__(self, path: str, num_threads: int = None):
+        configure_runtime()
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        threads = num_threads or runtime_config()["intra_op_threads"] or None
+        self.path = path
+        self.interpreter = Interpreter(model_path=path, num_threads=threads)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        self.batch_size = int(self.input_detail["shape"][0])
+        # The interpreter owns mutable tensor buffers, so calls are serialised.
+        self.lock = threading.Lock()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        if self.input_detail["dtype"] == np.uint8:
+            x = batch.astype(np.uint8, copy=False)
+        else:
+            x = to_model_input(batch)
+
+        with self.lock:
+            if x.shape[0] != self.batch_size:
+                self.interpreter.resize_tensor_input(self.input_detail["index"], list(x.shape))
+                self.interpreter.allocate_tensors()
+                self.batch_size = x.shape[0]
+            self.interpreter.set_tensor(self.input_detail["index"], x)
+            self.interpreter.invoke()
+            out = self.interpreter.get_tensor(self.output_detail["index"]).copy()
+
+        scale, zero_point = self.output_detail.get("quantization", (0.0, 0))
+        if scale:
+            out = (out.astype(np.float32) - zero_point) * scale
+        return out
+
+
+# ===== 4. LOADING & EXPORT =====
+def tflite_path_for(h5_path: str) -> str:
+    return os.path.splitext(h5_path)[0] + ".tflite"
+
+
+def export_tflite(h5_path: str, tflite_path: str = None) -> str:
+    """Convert the Keras .h5 model into a .tflite flatbuffer next to it."""
+    import tensorflow as tf
+
+    tflite_path = tflite_path or tflite_path_for(h5_path)
+    model = tf.keras.models.load_model(h5_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    flatbuffer = converter.convert()
+
+    tmp_path = tflite_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(flatbuffer)
+    os.replace(tmp_path, tflite_path)
+    print(f"📦 Exported TFLite model: {tflite_path} ({len(flatbuffer) / 1e6:.1f} MB)")
+    return tflite_path
+
+
+def load_cnn(path: str, model_format: str = "h5"):
+    """Load the CNN in the requested format ("h5" or "tflite")."""
+    if model_format == "tflite":
+        if not path.endswith(".tflite"):
+            path = tflite_path_for(path)
+        return TFLiteCNN(path)
+    return KerasCNN(path)
@@ -0,0 +1,173 @@
+"""
+Response compression and conditional GETs.
+
+Plans and market reports are tens of KB of JSON, which is slow to send to a
+phone on 2G/3G. JSON compresses 5-10x.
+
+- CompressionMiddleware (ASGI): compresses text/JSON responses of at least
+  `minimum_size` bytes with brotli if the client accepts it and the
+  `brotli` package is installed, else gzip. It sets Content-Encoding and
+  Vary, and passes everything else through untouched.
+- HttpCache: stores serialized GET responses with a weak ETag and
+  Last-Modified. A request whose If-None-Match (or If-Modified-Since)
+  matches gets a 304 straight from the stored validator: nothing is
+  generated or serialized again.
+
+bench_compression.py measures bytes on the wire and latency over a
+throttled local link.
+"""
+import gzip
+import hashlib
+import json
+import time
+from email.utils import formatdate, parsedate_to_datetime
+
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = (b"application/json", b"text/", b"application/javascript", b"image/svg+xml")
+
+
+def accepted_encodings(header: bytes) -> dict:
+    """{'br': 1.0, 'gzip': 0.8, ...} from an Accept-Encoding header."""
+    weights = {}
+    for part in header.decode("latin-1").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name.strip().lower()] = q
+    return weights
+
+
+def choose_encoding(header: bytes):
+    weights = accepted_encodings(header)
+    if brotli is not None and weights.get("br", 0) > 0:
+        return "br"
+    if weights.get("gzip", 0) > 0 or weights.get("*", 0) > 0:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """ASGI middleware: `app.add_middleware(CompressionMiddleware, minimum_size=1024)`."""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(dict(scope.get("headers") or []).get(b"accept-encoding", b""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start, chunks = None, []
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start, passthrough
+            if passthrough:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                start = message
+                headers = dict(message.get("headers") or [])
+                content_type = headers.get(b"content-type", b"")
+                if b"content-encoding" in headers or not content_type.startswith(COMPRESSIBLE):
+                    passthrough = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+            chunks.append(message.get("body", b""))
+            if message.get("more_body"):
+                return
+            await self._finish(send, start, b"".join(chunks), encoding)
+
+        await self.app(scope, receive, compressing_send)
+
+    async def _finish(self, send, start: dict, body: bytes, encoding: str):
+        headers = [(k, v) for k, v in start.get("headers") or [] if k != b"content-length"]
+        if len(body) >= self.minimum_size and start["status"] not in (204, 304):
+            if encoding == "br":
+                body = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                body = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+            headers.append((b"content-encoding", encoding.encode()))
+            vary = [v for k, v in headers if k == b"vary"]
+            if not any(b"accept-encoding" in v.lower() for v in vary):
+                headers.append((b"vary", b"Accept-Encoding"))
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send({**start, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+class HttpCache:
+    """
+    Serialized GET responses with validators, in a SharedCache:
+    resource key -> {"etag", "last_modified", "body"}.
+    """
+
+    def __init__(self, cache, max_age: int = 300):
+        self.cache = cache
+        self.max_age = max_age
+        self.counts = {"not_modified": 0, "hits": 0, "generated": 0}
+
+    def _headers(self, entry: dict, max_age: int) -> dict:
+        return {"ETag": entry["etag"], "Last-Modified": entry["last_modified"],
+                "Cache-Control": f"public, max-age={max_age}"}
+
+    async def respond(self, request, key: str, produce, ttl, max_age: int = None):
+        """
+        304 if the client's validators match the stored entry; else the stored
+        body; else `await produce()`, stored for `ttl` seconds. `ttl` may be a
+        function of the payload; 0 means don't store it (e.g. an offline fallback).
+        """
+        max_age = self.max_age if max_age is None else max_age
+        entry = self.cache.get(key)
+        if entry is not None:
+            if not_modified(request, entry):
+                self.counts["not_modified"] += 1
+                return Response(status_code=304, headers=self._headers(entry, max_age))
+            self.counts["hits"] += 1
+        else:
+            payload = await produce()
+            body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+            entry = {
+                "etag": 'W/"' + hashlib.sha1(body.encode("utf-8")).hexdigest()[:20] + '"',
+                "last_modified": formatdate(time.time(), usegmt=True),
+                "body": body,
+            }
+            self.counts["generated"] += 1
+            seconds = ttl(payload) if callable(ttl) else ttl
+            if not seconds:
+                return Response(body, media_type="application/json", headers={"Cache-Control": "no-store"})
+            self.cache.set(key, entry, ttl=seconds)
+            if not_modified(request, entry):
+                return Response(status_code=304, headers=self._headers(entry, max_age))
+        return Response(entry["body"], media_type="application/json", headers=self._headers(entry, max_age))
+
+
+def not_modified(request, entry: dict) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or entry["etag"].removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(entry["last_modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
@@ -0,0 +1,297 @@
+"""
+Preprocessed, memory-mapped dataset shards for evaluation and retraining.
+
+Every pass over the New Plant Diseases Dataset folders (calibration, TTA
+benchmarks, retraining) decodes and resizes tens of thousands of JPEGs,
+which is CPU-bound and dominates the run. `ingest` does that once, in
+parallel, with the same decode + Lanczos resize the server applies to
+uploads (cnn_model.preprocess_image), and writes the results as contiguous
+uint8 arrays:
+
+    shards/train/manifest.json                classes, image size, shard list
+    shards/train/shard-00000.images.npy       (N, 128, 128, 3) uint8
+    shards/train/shard-00000.labels.npy       (N,) uint8 index into CLASS_NAMES
+
+Images are written in a seeded random order, so each shard mixes all
+classes. ShardDataset opens the .npy files with mmap_mode="r": a batch is a
+slice of the mapped file (no copy, no decode), pages come from the OS page
+cache, and every process reading the same shards shares them.
+
+    python dataset_shards.py ingest --data "<...>/train"
+    python dataset_shards.py info   --shards shards/train
+    python dataset_shards.py eval   --shards shards/valid --model-path plant_disease_model.h5
+    python dataset_shards.py bench  --data "<...>/valid" --shards shards/valid
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from class_index import CLASS_NAMES
+from cnn_model import IMG_SIZE, preprocess_image, to_model_input
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ROOT = os.path.join(BASE_DIR, "shards")
+MANIFEST = "manifest.json"
+SHARD_SIZE = 4096  # ~200 MB of pixels per shard
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+# ===== 1. INGEST =====
+def list_images(data_dir: str, limit: int = None) -> list:
+    """[(path, class index)] for every image under a sub-folder named after one of CLASS_NAMES."""
+    items = []
+    for name in sorted(os.listdir(data_dir)):
+        folder = os.path.join(data_dir, name)
+        if name not in CLASS_NAMES or not os.path.isdir(folder):
+            continue
+        files = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTS))
+        items += [(os.path.join(folder, f), CLASS_NAMES.index(name)) for f in files[:limit]]
+    return items
+
+
+def decode_file(path: str):
+    try:
+        with open(path, "rb") as f:
+            return preprocess_image(f.read())
+    except Exception as e:  # a corrupt file shouldn't abort a 70k-image ingest
+        print(f"⚠️ Skipping {path}: {type(e).__name__}: {e}")
+        return None
+
+
+def ingest(data_dir: str, out_dir: str, shard_size: int = SHARD_SIZE, workers: int = None,
+           seed: int = 0, limit: int = None) -> dict:
+    """Decode every image under `data_dir` once and write uint8 shards plus a manifest to `out_dir`."""
+    items = list_images(data_dir, limit)
+    if not items:
+        raise ValueError(f"No class folders matching CLASS_NAMES under {data_dir}")
+    random.Random(seed).shuffle(items)
+    os.makedirs(out_dir, exist_ok=True)
+
+    shards, skipped, start = [], 0, time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        decoded = pool.imap(decode_file, [path for path, _ in items], chunksize=64)
+        for n, first in enumerate(range(0, len(items), shard_size)):
+            chunk = items[first:first + shard_size]
+            name = f"shard-{n:05d}"
+            images_path = os.path.join(out_dir, name + ".images.npy")
+            labels_path = os.path.join(out_dir, name + ".labels.npy")
+
+            # Written straight into the mapped file, so a shard never has to fit in RAM twice.
+            images = np.lib.format.open_memmap(images_path + ".tmp", mode="w+", dtype=np.uint8,
+                                               shape=(len(chunk), IMG_SIZE, IMG_SIZE, 3))
+            labels, filled = [], 0
+            for _, label in chunk:
+                image = next(decoded)
+                if image is None:
+                    skipped += 1
+                    continue
+                images[filled] = image
+                labels.append(label)
+                filled += 1
+            images.flush()
+            if filled < len(chunk):
+                np.save(images_path, images[:filled])
+                del images
+                os.remove(images_path + ".tmp")
+            else:
+                del images
+                os.replace(images_path + ".tmp", images_path)
+            np.save(labels_path, np.array(labels, dtype=np.uint8))
+
+            shards.append({"images": os.path.basename(images_path), "labels": os.path.basename(labels_path),
+                           "count": filled})
+            done = first + len(chunk)
+            print(f"   {name}: {filled} images ({done}/{len(items)}, "
+                  f"{done / (time.perf_counter() - start):.0f} img/s)")
+
+    manifest = {
+        "classes": CLASS_NAMES,
+        "img_size": IMG_SIZE,
+        "dtype": "uint8",
+        "source": os.path.abspath(data_dir),
+        "seed": seed,
+        "images": sum(s["count"] for s in shards),
+        "skipped": skipped,
+        "shards": shards,
+        "created_at": time.time(),
+    }
+    tmp_path = os.path.join(out_dir, MANIFEST + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST))
+    return manifest
+
+
+# ===== 2. LOADER =====
+class ShardDataset:
+    """Read-only view over an ingested shard directory."""
+
+    def __init__(self, root: str):
+        with open(os.path.join(root, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest["img_size"] != IMG_SIZE or self.manifest["classes"] != CLASS_NAMES:
+            raise ValueError(f"{root} was ingested for a different image size or class list")
+        self.root = root
+        self.images = [np.load(os.path.join(root, s["images"]), mmap_mode="r") for s in self.manifest["shards"]]
+        self.labels = [np.load(os.path.join(root, s["labels"])) for s in self.manifest["shards"]]
+
+    def __len__(self) -> int:
+        return sum(len(labels) for labels in self.labels)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(images.nbytes for images in self.images)
+
+    def all_labels(self) -> np.ndarray:
+        return np.concatenate(self.labels) if self.labels else np.zeros(0, dtype=np.uint8)
+
+    def batches(self, batch_size: int = 64, shuffle: bool = False, seed: int = None,
+                drop_remainder: bool = False):
+        """
+        Yield (images, labels) with images a (B, 128, 128, 3) uint8 slice of
+        the mapped shard - no copy. Batches never span two shards, so the
+        last batch of each shard may be short unless drop_remainder.
+        shuffle permutes the order of batches; images are already shuffled
+        within shards by ingest, so this is enough for SGD.
+        """
+        blocks = [(s, first) for s, labels in enumerate(self.labels)
+                  for first in range(0, len(labels), batch_size)
+                  if not drop_remainder or first + batch_size <= len(labels)]
+        if shuffle:
+            np.random.default_rng(seed).shuffle(blocks)
+        for s, first in blocks:
+            yield self.images[s][first:first + batch_size], self.labels[s][first:first + batch_size]
+
+
+# ===== 3. CLI: info / eval / bench =====
+def _to_batches(images, batch_size: int):
+    """Stack decoded images into model-input batches, skipping unreadable files (None)."""
+    batch = []
+    for image in images:
+        if image is None:
+            continue
+        batch.append(image)
+        if len(batch) == batch_size:
+            to_model_input(np.stack(batch))
+            batch = []
+    if batch:
+        to_model_input(np.stack(batch))
+
+
+def _jpeg_pass(paths: list, batch_size: int, workers: int) -> float:
+    start = time.perf_counter()
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            _to_batches(pool.imap(decode_file, paths, chunksize=16), batch_size)
+    else:
+        _to_batches(map(decode_file, paths), batch_size)
+    return time.perf_counter() - start
+
+
+def _shard_pass(dataset: ShardDataset, count: int, batch_size: int) -> float:
+    start, seen = time.perf_counter(), 0
+    for images, _ in dataset.batches(batch_size):
+        to_model_input(images[:count - seen])
+        seen += len(images)
+        if seen >= count:
+            break
+    return time.perf_counter() - start
+
+
+def bench(args):
+    dataset = ShardDataset(args.shards)
+    paths = [path for path, _ in list_images(args.data, args.limit)]
+    count = min(len(paths), len(dataset))
+    paths = paths[:count]
+    workers = args.workers or os.cpu_count()
+    print(f"📊 {count} images -> float32 batches of {args.batch_size}")
+    print(f"\n{'source':<28} {'seconds':>8} {'img/s':>10}")
+
+    rows = [("JPEG decode, 1 process", _jpeg_pass(paths, args.batch_size, 1))]
+    if workers > 1:
+        rows.append((f"JPEG decode, {workers} processes", _jpeg_pass(paths, args.batch_size, workers)))
+    # The first shard pass may still read from disk; the second is served from the page cache.
+    rows.append(("mmap shards, first pass", _shard_pass(dataset, count, args.batch_size)))
+    rows.append(("mmap shards, warm", _shard_pass(dataset, count, args.batch_size)))
+    for label, seconds in rows:
+        print(f"{label:<28} {seconds:>8.2f} {count / seconds:>10.0f}")
+    print(f"\n   shards are {dataset.nbytes / 1e9:.2f} GB on disk for {len(dataset)} images")
+
+
+def evaluate(args):
+    from cnn_model import load_cnn
+
+    dataset = ShardDataset(args.shards)
+    model = load_cnn(args.model_path, args.format)
+    correct = np.zeros(len(CLASS_NAMES), dtype=np.int64)
+    total = np.zeros(len(CLASS_NAMES), dtype=np.int64)
+    start = time.perf_counter()
+    for images, labels in dataset.batches(args.batch_size):
+        hits = model.predict(images).argmax(axis=1) == labels
+        np.add.at(correct, labels, hits)
+        np.add.at(total, labels, 1)
+    seconds = time.perf_counter() - start
+
+    print(f"🎯 accuracy {correct.sum() / max(total.sum(), 1) * 100:.2f}% on {total.sum()} images "
+          f"({total.sum() / seconds:.0f} img/s)")
+    for idx in np.argsort(correct / np.maximum(total, 1))[:args.worst]:
+        if total[idx]:
+            print(f"   {CLASS_NAMES[idx]:<48} {correct[idx] / total[idx] * 100:>6.1f}%  ({total[idx]})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ingest", help="decode a class-per-folder image tree into shards")
+    p.add_argument("--data", required=True, help="folder with one sub-folder per class")
+    p.add_argument("--out", default=None, help="default: shards/<name of --data>")
+    p.add_argument("--shard-size", type=int, default=SHARD_SIZE)
+    p.add_argument("--workers", type=int, default=None, help="decode processes (default: one per core)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--limit", type=int, default=None, help="images per class")
+
+    p = sub.add_parser("info", help="summarise a shard directory")
+    p.add_argument("--shards", required=True)
+
+    p = sub.add_parser("eval", help="CNN accuracy over a shard directory")
+    p.add_argument("--shards", required=True)
+    p.add_argument("--model-path", default=os.path.join(BASE_DIR, "plant_disease_model.h5"))
+    p.add_argument("--format", default="h5", choices=["h5", "tflite"])
+    p.add_argument("--batch-size", type=int, default=64)
+    p.add_argument("--worst", type=int, default=5, help="print the N least accurate classes")
+
+    p = sub.add_parser("bench", help="batch throughput: JPEG decoding vs mapped shards")
+    p.add_argument("--data", required=True, help="the JPEG folder the shards were ingested from")
+    p.add_argument("--shards", required=True)
+    p.add_argument("--batch-size", type=int, default=64)
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--limit", type=int, default=100, help="images per class")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        out = args.out or os.path.join(DEFAULT_ROOT, os.path.basename(os.path.normpath(args.data)))
+        start = time.perf_counter()
+        manifest = ingest(args.data, out, args.shard_size, args.workers, args.seed, args.limit)
+        print(f"✅ {manifest['images']} images in {len(manifest['shards'])} shards at {out} "
+              f"({time.perf_counter() - start:.0f} s, {manifest['skipped']} skipped)")
+    elif args.command == "info":
+        dataset = ShardDataset(args.shards)
+        counts = np.bincount(dataset.all_labels(), minlength=len(CLASS_NAMES))
+        print(f"📦 {len(dataset)} images, {len(dataset.images)} shards, {dataset.nbytes / 1e9:.2f} GB "
+              f"from {dataset.manifest['source']}")
+        for idx, name in enumerate(CLASS_NAMES):
+            print(f"   {name:<48} {counts[idx]:>6}")
+    elif args.command == "eval":
+        evaluate(args)
+    else:
+        bench(args)
+
+
+if __name__ == "__main__":
+    main()
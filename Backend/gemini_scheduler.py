@@ -0,0 +1,246 @@
+"""
+Central scheduler for every Gemini call made by the API.
+
+All routes share one API key, so they share one quota. Calls are queued per
+priority class (scan > advice > plan > market) and dispatched by a single
+thread:
+
+- a global token bucket matches the key's requests-per-minute quota, and an
+  optional per-class bucket caps low-priority classes to a share of it, so a
+  burst of market refreshes can't use up the quota scans need;
+- the highest-priority class with a queued call and a free token always goes
+  next, and at most `concurrency` calls are in flight;
+- every class has a bounded queue and a deadline. A call is rejected up front
+  if its queue is full or the expected wait already exceeds its deadline, and
+  dropped if it is still queued when the deadline passes. Both raise
+  GeminiUnavailable, which the routes already turn into their fallback
+  response.
+
+Queue wait time, shed counts and errors are kept per class for /gemini-stats.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import threading
+import time
+
+import numpy as np
+
+
+class GeminiUnavailable(RuntimeError):
+    """The call was shed by the scheduler instead of being sent to Gemini."""
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, burst: float):
+        self.rate = rate_per_second
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (0 if one is available now)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+
+# priority: lower runs first. share: fraction of the quota the class may use.
+DEFAULT_CLASSES = {
+    "scan":   {"priority": 0, "deadline": 10.0, "max_queue": 64, "share": 1.0},
+    "advice": {"priority": 1, "deadline": 15.0, "max_queue": 64, "share": 1.0},
+    "plan":   {"priority": 2, "deadline": 30.0, "max_queue": 32, "share": 0.5},
+    "market": {"priority": 3, "deadline": 20.0, "max_queue": 16, "share": 0.25},
+}
+
+
+class _Call:
+    __slots__ = ("fn", "args", "kwargs", "future", "enqueued", "deadline")
+
+    def __init__(self, fn, args, kwargs, deadline):
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self.future = concurrent.futures.Future()
+        self.enqueued = time.monotonic()
+        self.deadline = deadline
+
+
+class _ClassStats:
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.errors = 0
+        self.shed_queue_full = 0
+        self.shed_deadline = 0
+        self.waits = collections.deque(maxlen=1000)
+
+    def as_dict(self, queued: int) -> dict:
+        waits = np.array(self.waits) * 1000 if self.waits else np.zeros(1)
+        return {
+            "queued": queued,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "errors": self.errors,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_deadline": self.shed_deadline,
+            "wait_ms_p50": round(float(np.percentile(waits, 50)), 1),
+            "wait_ms_p95": round(float(np.percentile(waits, 95)), 1),
+            "wait_ms_max": round(float(waits.max()), 1),
+        }
+
+
+class GeminiScheduler:
+    def __init__(self, requests_per_minute: float = 60, burst: float = None, concurrency: int = 4,
+                 classes: dict = None):
+        rate = requests_per_minute / 60.0
+        burst = burst if burst is not None else max(1.0, rate * 5)
+        self.classes = classes or DEFAULT_CLASSES
+        self.order = sorted(self.classes, key=lambda c: self.classes[c]["priority"])
+        self.bucket = TokenBucket(rate, burst)
+        self.class_buckets = {
+            name: TokenBucket(rate * cfg["share"], max(1.0, burst * cfg["share"]))
+            for name, cfg in self.classes.items() if cfg["share"] < 1.0
+        }
+        self.concurrency = concurrency
+        self.queues = {name: collections.deque() for name in self.classes}
+        self.stats = {name: _ClassStats() for name in self.classes}
+        self.in_flight = 0
+        self.cond = threading.Condition()
+        self.executor = concurrent.futures.ThreadPoolExecutor(concurrency, thread_name_prefix="gemini")
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch, name="gemini-scheduler", daemon=True)
+        self._dispatcher.start()
+
+    # ----- submitting -----
+
+    def submit(self, cls: str, fn, *args, deadline: float = None, **kwargs) -> concurrent.futures.Future:
+        """Queue fn(*args, **kwargs) under priority class `cls`; returns a Future."""
+        cfg = self.classes[cls]
+        deadline = cfg["deadline"] if deadline is None else deadline
+        call = _Call(fn, args, kwargs, time.monotonic() + deadline)
+        with self.cond:
+            stats = self.stats[cls]
+            stats.submitted += 1
+            if len(self.queues[cls]) >= cfg["max_queue"]:
+                stats.shed_queue_full += 1
+                call.future.set_exception(GeminiUnavailable(f"{cls} queue full"))
+                return call.future
+            if self._expected_wait(cls) > deadline:
+                stats.shed_deadline += 1
+                call.future.set_exception(GeminiUnavailable(f"{cls} deadline ({deadline:.0f}s) can't be met"))
+                return call.future
+            self.queues[cls].append(call)
+            self.cond.notify()
+        return call.future
+
+    def call(self, cls: str, fn, *args, **kwargs):
+        """Blocking submit + wait, for sync code."""
+        return self.submit(cls, fn, *args, **kwargs).result()
+
+    async def acall(self, cls: str, fn, *args, **kwargs):
+        """Awaitable submit + wait; the event loop is not blocked while queued or running."""
+        return await asyncio.wrap_future(self.submit(cls, fn, *args, **kwargs))
+
+    def _expected_wait(self, cls: str) -> float:
+        """Rough wait: calls queued ahead (same or higher priority) drained at the quota rate."""
+        priority = self.classes[cls]["priority"]
+        ahead = sum(len(self.queues[c]) for c in self.order if self.classes[c]["priority"] <= priority)
+        bucket = self.class_buckets.get(cls, self.bucket)
+        now = time.monotonic()
+        return max(self.bucket.wait_time(now), bucket.wait_time(now)) + ahead / bucket.rate
+
+    # ----- dispatching -----
+
+    def _dispatch(self):
+        with self.cond:
+            while not self._closed:
+                timeout = self._dispatch_ready()
+                self.cond.wait(timeout)
+
+    def _dispatch_ready(self):
+        """Start every call that may start now; returns how long to sleep (None = until notified)."""
+        sleep = None
+        while self.in_flight < self.concurrency:
+            now = time.monotonic()
+            self._drop_expired(now)
+            global_wait = self.bucket.wait_time(now)
+            chosen = None
+            for cls in self.order:
+                if not self.queues[cls]:
+                    continue
+                wait = max(global_wait, self.class_buckets[cls].wait_time(now) if cls in self.class_buckets else 0.0)
+                if wait == 0.0:
+                    chosen = cls
+                    break
+                sleep = wait if sleep is None else min(sleep, wait)
+                if global_wait > 0:
+                    # Lower classes can't go either; the first queued class gets the next token.
+                    break
+            if chosen is None:
+                return self._until_next_deadline(now, sleep)
+
+            call = self.queues[chosen].popleft()
+            self.bucket.take(now)
+            if chosen in self.class_buckets:
+                self.class_buckets[chosen].take(now)
+            self.stats[chosen].waits.append(now - call.enqueued)
+            self.in_flight += 1
+            self.executor.submit(self._run, chosen, call)
+        return self._until_next_deadline(time.monotonic(), sleep)
+
+    def _until_next_deadline(self, now: float, sleep):
+        """Wake up in time to shed a queued call whose deadline passes while it waits."""
+        deadlines = [queue[0].deadline for queue in self.queues.values() if queue]
+        if not deadlines:
+            return sleep
+        until = max(0.0, min(deadlines) - now)
+        return until if sleep is None else min(sleep, until)
+
+    def _drop_expired(self, now: float):
+        for cls, queue in self.queues.items():
+            while queue and queue[0].deadline <= now:
+                call = queue.popleft()
+                self.stats[cls].shed_deadline += 1
+                call.future.set_exception(GeminiUnavailable(f"{cls} deadline passed while queued"))
+
+    def _run(self, cls: str, call: _Call):
+        try:
+            result = call.fn(*call.args, **call.kwargs)
+        except BaseException as e:
+            with self.cond:
+                self.stats[cls].errors += 1
+            call.future.set_exception(e)
+        else:
+            with self.cond:
+                self.stats[cls].completed += 1
+            call.future.set_result(result)
+        finally:
+            with self.cond:
+                self.in_flight -= 1
+                self.cond.notify()
+
+    # ----- reporting / shutdown -----
+
+    def report(self) -> dict:
+        with self.cond:
+            return {
+                "requests_per_minute": round(self.bucket.rate * 60, 1),
+                "in_flight": self.in_flight,
+                "tokens": round(self.bucket.tokens, 2),
+                "classes": {cls: self.stats[cls].as_dict(len(self.queues[cls])) for cls in self.order},
+            }
+
+    def close(self):
+        with self.cond:
+            self._closed = True
+            for cls, queue in self.queues.items():
+                while queue:
+                    queue.popleft().future.set_exception(GeminiUnavailable("scheduler shut down"))
+            self.cond.notify()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,252 @@
+"""
+`Idempotency-Key` support for every POST route.
+
+The frontend retries a request that hasn't answered in 30 s, but on the
+slow routes (scans, plans) the first attempt is usually still running, so
+every retry used to start another identical Gemini call. With this ASGI
+middleware, a POST carrying an `Idempotency-Key` header runs at most once
+per (path, key):
+
+- A duplicate that arrives while the first request is still running waits
+  for it and gets the same response, whether the original runs in this
+  worker (shared future) or another one (polls the shared table).
+- A completed response (status < 500) is stored for PRITHVI_IDEMPOTENCY_TTL
+  seconds and replayed with `Idempotent-Replayed: true`. 5xx responses and
+  crashes are not stored, so the next retry runs again. Neither are
+  responses a route marks with do_not_store(): failures reported in a 200
+  body, and fallback payloads served while Gemini was down.
+- Reusing a key with a different request body is a 422.
+
+State lives in SQLite (WAL) next to the other caches, so every uvicorn
+worker sees the same keys. A claim whose worker died is taken over once
+its lease (PRITHVI_IDEMPOTENCY_LEASE seconds) runs out.
+"""
+import asyncio
+import contextvars
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency (
+    key         TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    status      INTEGER,
+    headers     TEXT,
+    body        BLOB,
+    created_at  REAL NOT NULL,
+    expires_at  REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+CLAIMED, PENDING, DONE, MISMATCH = "claimed", "pending", "done", "mismatch"
+
+# Per-request flags set by the middleware. A mutable dict rather than a bare
+# value, so a route running in a copied context (threadpool) still reaches it.
+_request_flags = contextvars.ContextVar("idempotency_flags", default=None)
+
+
+def do_not_store():
+    """Mark the current request's response as transient: sent, but not replayed to retries."""
+    flags = _request_flags.get()
+    if flags is not None:
+        flags["store"] = False
+
+
+class IdempotencyStore:
+    """Claims and stored responses, shared by every worker through one SQLite file."""
+
+    def __init__(self, db_path: str, ttl_seconds: float = 900, lease_seconds: float = 300):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+        self.counts = {"executed": 0, "replayed": 0, "joined": 0, "mismatched": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key: str, fingerprint: str) -> tuple:
+        """(CLAIMED, None) if the caller should run the request, else (PENDING | DONE | MISMATCH, row)."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM idempotency WHERE expires_at < ?", (now,))
+            row = conn.execute(
+                "SELECT fingerprint, status, headers, body FROM idempotency WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT INTO idempotency (key, fingerprint, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, fingerprint, now, now + self.lease_seconds),
+                )
+        finally:
+            conn.execute("COMMIT")
+        if row is None:
+            return CLAIMED, None
+        if row[0] != fingerprint:
+            return MISMATCH, row
+        return (PENDING if row[1] is None else DONE), row
+
+    def complete(self, key: str, status: int, headers: list, body: bytes):
+        self._connect().execute(
+            "UPDATE idempotency SET status = ?, headers = ?, body = ?, expires_at = ? WHERE key = ?",
+            (status, json.dumps([[k.decode("latin-1"), v.decode("latin-1")] for k, v in headers]),
+             body, time.time() + self.ttl_seconds, key),
+        )
+
+    def release(self, key: str):
+        self._connect().execute("DELETE FROM idempotency WHERE key = ? AND status IS NULL", (key,))
+
+    def report(self) -> dict:
+        stored, in_flight = self._connect().execute(
+            "SELECT COUNT(status), COUNT(*) - COUNT(status) FROM idempotency WHERE expires_at >= ?",
+            (time.time(),),
+        ).fetchone()
+        return {**self.counts, "stored": stored, "in_flight": in_flight, "ttl_seconds": self.ttl_seconds}
+
+
+def fingerprint(scope: dict, body: bytes) -> str:
+    """Hash of method, path, query and body. Multipart boundaries are random per attempt, so they're blanked."""
+    headers = dict(scope.get("headers") or [])
+    boundary = re.search(rb"boundary=\"?([^\";]+)", headers.get(b"content-type", b""))
+    if boundary:
+        body = body.replace(boundary.group(1), b"")
+    digest = hashlib.sha256()
+    for part in (scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware: `app.add_middleware(IdempotencyMiddleware, store=IdempotencyStore(...))`."""
+
+    def __init__(self, app, store: IdempotencyStore, header: str = "idempotency-key",
+                 wait_seconds: float = 120, poll_seconds: float = 0.25):
+        self.app = app
+        self.store = store
+        self.header = header.lower().encode("latin-1")
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self._inflight = {}  # key -> asyncio.Future, for requests running in this worker
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+        client_key = dict(scope.get("headers") or []).get(self.header)
+        if not client_key:
+            return await self.app(scope, receive, send)
+
+        body = await self._read_body(receive)
+        key = hashlib.sha256(scope["path"].encode() + b"\n" + client_key).hexdigest()
+        fp = fingerprint(scope, body)
+        deadline = time.monotonic() + self.wait_seconds
+        joined = False
+
+        while True:
+            state, row = self.store.claim(key, fp)
+            if state == CLAIMED:
+                return await self._execute(key, scope, body, receive, send)
+            if state == MISMATCH:
+                self.store.counts["mismatched"] += 1
+                return await self._send(send, 422, [(b"content-type", b"application/json")], json.dumps({
+                    "detail": "Idempotency-Key was already used with a different request body"
+                }).encode())
+            if state == DONE:
+                self.store.counts["replayed"] += 1
+                return await self._replay(send, row[1], json.loads(row[2]), row[3])
+
+            # Still running: wait for it here if it's ours, else poll the table.
+            if not joined:
+                self.store.counts["joined"] += 1
+                joined = True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return await self._send(send, 409, [(b"content-type", b"application/json"), (b"retry-after", b"5")],
+                                        b'{"detail": "The original request with this Idempotency-Key is still running"}')
+            future = self._inflight.get(key)
+            if future is not None:
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(min(self.poll_seconds, remaining))
+
+    async def _execute(self, key: str, scope, body: bytes, receive, send):
+        self.store.counts["executed"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        start, chunks = {}, []
+        delivered = True
+        flags = {"store": True}
+        token = _request_flags.set(flags)
+
+        async def replay_receive():
+            nonlocal body
+            if body is not None:
+                message, body = {"type": "http.request", "body": body, "more_body": False}, None
+                return message
+            return await receive()
+
+        async def capture_send(message):
+            nonlocal delivered
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            # Keep going if the client has gone: a retry will pick the result up.
+            if delivered:
+                try:
+                    await send(message)
+                except Exception:
+                    delivered = False
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            self.store.release(key)
+            raise
+        else:
+            status = start.get("status", 500)
+            if status < 500 and flags["store"]:
+                self.store.complete(key, status, start.get("headers", []), b"".join(chunks))
+            else:
+                self.store.release(key)
+        finally:
+            _request_flags.reset(token)
+            self._inflight.pop(key, None)
+            future.set_result(None)
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    async def _replay(self, send, status: int, headers: list, body: bytes):
+        raw = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        await self._send(send, status, raw + [(b"idempotent-replayed", b"true")], body)
+
+    @staticmethod
+    async def _send(send, status: int, headers: list, body: bytes):
+        if not any(k == b"content-length" for k, _ in headers):
+            headers = headers + [(b"content-length", str(len(body)).encode())]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
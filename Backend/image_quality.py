@@ -0,0 +1,229 @@
+"""
+Cheap image pre-check that runs before any scan tier.
+
+Blurry, dark or non-leaf photos used to cost a full Gemini call (which
+then said `is_plant: false`) or a CNN pass that confidently returned a
+wrong class. This check decodes a small thumbnail (JPEG draft mode, so
+the full-resolution image is never decoded) and measures:
+
+- sharpness: variance of the Laplacian of the grayscale thumbnail;
+- exposure: mean brightness and the fractions of crushed / blown pixels;
+- vegetation: fraction of pixels whose colour is leaf-like (green, or the
+  yellow/brown of diseased tissue), with the green share on its own.
+
+Each metric has a warn and a reject threshold. If quality_model.json exists
+(fit with `python image_quality.py fit`), a small logistic classifier over
+the same features decides "not a plant" instead of the vegetation
+thresholds. A check takes a few milliseconds.
+
+    python image_quality.py check photo.jpg ...
+    python image_quality.py fit --plants leaves/ --others not_leaves/
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL = os.path.join(BASE_DIR, "quality_model.json")
+THUMB_SIZE = 128
+
+# metric: (reject below, warn below) -- or above, for the *_clipped metrics.
+THRESHOLDS = {
+    "sharpness": (15.0, 60.0),
+    "brightness": (0.12, 0.22),
+    "dark_clipped": (0.85, 0.60),
+    "bright_clipped": (0.80, 0.50),
+    "vegetation": (0.04, 0.12),
+}
+REASONS = {
+    "sharpness": "Photo is blurry. Hold the phone steady and tap the leaf to focus.",
+    "brightness": "Photo is too dark. Move to daylight or turn on the flash.",
+    "dark_clipped": "Much of the photo is in deep shadow. Face the leaf towards the light.",
+    "bright_clipped": "Photo is overexposed. Avoid direct sun glare on the leaf.",
+    "vegetation": "No leaf found in the photo. Fill the frame with one leaf.",
+}
+VERDICT_RANK = {"ok": 0, "warn": 1, "reject": 2}
+FEATURES = ["sharpness", "brightness", "dark_clipped", "bright_clipped", "vegetation", "green", "saturation"]
+
+
+def thumbnail(image_bytes: bytes, size: int = THUMB_SIZE) -> np.ndarray:
+    """RGB float32 array in [0, 1], longest side about `size` px."""
+    img = Image.open(io.BytesIO(image_bytes))
+    img.draft("RGB", (size, size))  # JPEG: decode at 1/2../1/8 scale directly
+    img = img.convert("RGB")
+    img.thumbnail((size, size), Image.BILINEAR)
+    return np.asarray(img, dtype=np.float32) / 255.0
+
+
+def measure(rgb: np.ndarray) -> dict:
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    gray = 0.299 * r + 0.587 * g + 0.114 * b
+
+    # 4-neighbour Laplacian on 0-255 grayscale.
+    g255 = gray * 255
+    lap = (g255[1:-1, :-2] + g255[1:-1, 2:] + g255[:-2, 1:-1] + g255[2:, 1:-1]) - 4 * g255[1:-1, 1:-1]
+
+    # Hue / saturation without a full HSV conversion.
+    cmax, cmin = rgb.max(axis=-1), rgb.min(axis=-1)
+    delta = cmax - cmin
+    saturation = np.where(cmax > 0, delta / np.maximum(cmax, 1e-6), 0)
+    safe = np.maximum(delta, 1e-6)
+    hue = np.select(
+        [cmax == r, cmax == g],
+        [((g - b) / safe) % 6, (b - r) / safe + 2],
+        (r - g) / safe + 4,
+    ) * 60
+    coloured = (saturation > 0.18) & (cmax > 0.12)
+    green = coloured & (hue >= 65) & (hue <= 170)
+    # Yellow / brown lesions and chlorotic tissue count as leaf too.
+    leafy = green | (coloured & (hue >= 20) & (hue < 65))
+
+    return {
+        "sharpness": float(lap.var()),
+        "brightness": float(gray.mean()),
+        "dark_clipped": float((gray < 0.06).mean()),
+        "bright_clipped": float((gray > 0.97).mean()),
+        "vegetation": float(leafy.mean()),
+        "green": float(green.mean()),
+        "saturation": float(saturation.mean()),
+    }
+
+
+class QualityModel:
+    """Logistic regression over FEATURES (log-scaled sharpness) -> P(plant photo)."""
+
+    def __init__(self, weights: list, bias: float, mean: list, std: list, threshold: float = 0.5):
+        self.weights = np.array(weights)
+        self.bias = bias
+        self.mean = np.array(mean)
+        self.std = np.array(std)
+        self.threshold = threshold
+
+    @staticmethod
+    def vector(metrics: dict) -> np.ndarray:
+        x = np.array([metrics[name] for name in FEATURES], dtype=np.float64)
+        x[0] = np.log1p(x[0])
+        return x
+
+    def probability(self, metrics: dict) -> float:
+        z = (self.vector(metrics) - self.mean) / self.std
+        return float(1 / (1 + np.exp(-(z @ self.weights + self.bias))))
+
+    @classmethod
+    def load(cls, path: str):
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return cls(**json.load(f))
+
+
+def assess(image_bytes: bytes, model: QualityModel = None) -> dict:
+    """
+    {"verdict": "ok" | "warn" | "reject", "reasons": [...], "metrics": {...}, "ms": ...}.
+    Reject = don't spend a scan tier on it; warn = scan, but tell the farmer.
+    """
+    start = time.perf_counter()
+    try:
+        metrics = measure(thumbnail(image_bytes))
+    except Exception as e:
+        return {"verdict": "reject", "reasons": [f"Could not read the image ({type(e).__name__})."],
+                "metrics": {}, "ms": round((time.perf_counter() - start) * 1000, 2)}
+
+    verdict, reasons = "ok", []
+
+    def flag(name: str, level: str):
+        nonlocal verdict
+        verdict = max(verdict, level, key=VERDICT_RANK.get)
+        reasons.append(REASONS[name])
+
+    for name, (reject, warn) in THRESHOLDS.items():
+        if name == "vegetation" and model is not None:
+            continue
+        value = metrics[name]
+        worse = (lambda v, t: v > t) if name.endswith("_clipped") else (lambda v, t: v < t)
+        if worse(value, reject):
+            flag(name, "reject")
+        elif worse(value, warn):
+            flag(name, "warn")
+
+    if model is not None:
+        metrics["plant_probability"] = round(model.probability(metrics), 3)
+        if metrics["plant_probability"] < model.threshold:
+            flag("vegetation", "reject")
+
+    return {
+        "verdict": verdict,
+        "reasons": reasons,
+        "metrics": {k: round(v, 4) for k, v in metrics.items()},
+        "ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+# ----- offline tools -----
+
+def _images(folder: str) -> list:
+    return [p for p in sorted(glob.glob(os.path.join(folder, "**", "*"), recursive=True))
+            if p.lower().endswith((".jpg", ".jpeg", ".png", ".webp"))]
+
+
+def fit(args):
+    """Fit the plant / not-plant classifier by gradient descent on the logistic loss."""
+    rows, labels = [], []
+    for label, folder in ((1, args.plants), (0, args.others)):
+        for path in _images(folder):
+            with open(path, "rb") as f:
+                rows.append(QualityModel.vector(measure(thumbnail(f.read()))))
+            labels.append(label)
+    if len(set(labels)) < 2:
+        raise SystemExit("❌ Need images in both --plants and --others")
+    x, y = np.array(rows), np.array(labels, dtype=np.float64)
+    mean, std = x.mean(axis=0), x.std(axis=0) + 1e-6
+    z = (x - mean) / std
+    w, b = np.zeros(z.shape[1]), 0.0
+    for _ in range(args.steps):
+        p = 1 / (1 + np.exp(-(z @ w + b)))
+        w -= args.lr * (z.T @ (p - y) / len(y) + args.l2 * w)
+        b -= args.lr * float((p - y).mean())
+    accuracy = float((((z @ w + b) > 0) == (y == 1)).mean())
+    with open(args.out, "w") as f:
+        json.dump({"weights": w.tolist(), "bias": b, "mean": mean.tolist(), "std": std.tolist(),
+                   "threshold": args.threshold}, f, indent=2)
+    print(f"✅ {len(y)} images ({int(y.sum())} plant), training accuracy {accuracy:.1%} -> {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    c = sub.add_parser("check", help="print the verdict for each image")
+    c.add_argument("images", nargs="+")
+    c.add_argument("--model", default=DEFAULT_MODEL)
+    f = sub.add_parser("fit", help="fit the plant / not-plant classifier")
+    f.add_argument("--plants", required=True, help="folder of leaf photos")
+    f.add_argument("--others", required=True, help="folder of non-leaf photos")
+    f.add_argument("--out", default=DEFAULT_MODEL)
+    f.add_argument("--steps", type=int, default=2000)
+    f.add_argument("--lr", type=float, default=0.5)
+    f.add_argument("--l2", type=float, default=1e-3)
+    f.add_argument("--threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.command == "fit":
+        fit(args)
+        return
+    model = QualityModel.load(args.model)
+    for path in args.images:
+        with open(path, "rb") as fh:
+            result = assess(fh.read(), model)
+        print(f"{os.path.basename(path):<32} {result['verdict']:<7} {result['ms']:>6.2f} ms  {result['metrics']}")
+        for reason in result["reasons"]:
+            print(f"{'':<32} - {reason}")
+
+
+if __name__ == "__main__":
+    main()
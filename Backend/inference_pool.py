@@ -0,0 +1,386 @@
+"""
+Out-of-process CNN inference service.
+
+The API process never imports TensorFlow. Instead a pool of worker processes
+owns the model, and requests reach them like this:
+
+    API thread                      shared memory                 worker
+    ----------                      -------------                 ------
+    take a free slot  ───────────►  inputs[slot]  = uint8 batch
+    put (slot, n, seq) on requests ────────────────────────────►  predict()
+                                    outputs[slot] = softmax  ◄──  write probs
+    wait on results[slot] ◄──────────────────────────────────── put (seq, err)
+
+Only slot numbers travel through the (multiprocessing manager) queues; pixel
+tensors and probabilities stay in one SharedMemory block. A slot whose
+request timed out is quarantined until the worker's answer for it arrives,
+since until then the worker may still be reading its input or writing its
+output; only then does it go back to the free list. The queues are
+hosted on a manager server thread inside whichever process owns the service,
+so one pool can be shared by every uvicorn worker, and the number of
+inference workers is sized independently from the number of HTTP workers.
+
+Run standalone:
+    PRITHVI_INFERENCE_AUTHKEY=secret python inference_pool.py serve --workers 4 --port 8790
+and point the API at it:
+    PRITHVI_INFERENCE_ADDR=127.0.0.1:8790 PRITHVI_INFERENCE_AUTHKEY=secret python main.py
+"""
+import argparse
+import itertools
+import os
+import queue
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from multiprocessing.managers import BaseManager, DictProxy
+
+import numpy as np
+
+from cnn_model import IMG_SIZE, parse_cpu_list
+from structured_log import get_logger
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+AUTHKEY_ENV = "PRITHVI_INFERENCE_AUTHKEY"
+NUM_CLASSES = 38
+
+log = get_logger("inference")
+
+
+class _ServerManager(BaseManager):
+    pass
+
+
+class _ClientManager(BaseManager):
+    pass
+
+
+for _name in ("requests", "free_slots", "result_queue", "status"):
+    _ClientManager.register(_name)
+_ClientManager.register("config", proxytype=DictProxy)
+
+
+def get_authkey() -> bytes:
+    """Shared secret for the manager socket; generated once per launch if unset."""
+    if AUTHKEY_ENV not in os.environ:
+        os.environ[AUTHKEY_ENV] = secrets.token_hex(16)
+    return os.environ[AUTHKEY_ENV].encode()
+
+
+def parse_address(address: str) -> tuple:
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def _untrack(shm: shared_memory.SharedMemory):
+    """Stop this process's resource tracker from unlinking the block when it exits."""
+    if os.name == "posix":
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+
+
+def _attach_shm(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        _untrack(shm)
+        return shm
+
+
+def _slot_views(shm, cfg: dict):
+    """Numpy views over the shared block: (inputs, outputs)."""
+    slots, max_batch, num_classes = cfg["slots"], cfg["max_batch"], cfg["num_classes"]
+    in_shape = (slots, max_batch, cfg["img_size"], cfg["img_size"], 3)
+    inputs = np.ndarray(in_shape, dtype=np.uint8, buffer=shm.buf)
+    outputs = np.ndarray((slots, max_batch, num_classes), dtype=np.float32,
+                         buffer=shm.buf, offset=inputs.nbytes)
+    return inputs, outputs
+
+
+# ===== 1. SERVICE (OWNS QUEUES, SHARED MEMORY AND WORKERS) =====
+class InferenceService:
+    def __init__(self, model_path: str, model_format: str = "h5", workers: int = 2,
+                 slots: int = 16, max_batch: int = 8, num_classes: int = NUM_CLASSES,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.model_path = model_path
+        self.model_format = model_format
+        self.num_workers = workers
+        self.host, self.port = host, port
+        self.cfg = {
+            "slots": slots,
+            "max_batch": max_batch,
+            "num_classes": num_classes,
+            "img_size": IMG_SIZE,
+            "model_format": model_format,
+        }
+        self.workers = []
+        self.closing = False
+        self.address = None
+
+    def start(self, ready_timeout: float = 300) -> "InferenceService":
+        slots, max_batch = self.cfg["slots"], self.cfg["max_batch"]
+        in_bytes = slots * max_batch * IMG_SIZE * IMG_SIZE * 3
+        out_bytes = slots * max_batch * self.cfg["num_classes"] * 4
+        # The service unlinks the block itself in close(); clients attached in
+        # other processes must not have it removed from under them.
+        self.shm = shared_memory.SharedMemory(create=True, size=in_bytes + out_bytes)
+        _untrack(self.shm)
+        self.cfg["shm_name"] = self.shm.name
+
+        request_q, status_q, free_q = queue.Queue(), queue.Queue(), queue.Queue()
+        result_qs = [queue.Queue() for _ in range(slots)]
+        for i in range(slots):
+            free_q.put(i)
+
+        _ServerManager.register("requests", callable=lambda: request_q)
+        _ServerManager.register("free_slots", callable=lambda: free_q)
+        _ServerManager.register("status", callable=lambda: status_q)
+        _ServerManager.register("result_queue", callable=lambda i: result_qs[i])
+        _ServerManager.register("config", callable=lambda: self.cfg, proxytype=DictProxy)
+
+        manager = _ServerManager(address=(self.host, self.port), authkey=get_authkey())
+        self.server = manager.get_server()
+        self.address = "%s:%d" % self.server.address
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.status_q = status_q
+        self.request_q = request_q
+
+        print(f"🧵 Inference service on {self.address}: {self.num_workers} workers, {slots} slots")
+        for i in range(self.num_workers):
+            self.workers.append(self._spawn_worker(i))
+
+        ready = 0
+        deadline = time.time() + ready_timeout
+        while ready < self.num_workers and time.time() < deadline:
+            try:
+                state, pid, error = status_q.get(timeout=1)
+            except queue.Empty:
+                continue
+            if state == "ready":
+                ready += 1
+            else:
+                self.close()
+                raise RuntimeError(f"Inference worker {pid} failed to load model: {error}")
+        if ready < self.num_workers:
+            self.close()
+            raise RuntimeError("Inference workers did not become ready in time")
+
+        threading.Thread(target=self._monitor, daemon=True).start()
+        print(f"✅ Inference workers ready ({self.model_format})")
+        return self
+
+    def _worker_cpus(self, index: int) -> list:
+        """With PRITHVI_INFERENCE_PIN=1, give each worker its own slice of the allowed cores."""
+        if os.environ.get("PRITHVI_INFERENCE_PIN") != "1" or not hasattr(os, "sched_getaffinity"):
+            return []
+        cpus = parse_cpu_list(os.environ.get("PRITHVI_CPU_AFFINITY", "")) or sorted(os.sched_getaffinity(0))
+        per_worker = max(1, len(cpus) // self.num_workers)
+        start = (index * per_worker) % len(cpus)
+        return cpus[start:start + per_worker]
+
+    def _spawn_worker(self, index: int) -> subprocess.Popen:
+        env = dict(os.environ)
+        cpus = self._worker_cpus(index)
+        if cpus:
+            env["PRITHVI_CPU_AFFINITY"] = ",".join(map(str, cpus))
+        return subprocess.Popen(
+            [sys.executable, os.path.join(BASE_DIR, "inference_pool.py"), "worker",
+             "--address", self.address, "--model-path", self.model_path,
+             "--model-format", self.model_format],
+            cwd=BASE_DIR,
+            env=env,
+        )
+
+    def _monitor(self):
+        """Replace crashed workers so the pool keeps its size."""
+        while not self.closing:
+            for i, proc in enumerate(self.workers):
+                if proc.poll() is not None and not self.closing:
+                    print(f"⚠️ Inference worker {proc.pid} exited ({proc.returncode}), restarting")
+                    self.workers[i] = self._spawn_worker(i)
+            time.sleep(2)
+
+    def client(self) -> "InferencePoolClient":
+        return InferencePoolClient(self.address)
+
+    def close(self):
+        if self.closing:
+            return
+        self.closing = True
+        for _ in self.workers:
+            self.request_q.put(None)
+        for proc in self.workers:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        self.shm.close()
+        if os.name == "posix":
+            from multiprocessing import resource_tracker
+            resource_tracker.register(self.shm._name, "shared_memory")
+        self.shm.unlink()
+
+
+# ===== 2. CLIENT (USED BY THE API PROCESS) =====
+class InferencePoolClient:
+    """Drop-in for cnn_model runtimes: `predict(uint8 batch) -> softmax`."""
+
+    def __init__(self, address: str, timeout: float = None, quarantine_timeout: float = 600):
+        self.address = address
+        self.timeout = timeout or float(os.environ.get("PRITHVI_INFERENCE_TIMEOUT", "30"))
+        self.quarantine_timeout = quarantine_timeout
+        self.quarantined = 0  # slots currently held back after a timeout
+        self.manager = _ClientManager(address=parse_address(address), authkey=get_authkey())
+        self.manager.connect()
+        self.cfg = self.manager.config().copy()
+        self.format = f"pool:{self.cfg['model_format']}"
+        self.shm = _attach_shm(self.cfg["shm_name"])
+        self.inputs, self.outputs = _slot_views(self.shm, self.cfg)
+        self.requests = self.manager.requests()
+        self.free_slots = self.manager.free_slots()
+        self._results = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def _result_queue(self, slot: int):
+        with self._lock:
+            if slot not in self._results:
+                self._results[slot] = self.manager.result_queue(slot)
+            return self._results[slot]
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        max_batch = self.cfg["max_batch"]
+        return np.concatenate([self._predict_chunk(batch[i:i + max_batch])
+                               for i in range(0, len(batch), max_batch)])
+
+    def _predict_chunk(self, batch: np.ndarray) -> np.ndarray:
+        n = len(batch)
+        slot = self.free_slots.get(timeout=self.timeout)
+        seq, in_flight = next(self._seq), False
+        try:
+            self.inputs[slot, :n] = batch
+            self.requests.put((slot, n, seq))
+            in_flight = True
+            results = self._result_queue(slot)
+            try:
+                got_seq, error = results.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError(f"Inference timed out after {self.timeout}s")
+            in_flight = False
+            if got_seq != seq:
+                # Slots are only recycled once answered, so this can't happen; never return foreign output.
+                raise RuntimeError(f"Inference slot {slot} answered request {got_seq}, expected {seq}")
+            if error:
+                raise RuntimeError(f"Inference worker error: {error}")
+            return self.outputs[slot, :n].copy()
+        finally:
+            if in_flight:
+                self._quarantine(slot, seq)
+            else:
+                self.free_slots.put(slot)
+
+    def _quarantine(self, slot: int, seq: int):
+        """Free `slot` only after the worker has answered `seq` (it may still be using the slot's memory)."""
+        with self._lock:
+            self.quarantined += 1
+        log.warning("⚠️ Inference slot %d quarantined until request %d is answered", slot, seq)
+
+        def release():
+            results = self._result_queue(slot)
+            deadline = time.time() + self.quarantine_timeout
+            try:
+                while time.time() < deadline:
+                    try:
+                        got_seq, _ = results.get(timeout=max(deadline - time.time(), 0.01))
+                    except queue.Empty:
+                        break
+                    if got_seq == seq:
+                        with self._lock:
+                            self.quarantined -= 1
+                        self.free_slots.put(slot)
+                        return
+            except (EOFError, ConnectionError):
+                return
+            # No answer at all: the worker most likely died mid-request. Losing the
+            # slot is safer than handing out memory a late write could still land in.
+            log.error("❌ Inference slot %d retired: request %d never answered", slot, seq)
+
+        threading.Thread(target=release, name=f"slot-{slot}-quarantine", daemon=True).start()
+
+
+# ===== 3. WORKER PROCESS =====
+def run_worker(address: str, model_path: str, model_format: str):
+    from cnn_model import load_cnn
+
+    manager = _ClientManager(address=parse_address(address), authkey=get_authkey())
+    manager.connect()
+    cfg = manager.config().copy()
+    status = manager.status()
+    requests_q = manager.requests()
+    shm = _attach_shm(cfg["shm_name"])
+    inputs, outputs = _slot_views(shm, cfg)
+
+    try:
+        model = load_cnn(model_path, model_format)
+    except Exception as e:
+        status.put(("error", os.getpid(), str(e)))
+        return
+    status.put(("ready", os.getpid(), None))
+
+    result_queues = {}
+    while True:
+        try:
+            msg = requests_q.get()
+        except (EOFError, ConnectionError):
+            break  # the owning process went away
+        if msg is None:
+            break
+        slot, n, seq = msg
+        error = None
+        try:
+            outputs[slot, :n] = model.predict(inputs[slot, :n])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        if slot not in result_queues:
+            result_queues[slot] = manager.result_queue(slot)
+        result_queues[slot].put((seq, error))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PrithviPulse CNN inference service")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="run a standalone inference service")
+    serve.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8790)
+    serve.add_argument("--slots", type=int, default=32)
+    serve.add_argument("--model-path", default=os.path.join(BASE_DIR, "plant_disease_model.h5"))
+    serve.add_argument("--model-format", default="h5", choices=["h5", "tflite"])
+
+    worker = sub.add_parser("worker", help="(internal) one inference worker")
+    worker.add_argument("--address", required=True)
+    worker.add_argument("--model-path", required=True)
+    worker.add_argument("--model-format", default="h5")
+
+    args = parser.parse_args()
+    if args.command == "worker":
+        run_worker(args.address, args.model_path, args.model_format)
+        return
+
+    if AUTHKEY_ENV not in os.environ:
+        print(f"⚠️ {AUTHKEY_ENV} not set - API processes will not be able to connect")
+    service = InferenceService(args.model_path, args.model_format, workers=args.workers,
+                               slots=args.slots, host=args.host, port=args.port).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
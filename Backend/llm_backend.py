@@ -0,0 +1,152 @@
+"""
+Pluggable LLM backend behind `model_gemini`.
+
+Routes only ever call `model.generate_content(contents, generation_config=...)`
+and read `.text`, so any object with that method can stand in for
+genai.GenerativeModel:
+
+- "gemini" (default): the real google.generativeai model.
+- "replay": serves recorded responses with no network access, after a
+  synthetic latency and with configurable error / malformed-reply rates.
+  Makes load and latency benchmarks deterministic (seeded) and free.
+
+    PRITHVI_LLM_BACKEND=replay PRITHVI_REPLAY_LATENCY=lognormal:1500:0.5 \
+    PRITHVI_REPLAY_ERROR_RATE=0.05 python main.py
+
+Recorded responses come from replay_responses.json (one list per prompt,
+shipped with the repo) or from a bench_prompts.py recordings file.
+"""
+import json
+import os
+import random
+import threading
+import time
+
+from prompts import PROMPTS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_REPLAY_FILE = os.path.join(BASE_DIR, "replay_responses.json")
+
+
+class ReplayError(RuntimeError):
+    """Synthetic API failure injected by the replay backend."""
+
+
+def parse_latency(spec: str):
+    """
+    'fixed:800' | 'uniform:500:2500' | 'lognormal:<median ms>:<sigma>' |
+    'recorded' (sample the recordings' own latencies). Returns fn(rng, recorded_ms) -> seconds.
+    """
+    kind, *params = spec.split(":")
+    params = [float(p) for p in params]
+    if kind == "fixed":
+        return lambda rng, recorded: params[0] / 1000
+    if kind == "uniform":
+        return lambda rng, recorded: rng.uniform(params[0], params[1]) / 1000
+    if kind == "lognormal":
+        median, sigma = params
+        return lambda rng, recorded: median * rng.lognormvariate(0.0, sigma) / 1000
+    if kind == "recorded":
+        return lambda rng, recorded: (rng.choice(recorded) if recorded else 1500.0) / 1000
+    raise ValueError(f"Unknown latency distribution '{spec}'")
+
+
+class ReplayResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class ReplayBackend:
+    def __init__(self, path: str = DEFAULT_REPLAY_FILE, latency: str = "lognormal:1500:0.5",
+                 error_rate: float = 0.0, malformed_rate: float = 0.0, seed: int = 0):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.responses, self.latencies, self.match = self._load(data)
+        self.latency = parse_latency(latency)
+        self.latency_spec = latency
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"calls": 0, "errors": 0, "malformed": 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            path=os.environ.get("PRITHVI_REPLAY_FILE", DEFAULT_REPLAY_FILE),
+            latency=os.environ.get("PRITHVI_REPLAY_LATENCY", "lognormal:1500:0.5"),
+            error_rate=float(os.environ.get("PRITHVI_REPLAY_ERROR_RATE", "0")),
+            malformed_rate=float(os.environ.get("PRITHVI_REPLAY_MALFORMED_RATE", "0")),
+            seed=int(os.environ.get("PRITHVI_REPLAY_SEED", "0")),
+        )
+
+    @staticmethod
+    def _load(data: dict):
+        if "prompts" in data:
+            # bench_prompts.py recordings: use the schema variant's real replies and timings.
+            responses, latencies = {}, {}
+            for name, variants in data["prompts"].items():
+                samples = variants.get("schema") or variants.get("legacy") or []
+                responses[name] = [s["text"] for s in samples]
+                latencies[name] = [s["total_ms"] for s in samples]
+            return responses, latencies, {}
+        return data["responses"], {}, data.get("match", {})
+
+    def _route(self, contents, generation_config) -> str:
+        """Which recorded prompt a call is for: by response schema, else by prompt text."""
+        schema = (generation_config or {}).get("response_schema")
+        if schema is not None:
+            for name, spec in PROMPTS.items():
+                if spec.schema is schema or spec.schema == schema:
+                    return name
+        parts = contents if isinstance(contents, list) else [contents]
+        text = " ".join(p for p in parts if isinstance(p, str))
+        for name, needle in self.match.items():
+            if needle in text:
+                return name
+        raise ReplayError("No recorded response matches this prompt")
+
+    def generate_content(self, contents, generation_config=None, **kwargs):
+        name = self._route(contents, generation_config)
+        with self.lock:
+            self.counts["calls"] += 1
+            delay = self.latency(self.rng, self.latencies.get(name))
+            fail = self.rng.random() < self.error_rate
+            malformed = not fail and self.rng.random() < self.malformed_rate
+            text = self.rng.choice(self.responses[name])
+            if fail:
+                self.counts["errors"] += 1
+            elif malformed:
+                self.counts["malformed"] += 1
+
+        if fail:
+            # Real failures (429/503) usually come back faster than a full generation.
+            time.sleep(delay * 0.2)
+            raise ReplayError("503 Service Unavailable (replayed)")
+        time.sleep(delay)
+        return ReplayResponse(text[: len(text) // 2] if malformed else text)
+
+    def report(self) -> dict:
+        with self.lock:
+            return {
+                "latency": self.latency_spec,
+                "error_rate": self.error_rate,
+                "malformed_rate": self.malformed_rate,
+                **self.counts,
+            }
+
+
+_replay = None
+
+
+def create_llm(kind: str, model_name: str, generation_config: dict = None):
+    """Backend for `kind`; every replay model in a process shares one ReplayBackend."""
+    global _replay
+    if kind == "replay":
+        if _replay is None:
+            _replay = ReplayBackend.from_env()
+        return _replay
+    if kind != "gemini":
+        raise ValueError(f"Unknown LLM backend '{kind}'")
+    import google.generativeai as genai
+    return genai.GenerativeModel(model_name=model_name, generation_config=generation_config)
@@ -0,0 +1,207 @@
+"""
+Load / latency test for the Gemini-backed routes, with no network calls.
+
+Drives /scan_disease, /advise-crop and the planning routes at a fixed
+arrival rate (open loop: requests are sent on schedule whether or not
+earlier ones have returned) and reports throughput, tail latency, error
+rate and fallback rate per route. Latency is measured from each request's
+scheduled send time, so client-side queueing under overload is counted
+instead of hidden (no coordinated omission).
+
+With --spawn the server is started with the replay LLM backend
+(llm_backend.py), so Gemini latency and failures are synthetic and seeded:
+
+    python loadtest.py --spawn --rps 20 --duration 60 \
+        --latency lognormal:1500:0.5 --error-rate 0.05
+    python loadtest.py --spawn --rps 40 --mix scan=1 --env PRITHVI_GEMINI_RPM=600
+    python loadtest.py --url http://127.0.0.1:8000 --rps 5   # an already running server
+
+A response counts as a fallback when its "source" says so (scan: local H5
+model; other routes: the offline fallback payload).
+"""
+import argparse
+import glob
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from bench_workers import wait_until_ready
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_IMAGES = sorted(glob.glob(os.path.join(BASE_DIR, "..", "Zips", "test", "test", "*.JPG")))
+
+# name -> (path, JSON bodies; None = multipart leaf image)
+ROUTES = {
+    "scan": ("/scan_disease", None),
+    "advise": ("/advise-crop", [
+        {"soil": "Black", "season": "Kharif", "location": "Nagpur, Maharashtra"},
+        {"soil": "Alluvial", "season": "Rabi", "location": "Meerut, Uttar Pradesh"},
+    ]),
+    "farm_plan": ("/farm-plan", [
+        {"soilType": "Red", "waterSource": "Borewell", "budget": 80000, "landSize": 2},
+    ]),
+    "smart_plan": ("/generate-smart-plan", [
+        {"land_size": "3 acres", "soil_type": "Alluvial", "budget": "₹1 Lakh", "water_source": "Canal",
+         "season": "Rabi", "sowing_month": "November"},
+    ]),
+    "execution_plan": ("/generate-execution-plan", [
+        {"crop_name": "Wheat", "variety": "HD 2967", "land_size": "2", "soil_type": "Loamy",
+         "water_source": "Canal", "sowing_date": "2026-11-15"},
+    ]),
+    "market": ("/get-market-trends", [{"region": "Nashik, Maharashtra"}]),
+}
+DEFAULT_MIX = "scan=4,advise=2,farm_plan=1,smart_plan=1,execution_plan=1,market=1"
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ROUTES:
+            raise SystemExit(f"❌ Unknown route '{name}' (choose from {', '.join(ROUTES)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def is_fallback(body) -> bool:
+    return isinstance(body, dict) and "fallback" in str(body.get("source", "")).lower()
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = []  # (route, latency_s, ok, fallback)
+
+    def add(self, route: str, latency: float, ok: bool, fallback: bool):
+        with self.lock:
+            self.rows.append((route, latency, ok, fallback))
+
+
+def send(session: requests.Session, base: str, route: str, scheduled: float, images: list,
+         rng: random.Random, timeout: float, results: Results):
+    path, bodies = ROUTES[route]
+    try:
+        if bodies is None:
+            image = rng.choice(images) if images else b""
+            r = session.post(base + path, files={"file": ("leaf.jpg", image, "image/jpeg")}, timeout=timeout)
+        else:
+            r = session.post(base + path, json=rng.choice(bodies), timeout=timeout)
+        body = r.json() if r.status_code == 200 else None
+        ok = r.status_code == 200 and not (isinstance(body, dict) and body.get("error"))
+        fallback = is_fallback(body)
+    except (requests.RequestException, ValueError):
+        ok, fallback = False, False
+    results.add(route, time.perf_counter() - scheduled, ok, fallback)
+
+
+def run(base: str, rps: float, duration: float, mix: dict, concurrency: int, timeout: float,
+        poisson: bool, seed: int) -> Results:
+    rng = random.Random(seed)
+    images = [open(p, "rb").read() for p in TEST_IMAGES[:8]]
+    names, weights = list(mix), list(mix.values())
+    results = Results()
+    local = threading.local()
+
+    def task(route: str, scheduled: float, task_seed: int):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        send(local.session, base, route, scheduled, images, random.Random(task_seed), timeout, results)
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        start = time.perf_counter()
+        offset = 0.0
+        while offset < duration:
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(task, rng.choices(names, weights)[0], scheduled, rng.getrandbits(32))
+            offset += rng.expovariate(rps) if poisson else 1.0 / rps
+    return results
+
+
+def report(results: Results, duration: float):
+    print(f"\n{'route':<15} {'sent':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'errors':>7} {'fallback':>9}")
+    routes = sorted({r[0] for r in results.rows}) + ["ALL"]
+    for route in routes:
+        rows = [r for r in results.rows if route == "ALL" or r[0] == route]
+        latency = np.array([r[1] for r in rows]) * 1000
+        ok = sum(r[2] for r in rows)
+        fallback = sum(r[3] for r in rows)
+        p50, p95, p99 = np.percentile(latency, [50, 95, 99])
+        print(f"{route:<15} {len(rows):>6} {ok / duration:>7.1f} {p50:>8.0f} {p95:>8.0f} {p99:>8.0f} "
+              f"{latency.max():>8.0f} {100 * (len(rows) - ok) / len(rows):>6.1f}% "
+              f"{100 * fallback / max(ok, 1):>8.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="server to test (default: the --spawn'ed one)")
+    parser.add_argument("--spawn", action="store_true", help="start main.py with the replay LLM backend")
+    parser.add_argument("--rps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="route=weight,... from: " + ", ".join(ROUTES))
+    parser.add_argument("--concurrency", type=int, default=256, help="max requests in flight")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--poisson", action="store_true", help="exponential inter-arrival times")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", default="lognormal:1500:0.5", help="replay latency distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="replay API error rate")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="replay truncated-JSON rate")
+    parser.add_argument("--replay-file", default=None, help="recorded responses (default replay_responses.json)")
+    parser.add_argument("--env", nargs="*", default=[], help="extra KEY=VALUE settings for the spawned server")
+    args = parser.parse_args()
+
+    if not args.spawn and not args.url:
+        parser.error("pass --spawn or --url")
+    mix = parse_mix(args.mix)
+    base = (args.url or f"http://127.0.0.1:{args.port}").rstrip("/")
+
+    server = None
+    if args.spawn:
+        env = dict(os.environ, PRITHVI_PORT=str(args.port), PRITHVI_HOST="127.0.0.1",
+                   PRITHVI_LLM_BACKEND="replay", PRITHVI_REPLAY_LATENCY=args.latency,
+                   PRITHVI_REPLAY_ERROR_RATE=str(args.error_rate),
+                   PRITHVI_REPLAY_MALFORMED_RATE=str(args.malformed_rate),
+                   PRITHVI_REPLAY_SEED=str(args.seed))
+        if args.replay_file:
+            env["PRITHVI_REPLAY_FILE"] = args.replay_file
+        env.update(kv.split("=", 1) for kv in args.env)
+        print(f"🚀 Starting server (replay backend, latency {args.latency}, errors {args.error_rate:.0%})...")
+        server = subprocess.Popen([sys.executable, "main.py"], cwd=BASE_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_ready(base + "/"):
+            print("❌ Server did not become ready")
+            return
+        print(f"🔥 {args.rps:g} req/s for {args.duration:g}s, mix {args.mix}")
+        results = run(base, args.rps, args.duration, mix, args.concurrency, args.timeout, args.poisson, args.seed)
+        report(results, args.duration)
+        try:
+            stats = requests.get(base + "/gemini-stats", timeout=5).json()
+            print("\nGemini scheduler (one worker):")
+            for cls, s in stats["classes"].items():
+                print(f"  {cls:<7} completed {s['completed']:>5}  errors {s['errors']:>4}  "
+                      f"shed {s['shed_queue_full'] + s['shed_deadline']:>4}  wait p95 {s['wait_ms_p95']:.0f} ms")
+        except (requests.RequestException, ValueError, KeyError):
+            pass
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+
+if __name__ == "__main__":
+    main()
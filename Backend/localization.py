@@ -0,0 +1,261 @@
+"""
+Localized (en / hi / ta) disease advice and route output.
+
+Disease advice is per class, so it is generated once in English and each
+other language is a translation of that English document (the same
+medicines and dosages in every language). Entries live in the shared
+advice cache keyed by (schema version, language, class):
+
+    v2:hi:Tomato___Early_blight
+
+Bump SCHEMA_VERSION when the advice schema or prompt changes; older entries
+are then simply not found. Pre-warm every class in every language offline,
+so a localized scan is a cache read like an English one:
+
+    python localization.py prewarm                 # 38 classes x en, hi, ta, resumable
+    python localization.py prewarm --languages hi --rpm 30
+    python localization.py stats
+
+Like advisory_matrix.py, the prewarm uses PRITHVI_LLM_BACKEND, so
+PRITHVI_LLM_BACKEND=replay runs it offline.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from prompts import PROMPTS, TRANSLATE, render, generation_config
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DB = os.path.join(BASE_DIR, "prithvi_cache.db")
+
+# Codes match the frontend's Language enum.
+LANGUAGES = {"en": "English", "hi": "Hindi", "ta": "Tamil"}
+LANGUAGE_ALIASES = {"english": "en", "hindi": "hi", "tamil": "ta", "हिन्दी": "hi", "हिंदी": "hi", "தமிழ்": "ta"}
+DEFAULT_LANGUAGE = "en"
+SCHEMA_VERSION = 2
+
+# Values copied from the source document whatever the translation says.
+UNTRANSLATED_KEYS = {"icon", "image_query", "id", "marketTrend", "waterRequirement", "market_status", "trend", "unit"}
+
+
+def normalize_language(value) -> str:
+    """'hi', 'hi-IN', 'Hindi' -> 'hi'; anything unknown -> 'en'."""
+    text = str(value or "").strip().lower()
+    code = LANGUAGE_ALIASES.get(text, text.replace("_", "-").split("-")[0])
+    return code if code in LANGUAGES else DEFAULT_LANGUAGE
+
+
+def language_instruction(language: str) -> str:
+    """Suffix for prompts generated directly in the farmer's language ('' for English)."""
+    if language == DEFAULT_LANGUAGE:
+        return ""
+    name = LANGUAGES[language]
+    return (f"\nWrite every human-readable text value in simple {name}. Keep JSON keys, enum values, "
+            f"icons, numbers, units and chemical names in English.")
+
+
+def cache_key(language: str, *parts) -> str:
+    """'v2:hi:Tomato___Early_blight', 'v2:ta:advise_crop:black/kharif/india', ..."""
+    return ":".join([f"v{SCHEMA_VERSION}", language, *map(str, parts)])
+
+
+def parse_json(text: str):
+    text = text.strip().replace("```json", "").replace("```", "").strip()
+    if "{" in text and "}" in text:
+        text = text[text.find("{"):text.rfind("}") + 1]
+    return json.loads(text)
+
+
+def merge_translation(source, translated, keep=UNTRANSLATED_KEYS):
+    """
+    The source document with its text replaced by the translation, wherever
+    the two have the same shape. Numbers, `keep` keys and anything the
+    translation dropped or reshaped stay as in the source.
+    """
+    if isinstance(source, dict):
+        if not isinstance(translated, dict):
+            return source
+        return {
+            key: value if key in keep else merge_translation(value, translated.get(key), keep)
+            for key, value in source.items()
+        }
+    if isinstance(source, list):
+        if not isinstance(translated, list) or len(translated) != len(source):
+            return source
+        return [merge_translation(s, t, keep) for s, t in zip(source, translated)]
+    if isinstance(source, str) and isinstance(translated, str) and translated.strip():
+        return translated
+    return source
+
+
+def translate(document: dict, prompt_name: str, language: str, ask, keep=()) -> dict:
+    """
+    `document` (the output of PROMPTS[prompt_name]) in `language`; `keep`
+    names extra keys to leave untranslated. `ask(prompt, generation_config)
+    -> response text` makes the model call.
+    """
+    if language == DEFAULT_LANGUAGE:
+        return document
+    prompt = TRANSLATE.format(language=LANGUAGES[language],
+                              document=json.dumps(document, ensure_ascii=False))
+    translated = parse_json(ask(prompt, generation_config(prompt_name)))
+    return merge_translation(document, translated, UNTRANSLATED_KEYS | set(keep))
+
+
+def validate_advice(advice) -> list:
+    """Problems that keep an advice document out of the cache (empty list = valid)."""
+    if not isinstance(advice, dict):
+        return ["not an object"]
+    problems = [f"{key} missing" for key in PROMPTS["disease_advice"].required
+                if key != "steps" and not isinstance(advice.get(key), str)]
+    steps = advice.get("steps")
+    if not isinstance(steps, list) or not steps:
+        problems.append("no steps")
+    elif not all(isinstance(step, dict) and step.get("action") for step in steps):
+        problems.append("step without action")
+    return problems
+
+
+class AdviceCatalog:
+    """
+    Treatment advice per (class, language), read from and written to a
+    SharedCache. `ask(prompt, generation_config) -> text` makes model calls.
+    """
+
+    def __init__(self, cache, ask):
+        self.cache = cache
+        self.ask = ask
+
+    def key(self, class_name: str, language: str) -> str:
+        return cache_key(language, class_name)
+
+    def cached(self, class_name: str, language: str = DEFAULT_LANGUAGE):
+        advice = self.cache.get(self.key(class_name, language))
+        if advice is None and language == DEFAULT_LANGUAGE:
+            # Entries from before languages were keyed (same shape).
+            advice = self.cache.get(class_name)
+        return advice
+
+    def get(self, class_name: str, language: str = DEFAULT_LANGUAGE) -> dict:
+        """Cached advice, generating (English first, then the translation) on a miss. Raises on failure."""
+        advice = self.cached(class_name, language)
+        if advice is not None:
+            return advice
+        if language == DEFAULT_LANGUAGE:
+            advice = self.generate(class_name)
+        else:
+            advice = translate(self.get(class_name), "disease_advice", language, self.ask)
+        problems = validate_advice(advice)
+        if problems:
+            raise ValueError(f"Invalid advice for {class_name} ({language}): {'; '.join(problems)}")
+        self.cache.set(self.key(class_name, language), advice)
+        return advice
+
+    def generate(self, class_name: str) -> dict:
+        disease = class_name.replace("___", " - ").replace("_", " ")
+        crop = class_name.split("___")[0].replace("_", " ")
+        if "healthy" in class_name.lower():
+            status = "Healthy Crop"
+            task = (f"Title it \"Healthy Crop - {disease}\", say no treatment is needed and give 2 maintenance "
+                    "steps (monitoring, water and nutrition).")
+        else:
+            status = "Disease Detected"
+            task = ("Give treatment advice: a specific chemical or organic medicine with dosage, "
+                    "and 3-5 actionable steps.")
+        advice = parse_json(self.ask(render("disease_advice", disease=disease, status=status, task=task),
+                                     generation_config("disease_advice")))
+        for step in advice.get("steps") or []:
+            if isinstance(step, dict) and not step.get("image_query"):
+                step["image_query"] = f"{step.get('action', 'treatment')} for {crop} disease"
+        return advice
+
+
+# ----- offline prewarm -----
+
+def prewarm(args):
+    from class_index import CLASS_NAMES
+    from gemini_scheduler import GeminiScheduler
+    from llm_backend import create_llm
+    from shared_cache import SharedCache
+
+    backend = os.environ.get("PRITHVI_LLM_BACKEND", "gemini")
+    if backend == "gemini":
+        import google.generativeai as genai
+        genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+    model = create_llm(backend, args.model, {"temperature": 0.4, "max_output_tokens": 8192})
+    # One batch class: no practical deadline or queue cap, just the quota.
+    scheduler = GeminiScheduler(args.rpm, concurrency=args.concurrency, classes={
+        "batch": {"priority": 0, "deadline": 7 * 24 * 3600.0, "max_queue": 10 ** 6, "share": 1.0},
+    })
+    catalog = AdviceCatalog(
+        SharedCache(args.cache_db, namespace="advice"),
+        lambda prompt, config: scheduler.call("batch", model.generate_content, prompt, generation_config=config).text,
+    )
+
+    languages = [normalize_language(code) for code in args.languages]
+    todo = [c for c in CLASS_NAMES if any(catalog.cached(c, lang) is None for lang in languages)]
+    print(f"🌐 {len(CLASS_NAMES)} classes x {', '.join(languages)}: {len(todo)} classes to fill")
+
+    def fill(class_name: str) -> list:
+        # English first (translations are made from it), then each language.
+        problems = []
+        for lang in languages:
+            error = None
+            for _ in range(args.attempts):
+                try:
+                    catalog.get(class_name, lang)
+                    error = None
+                    break
+                except Exception as e:
+                    error = f"{lang}: {type(e).__name__}: {e}"
+            if error:
+                problems.append(error)
+        return problems
+
+    start = time.time()
+    pool = ThreadPoolExecutor(max_workers=args.concurrency)
+    futures = [(c, pool.submit(fill, c)) for c in todo]
+    failed = 0
+    for i, (class_name, future) in enumerate(futures, 1):
+        problems = future.result()
+        if problems:
+            failed += 1
+            print(f"⚠️ {class_name}: {'; '.join(problems)}")
+        if i % 10 == 0 or i == len(futures):
+            print(f"   {i}/{len(futures)} done ({time.time() - start:.0f}s, {failed} failed)")
+    pool.shutdown()
+    scheduler.close()
+    print(f"✅ {stats(catalog, CLASS_NAMES)}")
+
+
+def stats(catalog: AdviceCatalog, class_names: list) -> dict:
+    return {lang: sum(catalog.cached(c, lang) is not None for c in class_names) for lang in LANGUAGES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("prewarm", help="generate advice for every class in every language")
+    p.add_argument("--languages", nargs="+", default=list(LANGUAGES))
+    p.add_argument("--rpm", type=float, default=60, help="Gemini requests per minute")
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--attempts", type=int, default=2, help="tries per class and language")
+    p.add_argument("--model", default="gemini-3-flash-preview")
+    p.add_argument("--cache-db", default=os.environ.get("PRITHVI_CACHE_DB", DEFAULT_CACHE_DB))
+    s = sub.add_parser("stats", help="cached classes per language")
+    s.add_argument("--cache-db", default=os.environ.get("PRITHVI_CACHE_DB", DEFAULT_CACHE_DB))
+    args = parser.parse_args()
+
+    if args.command == "prewarm":
+        prewarm(args)
+    else:
+        from class_index import CLASS_NAMES
+        from shared_cache import SharedCache
+        catalog = AdviceCatalog(SharedCache(args.cache_db, namespace="advice"), ask=None)
+        print(json.dumps({"classes": len(CLASS_NAMES), "cached": stats(catalog, CLASS_NAMES)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
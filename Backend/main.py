@@ -1,17 +1,58 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse
 import uvicorn
-import tensorflow as tf
 import numpy as np
 from PIL import Image
 import io
 import json
 import os
 import hashlib
+import hmac
 import base64
 import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
-import traceback
+import asyncio
+import atexit
+import functools
+import time
+from typing import Optional
+
+from cnn_model import TFLiteCNN, export_tflite, tflite_path_for, preprocess_image
+from shared_cache import SharedCache
+from inference_pool import InferenceService, InferencePoolClient
+from tta import predict_tta, DEFAULT_VIEWS as TTA_VIEWS
+from class_index import (
+    CLASS_NAMES, CLASS_CROPS, CLASS_DISEASES, DIAGNOSIS_NAMES, IS_HEALTHY,
+    CROP_DISPLAY_NAMES, CROP_OF_CLASS, top_k, crop_marginals, class_for_diagnosis, class_for_scan,
+)
+from calibration import apply_temperature, load_temperature
+from similarity_index import ScanSimilarityIndex
+from scan_history import ScanHistory
+from gemini_scheduler import GeminiScheduler
+from plan_jobs import PlanJobs, JobQueueFull, InvalidCallback
+from prompts import render as render_prompt, generation_config as prompt_config
+from llm_backend import create_llm
+from agronomy import calculate_execution_plan, apply_narrative, resolve_crop
+from advisory_matrix import AdvisoryMatrix
+from market_prices import PriceStore, summary_for_note as summarize_prices
+import image_quality
+from idempotency import IdempotencyMiddleware, IdempotencyStore, do_not_store
+from compression import CompressionMiddleware, HttpCache
+from localization import (
+    AdviceCatalog, DEFAULT_LANGUAGE, cache_key, language_instruction, normalize_language, translate,
+)
+import logging
+import structured_log
+from structured_log import RequestIdMiddleware, fields
+from profiling import ProfileStore, ProfilingMiddleware
+from model_registry import LoadedModel, ModelRegistry, ModelSlot, RegistryError
+from shadow_eval import ShadowEvaluator
+
+# Request-path logging goes through a queue to a writer thread
+# (structured_log.py); startup messages are still printed.
+log = structured_log.configure(os.environ.get("PRITHVI_LOG_LEVEL", "INFO"),
+                               os.environ.get("PRITHVI_LOG_FORMAT", "text"))
 
 # ==========================================
 # 🚀 HACKATHON CONFIGURATION: GEMINI 3
@@ -32,6 +73,10 @@ else:
 
 genai.configure(api_key=GEMINI_API_KEY)
 
+# LLM backend: "gemini" (live) or "replay" (recorded responses, synthetic
+# latency/errors, no network; see llm_backend.py) for load tests.
+LLM_BACKEND = os.environ.get("PRITHVI_LLM_BACKEND", "gemini")
+
 # Initialize Gemini 3
 try:
     generation_config = {
@@ -39,15 +84,30 @@ try:
         "max_output_tokens": 8192,
         "response_mime_type": "application/json"  # Gemini 3 supports strict JSON enforcement
     }
-    model_gemini = genai.GenerativeModel(
-        model_name=GEMINI_MODEL_NAME,
-        generation_config=generation_config
-    )
-    print(f"🤖 SYSTEM READY: Connected to {GEMINI_MODEL_NAME} (Next-Gen Preview)")
+    model_gemini = create_llm(LLM_BACKEND, GEMINI_MODEL_NAME, generation_config)
+    # The scan prompt asks for JSON in text; no JSON mime type with image input.
+    model_gemini_scan = create_llm(LLM_BACKEND, GEMINI_MODEL_NAME)
+    if LLM_BACKEND == "replay":
+        print(f"🎞️ REPLAY BACKEND: {model_gemini.report()} (no network calls)")
+    else:
+        print(f"🤖 SYSTEM READY: Connected to {GEMINI_MODEL_NAME} (Next-Gen Preview)")
 except Exception as e:
-    print(f"⚠️ MODEL ERROR: Could not load {GEMINI_MODEL_NAME}.")
+    print(f"⚠️ MODEL ERROR: Could not load {GEMINI_MODEL_NAME} ({LLM_BACKEND} backend): {e}")
     print("   -> Check if your API Key has 'Gemini 3 Preview' access enabled.")
-    model_gemini = None
+    model_gemini = model_gemini_scan = None
+
+
+FALLBACK_SOURCE = "🛟 Offline Fallback (Gemini unavailable)"
+
+def fallback_response(fn):
+    """Tag a route's fallback payload so clients and load tests can tell it from a Gemini answer."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        result = fn(*args, **kwargs)
+        result.setdefault("source", FALLBACK_SOURCE)
+        do_not_store()  # a retry once Gemini is back should get the real answer
+        return result
+    return wrapper
 
 app = FastAPI()
 
@@ -61,160 +121,383 @@ app.add_middleware(
 
 # ===== 2. LOAD YOUR CUSTOM BRAIN =====
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_PATH = os.path.join(BASE_DIR, "plant_disease_model.h5")
+MODEL_PATH = os.environ.get("PRITHVI_MODEL_PATH", os.path.join(BASE_DIR, "plant_disease_model.h5"))
+
+# Multi-worker serving: `PRITHVI_WORKERS=4 python main.py`.
+# Each worker is a separate process, so the CNN is served from the .tflite
+# export by default: its weights are mmap'd and shared through the page cache
+# instead of being copied into every worker's heap.
+SERVE_WORKERS = int(os.environ.get("PRITHVI_WORKERS", "1"))
+MODEL_FORMAT = os.environ.get("PRITHVI_MODEL_FORMAT", "tflite" if SERVE_WORKERS > 1 else "h5")
+
+# Dedicated inference workers: `PRITHVI_INFERENCE_WORKERS=4 python main.py`
+# runs the CNN in a separate process pool (inference_pool.py), so the API
+# process never imports TensorFlow. Set PRITHVI_INFERENCE_ADDR instead to use
+# a pool that is already running.
+INFERENCE_WORKERS = int(os.environ.get("PRITHVI_INFERENCE_WORKERS", "0"))
+INFERENCE_SLOTS = int(os.environ.get("PRITHVI_INFERENCE_SLOTS", "16"))
+inference_service = None
+
+def start_inference_service():
+    global inference_service
+    inference_service = InferenceService(
+        MODEL_PATH, MODEL_FORMAT, workers=INFERENCE_WORKERS, slots=INFERENCE_SLOTS
+    ).start()
+    atexit.register(inference_service.close)
+    # Inherited by uvicorn workers spawned after this point.
+    os.environ["PRITHVI_INFERENCE_ADDR"] = inference_service.address
+
+# uvicorn re-raises SIGTERM after shutting down, which skips atexit handlers.
+@app.on_event("shutdown")
+def stop_inference_service():
+    if inference_service is not None:
+        inference_service.close()
+
+# Versioned models (`python model_registry.py register ... --activate`): the
+# registry's active version is served instead of MODEL_PATH, and activating
+# another version (CLI or POST /models/{version}/activate) swaps it in without
+# a restart. model_cnn is the slot holding whichever version is live.
+MODEL_REGISTRY_DIR = os.environ.get("PRITHVI_MODEL_REGISTRY", os.path.join(BASE_DIR, "models"))
+model_registry = ModelRegistry(MODEL_REGISTRY_DIR)
+model_cnn = ModelSlot(model_registry, warmup_batch_sizes=(1, len(TTA_VIEWS)))
+
+def load_cnn_model() -> bool:
+    try:
+        if INFERENCE_WORKERS > 0 and not os.environ.get("PRITHVI_INFERENCE_ADDR"):
+            start_inference_service()
+        inference_addr = os.environ.get("PRITHVI_INFERENCE_ADDR")
+        if inference_addr:
+            print(f"🧠 Connecting to CNN inference pool at {inference_addr}...")
+            # The pool's workers load their own model; no hot-swap from here.
+            model_cnn.registry = None
+            model_cnn.serve(LoadedModel("pool", InferencePoolClient(inference_addr)))
+        else:
+            entry = model_registry.active() or {
+                "version": "default", "path": MODEL_PATH, "format": MODEL_FORMAT, "classes": None,
+            }
+            print(f"🧠 Loading Crop Disease Model {entry['version']} ({entry['format']})...")
+            model_cnn.swap_to(entry, background=False)
+            if not model_cnn.ready:
+                raise RuntimeError(model_cnn.last_error)
+        print("✅ CNN Model Loaded!")
+        return True
+    except Exception as e:
+        print(f"❌ Error loading model file: {e}")
+        return False
+
+# In multi-worker mode the supervisor process only spawns workers, so it
+# never loads the CNN itself. Spawned workers also re-run this file as
+# `__mp_main__` before importing `main:app`; only the latter loads the model.
+if not (__name__ in ("__main__", "__mp_main__") and SERVE_WORKERS > 1):
+    load_cnn_model()
+
+# ===== 2B. GEMINI REQUEST SCHEDULER =====
+# Every Gemini call goes through one priority scheduler (scan > advice >
+# plan > market) so the shared key's quota goes to time-critical scans
+# first. Calls that can't start before their deadline are shed and the
+# route serves its fallback. The RPM quota is split across HTTP workers.
+GEMINI_RPM = float(os.environ.get("PRITHVI_GEMINI_RPM", "60"))
+GEMINI_CONCURRENCY = int(os.environ.get("PRITHVI_GEMINI_CONCURRENCY", "4"))
+
+gemini_scheduler = GeminiScheduler(
+    requests_per_minute=GEMINI_RPM / max(SERVE_WORKERS, 1),
+    concurrency=GEMINI_CONCURRENCY,
+)
 
-print("🧠 Loading Crop Disease Model...")
-try:
-    model_cnn = tf.keras.models.load_model(MODEL_PATH)
-    print("✅ CNN Model Loaded!")
-    MODEL_AVAILABLE = True
-except Exception as e:
-    print(f"❌ Error loading .h5 file: {e}")
-    model_cnn = None
-    MODEL_AVAILABLE = False
+@app.on_event("shutdown")
+def stop_gemini_scheduler():
+    gemini_scheduler.close()
 
 # ===== 3. SMART CACHE (CRITICAL FOR HACKATHONS) =====
 # This saves your API quota by remembering answers.
-CACHE_FILE = os.path.join(BASE_DIR, "advice_cache.json")
-
-def load_cache():
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, "r") as f:
-            return json.load(f)
-    return {}
+# Stored in SQLite (WAL mode) so every worker process shares one cache.
+CACHE_DB = os.environ.get("PRITHVI_CACHE_DB", os.path.join(BASE_DIR, "prithvi_cache.db"))
+LEGACY_CACHE_FILE = os.path.join(BASE_DIR, "advice_cache.json")
+
+advice_cache = SharedCache(CACHE_DB, namespace="advice")
+advice_cache.import_json_file(LEGACY_CACHE_FILE)
+
+# Advice per (class, language, schema version); hi/ta are translations of the
+# English entry. `python localization.py prewarm` fills all 38 classes.
+def ask_advice(prompt, config) -> str:
+    return gemini_scheduler.call("advice", model_gemini.generate_content, prompt, generation_config=config).text
+
+advice_catalog = AdviceCatalog(advice_cache, ask_advice)
+# Translations of route output that is cached in English (advisory matrix).
+translation_cache = SharedCache(CACHE_DB, namespace="translations")
+
+# Client retries: a POST with an Idempotency-Key header runs once; duplicates
+# join the running request or get its stored response (idempotency.py).
+idempotency_store = IdempotencyStore(
+    CACHE_DB,
+    ttl_seconds=float(os.environ.get("PRITHVI_IDEMPOTENCY_TTL", "900")),
+    lease_seconds=float(os.environ.get("PRITHVI_IDEMPOTENCY_LEASE", "300")),
+)
+app.add_middleware(
+    IdempotencyMiddleware,
+    store=idempotency_store,
+    wait_seconds=float(os.environ.get("PRITHVI_IDEMPOTENCY_WAIT", "120")),
+)
 
-def save_cache(new_data):
-    current_cache = load_cache()
-    current_cache.update(new_data)
-    with open(CACHE_FILE, "w") as f:
-        json.dump(current_cache, f, indent=4)
+# gzip (or brotli, if installed) for JSON bodies of PRITHVI_COMPRESS_MIN bytes
+# or more. Added last, so it is outermost: idempotent replays are compressed
+# per client too.
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.environ.get("PRITHVI_COMPRESS_MIN", "1024")))
+# Opt-in profiling (profiling.py): requests with `X-Profile: <PRITHVI_PROFILE_TOKEN>`
+# and a PRITHVI_PROFILE_SAMPLE fraction of scan / plan requests are profiled
+# and stored under their request id. Inside RequestIdMiddleware for that id.
+PROFILE_TOKEN = os.environ.get("PRITHVI_PROFILE_TOKEN", "")
+profile_store = ProfileStore(
+    CACHE_DB,
+    os.environ.get("PRITHVI_PROFILE_DIR", os.path.join(BASE_DIR, "profiles")),
+    keep=int(os.environ.get("PRITHVI_PROFILE_KEEP", "200")),
+)
+app.add_middleware(
+    ProfilingMiddleware,
+    store=profile_store,
+    token=PROFILE_TOKEN,
+    sample_rate=float(os.environ.get("PRITHVI_PROFILE_SAMPLE", "0")),
+)
+# Outermost: every log line of a request carries its X-Request-ID.
+app.add_middleware(RequestIdMiddleware)
 
 # ===== 4. CLASS LIST =====
-CLASS_NAMES = [
-    'Apple___Apple_scab', 'Apple___Black_rot', 'Apple___Cedar_apple_rust', 'Apple___healthy',
-    'Blueberry___healthy', 'Cherry_(including_sour)___Powdery_mildew', 'Cherry_(including_sour)___healthy',
-    'Corn_(maize)___Cercospora_leaf_spot_Gray_leaf_spot', 'Corn_(maize)___Common_rust_', 'Corn_(maize)___Northern_Leaf_Blight', 'Corn_(maize)___healthy',
-    'Grape___Black_rot', 'Grape___Esca_(Black_Measles)', 'Grape___Leaf_blight_(Isariopsis_Leaf_Spot)', 'Grape___healthy',
-    'Orange___Haunglongbing_(Citrus_greening)', 'Peach___Bacterial_spot', 'Peach___healthy',
-    'Pepper,_bell___Bacterial_spot', 'Pepper,_bell___healthy',
-    'Potato___Early_blight', 'Potato___Late_blight', 'Potato___healthy',
-    'Raspberry___healthy', 'Soybean___healthy', 'Squash___Powdery_mildew',
-    'Strawberry___Leaf_scorch', 'Strawberry___healthy',
-    'Tomato___Bacterial_spot', 'Tomato___Early_blight', 'Tomato___Late_blight', 'Tomato___Leaf_Mold',
-    'Tomato___Septoria_leaf_spot', 'Tomato___Spider_mites_Two-spotted_spider_mite', 'Tomato___Target_Spot',
-    'Tomato___Tomato_Yellow_Leaf_Curl_Virus', 'Tomato___Tomato_mosaic_virus', 'Tomato___healthy'
-]
+# CLASS_NAMES and the per-class lookup arrays live in class_index.py so that
+# offline tools (calibration, training) can use them without starting the API.
+
+# ===== 4B. CNN CLASSIFICATION (+ OPTIONAL TEST-TIME AUGMENTATION) =====
+# PRITHVI_TTA=1: when the single-view confidence is below the threshold,
+# re-run the leaf as a batch of flipped/rotated/cropped views in one forward
+# pass and average the softmax. Costs one extra (batched) CNN call, only on
+# uncertain scans, instead of escalating to another cloud round trip.
+TTA_ENABLED = os.environ.get("PRITHVI_TTA", "0") == "1"
+TTA_THRESHOLD = float(os.environ.get("PRITHVI_TTA_THRESHOLD", "0.6"))
+
+# Softmax temperature fitted offline (`python calibration.py --data ...`).
+# T=1.0 (no calibration.json) leaves the raw probabilities untouched.
+CALIBRATION_PATH = os.environ.get("PRITHVI_CALIBRATION", os.path.join(BASE_DIR, "calibration.json"))
+CNN_TEMPERATURE = load_temperature(CALIBRATION_PATH)
+TOP_K = int(os.environ.get("PRITHVI_TOP_K", "3"))
+
+def classify_leaf(img_array: np.ndarray):
+    """Returns (calibrated softmax over CLASS_NAMES, tta info dict or None, model version, temperature used)."""
+    # Pinned for both passes, so a hot-swap can't split one scan across versions.
+    with model_cnn.acquire() as model:
+        temperature = model.temperature or CNN_TEMPERATURE
+        probs = apply_temperature(model.predict(np.expand_dims(img_array, 0))[0], temperature)
+        confidence = float(np.max(probs))
+
+        if not TTA_ENABLED or confidence >= TTA_THRESHOLD:
+            return probs, None, model.version, temperature
+
+        start = time.perf_counter()
+        probs = apply_temperature(predict_tta(model, img_array), temperature)
+    tta_info = {
+        "applied": True,
+        "views": len(TTA_VIEWS),
+        "confidence_before": confidence,
+        "extra_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+    log.info("🔁 TTA: %.1f%% -> %.1f%% (%d views, +%s ms)", confidence * 100, float(np.max(probs)) * 100,
+             tta_info["views"], tta_info["extra_ms"])
+    return probs, tta_info, model.version, temperature
+
+def describe_prediction(probs: np.ndarray, temperature: float) -> dict:
+    """Top-k classes and per-crop probabilities, for triage in the UI."""
+    crop_probs = crop_marginals(probs)
+    return {
+        "top_k": [
+            {
+                "class": CLASS_NAMES[i],
+                "name": DIAGNOSIS_NAMES[i],
+                "probability": round(float(probs[i]), 4),
+            }
+            for i in top_k(probs, TOP_K)
+        ],
+        "crop_probabilities": {
+            CROP_DISPLAY_NAMES[i]: round(float(crop_probs[i]), 4)
+            for i in top_k(crop_probs, len(crop_probs))
+            if crop_probs[i] >= 0.005
+        },
+        "calibration_temperature": temperature,
+    }
+
+# ===== 4C. "SEEN THIS BEFORE" SIMILAR-SCAN INDEX =====
+# PRITHVI_SIMILARITY=1: embed every upload with the CNN's penultimate layer
+# and look it up among confirmed (High-confidence Gemini) past scans. If the
+# nearest neighbours all agree, the stored Gemini diagnosis is reused.
+SIMILARITY_ENABLED = os.environ.get("PRITHVI_SIMILARITY", "0") == "1"
+SIMILARITY_MIN = float(os.environ.get("PRITHVI_SIMILARITY_MIN", "0.92"))
+SIMILARITY_K = int(os.environ.get("PRITHVI_SIMILARITY_K", "5"))
+
+scan_index = ScanSimilarityIndex(CACHE_DB) if SIMILARITY_ENABLED else None
+if SIMILARITY_ENABLED and model_cnn.ready and not model_cnn.supports_embedding:
+    print("⚠️ Similar-scan index needs the in-process Keras model (PRITHVI_MODEL_FORMAT=h5) - disabled")
+
+# Embeddings only compare within one model version, so the index is only used
+# with the version this process started on (clear scan_embeddings when a
+# retrained model becomes the one loaded at startup).
+SIMILARITY_VERSION = model_cnn.version
+
+def embed_leaf(image_bytes: bytes):
+    """Penultimate-layer embedding of an upload, or None if unavailable."""
+    if scan_index is None or not model_cnn.supports_embedding:
+        return None
+    try:
+        with model_cnn.acquire() as model:
+            if model.version != SIMILARITY_VERSION:
+                return None
+            _, features = model.predict_with_embedding(np.expand_dims(preprocess_image(image_bytes), 0))
+        return features[0]
+    except Exception as e:
+        log.warning("⚠️ Embedding failed: %s: %s", type(e).__name__, e)
+        return None
+
+def find_similar_scan(image_bytes: bytes):
+    """(embedding, match, match_info) for an upload; blocking (CNN forward pass + index lookup)."""
+    embedding = embed_leaf(image_bytes)
+    if embedding is None:
+        return None, None, None
+    match, match_info = scan_index.find_match(embedding, k=SIMILARITY_K, min_similarity=SIMILARITY_MIN)
+    return embedding, match, match_info
+
+# ===== 4D. SCAN HISTORY (OUTBREAK DASHBOARDS) =====
+# Every served diagnosis is queued here and written in batches by a
+# background thread; /outbreaks aggregates it per day and region.
+HISTORY_DB = os.environ.get("PRITHVI_HISTORY_DB", os.path.join(BASE_DIR, "scan_history.db"))
+scan_history = ScanHistory(HISTORY_DB)
+
+@app.on_event("shutdown")
+def flush_scan_history():
+    scan_history.close()
+
+# First word of each crop ("corn", "pepper", ...) to tag free-text Gemini diagnoses.
+CROP_KEYWORDS = [(c.split()[0].strip(",").lower(), c) for c in CROP_DISPLAY_NAMES]
+
+def record_scan(result: dict, crop: str = None, lat: float = None, lon: float = None):
+    # Gemini's free text and the CNN's class are stored under one name
+    # ("Tomato - Early blight") whenever the diagnosis maps to a class.
+    name = str(result.get("diagnosis_name", "Unknown"))
+    healthy = result.get("healthy", "healthy" in name.lower())
+    class_name = class_for_scan(result)
+    if class_name is not None:
+        idx = CLASS_NAMES.index(class_name)
+        name, healthy = DIAGNOSIS_NAMES[idx], bool(IS_HEALTHY[idx])
+        crop = crop or CROP_DISPLAY_NAMES[CROP_OF_CLASS[idx]]
+    elif crop is None:
+        crop = next((display for word, display in CROP_KEYWORDS if word in name.lower()), None)
+    scan_history.record(
+        disease=name,
+        crop=crop,
+        healthy=healthy,
+        confidence=result.get("confidence_score"),
+        source=result.get("source"),
+        lat=lat,
+        lon=lon,
+    )
+
+# ===== 4E. IMAGE QUALITY PRE-CHECK =====
+# Blur, exposure and "is there a leaf at all" on a 128px thumbnail, a few ms
+# per upload (image_quality.py). Rejected photos never reach Gemini or the
+# CNN; borderline ones are scanned and carry the warning in `image_quality`.
+# PRITHVI_QUALITY_CHECK=0 disables it.
+QUALITY_CHECK = os.environ.get("PRITHVI_QUALITY_CHECK", "1") == "1"
+quality_model = image_quality.QualityModel.load(
+    os.environ.get("PRITHVI_QUALITY_MODEL", image_quality.DEFAULT_MODEL)
+)
+if QUALITY_CHECK:
+    print(f"🔍 Image quality pre-check: {'thresholds + plant classifier' if quality_model else 'thresholds'}")
+
+def check_image_quality(image_bytes: bytes):
+    """The assessment, or None if the check is disabled."""
+    if not QUALITY_CHECK:
+        return None
+    return image_quality.assess(image_bytes, quality_model)
+
+def with_quality(result: dict, quality) -> dict:
+    if quality is not None and quality["verdict"] == "warn":
+        result["image_quality"] = quality
+    return result
+
+def unusable_image_response(quality: dict) -> dict:
+    """Complete scan response for a rejected photo (same shape the frontend renders)."""
+    return {
+        "diagnosis_name": "Image Not Usable",
+        "confidence_score": "0%",
+        "professional_summary": "This photo can't be diagnosed reliably. " + " ".join(quality["reasons"]),
+        "physical_actions_checklist": quality["reasons"] + ["Retake the photo and scan again"],
+        "chemical_prescription": {"required": False, "specific_active_ingredients": []},
+        "preventative_measures": "Photograph a single leaf in daylight, filling most of the frame.",
+        "source": "🔍 Image Quality Check",
+        "image_quality": quality,
+    }
+
+# ===== 4F. SHADOW CNN EVALUATION =====
+# PRITHVI_SHADOW_SAMPLE=0.1: one in ten successful Gemini scans is also run
+# through the CNN after the response has gone out, on a niced, CPU-capped
+# background thread, to measure how often the two agree (GET /shadow-stats,
+# `python shadow_eval.py report`).
+#
+# Shadow jobs use their own single-threaded TFLite interpreter over the live
+# version's .tflite file (mmap'd, so the weights are shared), never the
+# request path's lock, TTA batch or Keras thread pool. Without a .tflite
+# file they fall back to the live model, one view, and only while no
+# request holds it.
+_shadow_models = {}
+
+def shadow_model():
+    """Private interpreter for the live version, or None if it has no .tflite export."""
+    live = model_cnn.current
+    path = getattr(getattr(live, "model", None), "path", None)
+    if path is None:
+        return None
+    tflite = path if path.endswith(".tflite") else tflite_path_for(path)
+    if not os.path.exists(tflite):
+        return None
+    key = (live.version, tflite)
+    if key not in _shadow_models:
+        _shadow_models.clear()
+        _shadow_models[key] = LoadedModel(
+            live.version, TFLiteCNN(tflite, num_threads=1), live.class_names, live.temperature
+        )
+    return _shadow_models[key]
+
+def shadow_busy() -> bool:
+    live = model_cnn.current
+    return shadow_model() is None and live is not None and live.inflight > 0
+
+def shadow_classify(image_bytes: bytes):
+    batch = np.expand_dims(preprocess_image(image_bytes), 0)
+    model = shadow_model()
+    if model is not None:
+        return apply_temperature(model.predict(batch)[0], model.temperature or CNN_TEMPERATURE), model.version
+    with model_cnn.acquire() as model:
+        return apply_temperature(model.predict(batch)[0], model.temperature or CNN_TEMPERATURE), model.version
+
+shadow_eval = ShadowEvaluator(
+    CACHE_DB, shadow_classify, busy=shadow_busy,
+    sample_rate=float(os.environ.get("PRITHVI_SHADOW_SAMPLE", "0")),
+    cpu_budget=float(os.environ.get("PRITHVI_SHADOW_CPU", "0.25")),
+    max_queue=int(os.environ.get("PRITHVI_SHADOW_QUEUE", "32")),
+)
 
 # ===== 5. GEMINI 3 ADVICE ENGINE =====
-def get_gemini_advice(disease_name: str) -> dict:
+def get_gemini_advice(disease_name: str, language: str = DEFAULT_LANGUAGE) -> dict:
     clean_name = disease_name.replace("_", " ")
 
     # A. CACHE CHECK (The "Quota Saver")
-    cache = load_cache()
-    if disease_name in cache:
-        print(f"⚡ CACHE HIT: Serving {clean_name} from memory.")
-        return cache[disease_name]
+    cached = advice_catalog.cached(disease_name, language)
+    if cached is not None:
+        log.info("⚡ CACHE HIT: Serving %s (%s) from memory.", clean_name, language)
+        return cached
 
-    # B. ASK GEMINI 3
-    print(f"🤖 ASKING GEMINI 3: {clean_name}...")
+    # B. ASK GEMINI 3 (English first; other languages translate it)
+    log.info("🤖 ASKING GEMINI 3: %s (%s)...", clean_name, language)
     try:
-        is_healthy = "healthy" in disease_name.lower()
-        
-        if is_healthy:
-            prompt = f"""
-            You are an agricultural expert for Indian farmers.
-            Diagnosis: {clean_name} (Healthy Crop).
-            
-            Output strictly valid JSON with this structure:
-            {{
-                "title": "Healthy Crop - {clean_name}",
-                "medicine_name": "No treatment needed",
-                "treatment": "Continue regular monitoring and maintenance.",
-                "prevention": "Maintain proper watering and nutrition schedule.",
-                "steps": [
-                    {{
-                        "action": "Monitor",
-                        "description": "Continue regular crop monitoring for any signs of disease.",
-                        "icon": "eye",
-                        "image_query": "healthy {clean_name.split('___')[0]} crop in field"
-                    }},
-                    {{
-                        "action": "Maintain",
-                        "description": "Ensure adequate water and nutrients for optimal growth.",
-                        "icon": "water",
-                        "image_query": "watering {clean_name.split('___')[0]} plants in farm"
-                    }}
-                ]
-            }}
-            """
-        else:
-            prompt = f"""
-            You are an agricultural expert for Indian farmers.
-            Diagnosis: {clean_name} (Disease Detected).
-            
-            Provide treatment advice in strictly valid JSON format with this exact structure:
-            {{
-                "title": "Disease Name",
-                "medicine_name": "Specific chemical/organic medicine name (e.g., Mancozeb, Neem Oil, Copper Sulfate)",
-                "treatment": "Brief summary of treatment approach",
-                "prevention": "Key prevention measure",
-                "steps": [
-                    {{
-                        "action": "Step name (e.g., Spray, Prune, Apply, Remove)",
-                        "description": "Detailed instruction with dosage (e.g., Mix 2g Mancozeb in 1L water and spray on affected leaves)",
-                        "icon": "spray|cut|water|leaf|package|eye|sun|droplets",
-                        "image_query": "descriptive search query for finding relevant image (e.g., 'farmer spraying fungicide on tomato plant', 'pruning diseased leaves', 'applying fertilizer to crops')"
-                    }}
-                ]
-            }}
-            
-            Important:
-            - Provide 3-5 actionable steps
-            - Each step MUST have an image_query field with a clear, searchable description
-            - Use Indian farming context in image queries
-            - Icon options: spray, cut, water, leaf, package, eye, sun, droplets
-            - Be specific about medicine names and dosages
-            - Make image queries detailed and relevant to Indian agriculture
-            
-            Disease to treat: {clean_name}
-            """
-        
-        response = model_gemini.generate_content(prompt)
-        text = response.text.strip() if hasattr(response, 'text') else str(response)
-        text = text.replace('```json', '').replace('```', '').strip()
-        
-        # Try to extract JSON if it's wrapped in other text
-        if '{' in text and '}' in text:
-            start_idx = text.find('{')
-            end_idx = text.rfind('}') + 1
-            if start_idx != -1 and end_idx > start_idx:
-                text = text[start_idx:end_idx]
-        
-        print(f"📝 Gemini Advice Response (first 150 chars): {text[:150]}...")
-        advice = json.loads(text)
-        
-        # Validate the structure
-        if not isinstance(advice.get('steps'), list):
-            raise ValueError("Steps must be an array")
-        
-        for step in advice['steps']:
-            if 'image_query' not in step:
-                # Fallback: generate a basic image query if missing
-                crop_name = clean_name.split('___')[0] if '___' in clean_name else clean_name
-                step['image_query'] = f"{step.get('action', 'treatment')} for {crop_name} disease"
-        
-        # Save to cache
-        save_cache({disease_name: advice})
-        return advice
-        
-    except json.JSONDecodeError as e:
-        print(f"⚠️ JSON Parse Error: {e}")
-        print(f"Raw response (first 400 chars): {text[:400] if 'text' in locals() else 'N/A'}")
-        return generate_fallback_advice(clean_name, is_healthy)
+        return advice_catalog.get(disease_name, language)
     except Exception as e:
-        print(f"⚠️ API Error: {e}")
-        print(f"Error type: {type(e).__name__}")
-        return generate_fallback_advice(clean_name, is_healthy)
+        log.warning("⚠️ Advice Error: %s: %s", type(e).__name__, e)
+        return generate_fallback_advice(clean_name, "healthy" in disease_name.lower())
 
 def generate_fallback_advice(disease_name: str, is_healthy: bool) -> dict:
     """Generate fallback advice when Gemini API fails"""
@@ -269,6 +552,61 @@ def generate_fallback_advice(disease_name: str, is_healthy: bool) -> dict:
             ]
         }
 
+# ===== 5B. LOCALIZED SCAN ADVICE =====
+# A scan in hi/ta carries the class's pre-translated advice from the catalog.
+# Only `advice` is localized: diagnosis_name, professional_summary and the
+# checklist stay in English, as Gemini or the CNN produced them.
+# A class/language that isn't cached yet is served in English and filled in
+# the background, so the request never waits on a translation.
+_advice_pending = {}
+
+def fill_advice_later(class_name: str, language: str):
+    key = (class_name, language)
+    if key in _advice_pending:
+        return
+    loop = asyncio.get_running_loop()
+    _advice_pending[key] = loop.run_in_executor(None, get_gemini_advice, class_name, language)
+    _advice_pending[key].add_done_callback(lambda _: _advice_pending.pop(key, None))
+
+def localize_scan(result: dict, language: str, class_name: str = None) -> dict:
+    result["language"] = DEFAULT_LANGUAGE
+    if language == DEFAULT_LANGUAGE:
+        return result
+    class_name = class_name or class_for_diagnosis(result.get("diagnosis_name"))
+    if class_name is None:
+        return result
+    advice = advice_catalog.cached(class_name, language)
+    if advice is None:
+        log.info("🌐 No %s advice cached for %s yet - serving English, filling in background", language, class_name)
+        fill_advice_later(class_name, language)
+        return result
+    result["advice"] = advice
+    result["language"] = language
+    return result
+
+async def translate_cached(document: dict, prompt_name: str, language: str, keep=()) -> dict:
+    """
+    `document` in `language`, translated once per distinct English document.
+    The result's `language` says what was served: English if the translation
+    failed, so callers don't cache that under the hi/ta key.
+    """
+    if language == DEFAULT_LANGUAGE:
+        return document
+    digest = hashlib.sha1(json.dumps(document, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    key = cache_key(language, prompt_name, digest)
+    translated = translation_cache.get(key)
+    if translated is not None:
+        log.info("⚡ CACHE HIT: %s in %s", prompt_name, language)
+        return {**translated, "language": language}
+    try:
+        translated = await asyncio.to_thread(translate, document, prompt_name, language, ask_advice, keep)
+    except Exception as e:
+        log.warning("⚠️ Translation to %s failed (%s: %s); serving English", language, type(e).__name__, e)
+        do_not_store()  # a retry may get the translation
+        return {**document, "language": DEFAULT_LANGUAGE}
+    translation_cache.set(key, translated)
+    return {**translated, "language": language}
+
 # ===== 6. GEMINI 3 VISION DIAGNOSIS (PRIMARY METHOD) =====
 import base64
 
@@ -277,83 +615,35 @@ def diagnose_with_gemini_vision(image_data: bytes) -> dict:
     PRIMARY: Use Gemini 3 Vision to analyze plant leaf images
     Returns disease diagnosis with confidence and treatment steps
     """
+    quality = check_image_quality(image_data)
+    if quality is not None and quality["verdict"] == "reject":
+        return {
+            "error": "Image not usable: " + " ".join(quality["reasons"]),
+            "is_plant": False,
+            "source": "Image Quality Check",
+            "image_quality": quality,
+        }
+
     try:
         # Convert image to base64
         image_base64 = base64.standard_b64encode(image_data).decode('utf-8')
         mime_type = "image/jpeg"
         
-        prompt = """
-        You are an expert agricultural plant pathologist specializing in crop disease identification.
-        
-        Analyze this plant leaf image carefully:
-        
-        1. **Is this a plant leaf?** If not, respond with {"is_plant": false}
-        2. **Disease Identification:** Identify the specific disease or if the plant is healthy
-        3. **Confidence:** Estimate confidence (0.0-1.0) based on visual clarity and symptom visibility
-        4. **Treatment Steps:** Provide 3-5 specific treatment steps
-        
-        IMPORTANT: Respond in STRICT JSON format (no markdown, no code blocks):
-        {
-          "is_plant": true,
-          "predicted_class": "Tomato Early Blight",
-          "crop": "Tomato",
-          "disease": "Early Blight",
-          "is_healthy": false,
-          "confidence": 0.95,
-          "confidence_percentage": "95%",
-          "visual_symptoms": "Brown circular lesions with concentric rings on lower leaves",
-          "treatment": [
-            {
-              "step": 1,
-              "action": "Remove infected leaves",
-              "description": "Prune all infected leaves from the base of the plant",
-              "icon": "cut"
-            },
-            {
-              "step": 2,
-              "action": "Apply fungicide",
-              "description": "Spray Mancozeb (2g per liter) every 10-14 days",
-              "icon": "spray"
-            },
-            {
-              "step": 3,
-              "action": "Improve drainage",
-              "description": "Ensure proper spacing and avoid overhead watering",
-              "icon": "water"
-            },
-            {
-              "step": 4,
-              "action": "Monitor regularly",
-              "description": "Check plants every 2-3 days for new lesions",
-              "icon": "eye"
-            },
-            {
-              "step": 5,
-              "action": "Crop rotation",
-              "description": "Next season, plant in a different field location",
-              "icon": "leaf"
-            }
-          ],
-          "prevention": [
-            "Use disease-resistant varieties",
-            "Maintain proper plant spacing",
-            "Avoid overhead watering",
-            "Remove plant debris after harvest"
-          ],
-          "medicine_recommendation": "Mancozeb, Chlorothalonil, or Neem oil"
-        }
-        """
+        prompt = render_prompt("vision_diagnosis")
         
-        print("🔍 Sending image to Gemini 3 Vision for diagnosis...")
+        log.info("🔍 Sending image to Gemini 3 Vision for diagnosis...")
         
-        response = model_gemini.generate_content(
+        response = gemini_scheduler.call(
+            "scan",
+            model_gemini.generate_content,
             [
                 {
                     "mime_type": mime_type,
                     "data": image_base64
                 },
                 prompt
-            ]
+            ],
+            generation_config=prompt_config("vision_diagnosis"),
         )
         
         # Parse response
@@ -371,7 +661,7 @@ def diagnose_with_gemini_vision(image_data: bytes) -> dict:
             if start_idx != -1 and end_idx > start_idx:
                 text = text[start_idx:end_idx]
         
-        print(f"🔍 Gemini Response (first 200 chars): {text[:200]}...")
+        log.debug("🔍 Gemini Response (first 200 chars): %s...", text[:200])
         diagnosis = json.loads(text)
         
         # Validate response
@@ -386,16 +676,15 @@ def diagnose_with_gemini_vision(image_data: bytes) -> dict:
         diagnosis["source"] = "Gemini 3 Vision (Primary)"
         diagnosis["method"] = "gemini_vision"
         
-        print(f"✅ Gemini 3 Diagnosis: {diagnosis.get('predicted_class')} ({diagnosis.get('confidence_percentage')})")
-        return diagnosis
+        log.info("✅ Gemini 3 Diagnosis: %s (%s)", diagnosis.get("predicted_class"), diagnosis.get("confidence_percentage"))
+        return with_quality(diagnosis, quality)
         
     except json.JSONDecodeError as e:
-        print(f"⚠️ JSON Parse Error from Gemini Vision: {e}")
-        print(f"Raw text (first 300 chars): {text[:300] if 'text' in locals() else 'No text'}")
+        log.warning("⚠️ JSON Parse Error from Gemini Vision: %s", e)
+        log.debug("Raw text (first 300 chars): %s", text[:300] if 'text' in locals() else 'No text')
         return {"error": f"Failed to parse Gemini response: {str(e)}", "source": "gemini_vision"}
     except Exception as e:
-        print(f"⚠️ Gemini 3 Vision Error: {e}")
-        print(f"Error type: {type(e).__name__}")
+        log.warning("⚠️ Gemini 3 Vision Error: %s: %s", type(e).__name__, e)
         return {"error": str(e), "source": "gemini_vision"}
 
 # ===== 7B. COMPLETE FALLBACK RESPONSE GENERATOR =====
@@ -445,10 +734,10 @@ def predict_with_h5_model(image_data: bytes) -> dict:
     Returns COMPLETE data structure - no missing fields
     """
     try:
-        print("⚡ Using H5 Model for prediction...")
+        log.info("⚡ Using H5 Model for prediction...")
         
-        if model_cnn is None or not MODEL_AVAILABLE:
-            print("❌ H5 Model not available")
+        if not model_cnn.ready:
+            log.error("❌ H5 Model not available")
             return {
                 "error": "Model not loaded",
                 "is_plant": False,
@@ -456,18 +745,17 @@ def predict_with_h5_model(image_data: bytes) -> dict:
             }
         
         # Load and preprocess image
-        image = Image.open(io.BytesIO(image_data)).convert('RGB')
-        image = image.resize((128, 128))
-        img_batch = np.expand_dims(np.array(image) / 255.0, 0)
+        img_array = preprocess_image(image_data, Image.BICUBIC)
         
         # Predict
-        predictions = model_cnn.predict(img_batch, verbose=0)
-        confidence = float(np.max(predictions[0]))
-        predicted_class = CLASS_NAMES[np.argmax(predictions[0])]
+        probs, tta_info, model_version, temperature = classify_leaf(img_array)
+        class_idx = int(np.argmax(probs))
+        confidence = float(probs[class_idx])
+        predicted_class = CLASS_NAMES[class_idx]
         
-        is_healthy = 'healthy' in predicted_class.lower()
-        crop = predicted_class.split('___')[0] if '___' in predicted_class else predicted_class
-        disease = predicted_class.split('___')[1].replace('_', ' ') if '___' in predicted_class else 'Unknown'
+        is_healthy = bool(IS_HEALTHY[class_idx])
+        crop = CLASS_CROPS[class_idx]
+        disease = CLASS_DISEASES[class_idx]
         
         # Get treatment advice
         advice = get_gemini_advice(predicted_class)
@@ -488,15 +776,17 @@ def predict_with_h5_model(image_data: bytes) -> dict:
             "medicine_recommendation": advice.get("medicine_name", "Consult local expert") if advice else "Unknown",
             "visual_symptoms": f"Detected: {disease}" if disease else "Unknown disease detected",
             "treatment_steps": advice.get("steps", []) if advice else [],
-            "critical_timeline": []
+            "critical_timeline": [],
+            "tta": tta_info,
+            "model_version": model_version,
+            **describe_prediction(probs, temperature)
         }
         
-        print(f"✅ H5 Model Result: {predicted_class} ({confidence*100:.0f}%)")
+        log.info("✅ H5 Model Result: %s (%.0f%%)", predicted_class, confidence * 100)
         return result
         
     except Exception as e:
-        print(f"❌ H5 Model Error: {type(e).__name__}: {e}")
-        print(traceback.format_exc())
+        log.exception("❌ H5 Model Error: %s: %s", type(e).__name__, e)
         return {
             "error": f"H5 Model Failed: {str(e)}",
             "is_plant": False,
@@ -508,7 +798,7 @@ def predict_with_h5_model(image_data: bytes) -> dict:
 def home():
     return {
         "status": "✅ PrithviPulse Backend Running",
-        "model_status": "✅ H5 Model Available" if MODEL_AVAILABLE else "❌ H5 Model Failed",
+        "model_status": f"✅ H5 Model Available ({model_cnn.version})" if model_cnn.ready else "❌ H5 Model Failed",
         "gemini_model": GEMINI_MODEL_NAME,
         "gemini_status": "✅ Gemini 3 Preview Connected" if GEMINI_API_KEY else "❌ No API Key",
         "endpoints": [
@@ -525,7 +815,13 @@ def home():
 # ===== 7. PURE GEMINI 3 VISION SCAN ENDPOINT =====
 
 @app.post("/scan_disease")
-async def scan_disease_hybrid(file: UploadFile = File(...)):
+async def scan_disease_hybrid(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    lat: Optional[float] = Form(None),
+    lon: Optional[float] = Form(None),
+    language: Optional[str] = Form(DEFAULT_LANGUAGE),
+):
     """
     🛡️ GEMINI 3 PRIMARY → H5 FALLBACK SCANNER
     
@@ -533,26 +829,49 @@ async def scan_disease_hybrid(file: UploadFile = File(...)):
     TIER 2: Local .h5 Model (Guaranteed Offline Backup)
     
     Tries the best option first, falls back if needed!
+    Optional `lat`/`lon` form fields place the scan on the outbreak map.
+    `language` (en/hi/ta) adds the class's advice in that language as `advice`;
+    the rest of the response stays in English.
     """
-    import traceback
-    
-    print(f"\n📸 HYBRID SCAN: {file.filename}")
+    language = normalize_language(language)
+    log.info("📸 HYBRID SCAN: %s (%s)", file.filename, language)
 
     # 1. READ IMAGE FILE
     try:
         image_bytes = await file.read()
         image_part = {"mime_type": file.content_type or "image/jpeg", "data": image_bytes}
-        print(f"✅ Image read: {len(image_bytes)} bytes")
+        log.debug("✅ Image read: %d bytes", len(image_bytes))
     except Exception as e:
+        do_not_store()
         return {"error": f"Failed to read image: {str(e)}"}
 
+    quality = check_image_quality(image_bytes)
+    if quality is not None:
+        log.info("🔍 Quality: %s (%s ms) %s", quality["verdict"], quality["ms"], " ".join(quality["reasons"]),
+                 extra=fields(quality=quality["verdict"], quality_ms=quality["ms"]))
+        if quality["verdict"] == "reject":
+            return unusable_image_response(quality)
+
+    # ==========================================
+    # 🧭 TIER 0: SIMILAR PAST SCAN (NO CLOUD CALL)
+    # ==========================================
+    # The forward pass and index lookup run on a worker thread, off the event loop.
+    embedding, match, match_info = await asyncio.to_thread(find_similar_scan, image_bytes)
+    if match is not None:
+        match["source"] = "⚡ Similar Past Scan (Gemini 3 diagnosis reused)"
+        match["similar_scans"] = match_info
+        log.info("✅ Similar-scan hit: %s (min similarity %.3f)", match.get("diagnosis_name", "Unknown"),
+                 min(match_info["similarities"]), extra=fields(tier="similar"))
+        record_scan(match, lat=lat, lon=lon)
+        return localize_scan(with_quality(match, quality), language)
+
     # ==========================================
     # 🌩️ TIER 1: GEMINI 3 CLOUD AI (PRIMARY)
     # ==========================================
-    print("\n🚀 TIER 1: Attempting GEMINI 3 CLOUD AI...")
+    log.debug("🚀 TIER 1: Attempting GEMINI 3 CLOUD AI...")
     
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+        model = model_gemini_scan
         
         prompt = """You are an expert Agricultural Pathologist. Analyze this leaf image and diagnose any plant disease.
 
@@ -570,8 +889,8 @@ Return ONLY valid JSON, no markdown:
   "preventative_measures": "Prevention tips"
 }"""
 
-        print(f"   Sending to {GEMINI_MODEL_NAME}...")
-        response = model.generate_content([prompt, image_part])
+        log.debug("   Sending to %s...", GEMINI_MODEL_NAME)
+        response = await gemini_scheduler.acall("scan", model.generate_content, [prompt, image_part])
         
         text = response.text.strip()
         # Remove markdown
@@ -585,21 +904,31 @@ Return ONLY valid JSON, no markdown:
         
         data = json.loads(text)
         data["source"] = "✅ Gemini 3 Cloud AI"
-        print(f"✅ Gemini 3 Success: {data.get('diagnosis_name', 'Unknown')}\n")
-        return data
+        log.info("✅ Gemini 3 Success: %s", data.get("diagnosis_name", "Unknown"), extra=fields(tier="gemini"))
+
+        # Only confident cloud diagnoses become reusable references; stored once
+        # the response is sent (copied now, before localization adds fields).
+        if embedding is not None and str(data.get("confidence_score", "")).lower() == "high":
+            background_tasks.add_task(scan_index.add, embedding,
+                                      str(data.get("diagnosis_name", "")).strip().lower(), dict(data))
+        record_scan(data, lat=lat, lon=lon)
+        # Queued once the response is sent; the CNN runs on the shadow thread.
+        if model_cnn.ready:
+            background_tasks.add_task(shadow_eval.submit, image_bytes, data)
+        return localize_scan(with_quality(data, quality), language)
 
     except Exception as cloud_error:
-        print(f"⚠️  Gemini 3 failed: {type(cloud_error).__name__}")
-        print(f"   Error message: {str(cloud_error)[:80]}")
-        print(f"   → Activating H5 LOCAL FALLBACK...\n")
+        log.warning("⚠️ Gemini 3 failed: %s: %s - activating H5 LOCAL FALLBACK",
+                    type(cloud_error).__name__, str(cloud_error)[:80])
 
     # ==========================================
     # 🏠 TIER 2: LOCAL H5 MODEL (FALLBACK)
     # ==========================================
-    print("🔄 TIER 2: Using LOCAL H5 MODEL...")
+    log.debug("🔄 TIER 2: Using LOCAL H5 MODEL...")
     
-    if model_cnn is None or not MODEL_AVAILABLE:
-        print("❌ H5 Model not loaded - complete system failure\n")
+    if not model_cnn.ready:
+        log.error("❌ H5 Model not loaded - complete system failure")
+        do_not_store()
         return {
             "error": "All systems failed - Gemini 3 unavailable, H5 not loaded",
             "diagnosis_name": "System Failure",
@@ -611,60 +940,26 @@ Return ONLY valid JSON, no markdown:
         }
 
     try:
-        print("   Step 1: Loading image...")
-        img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        print(f"   ✓ Image opened: {img.size}")
-        
-        print("   Step 2: Resizing to 128x128...")
-        # Use Image.LANCZOS (compatible with older PIL)
-        try:
-            # Try new API first (PIL 10.0.0+)
-            img = img.resize((128, 128), Image.Resampling.LANCZOS)
-        except (AttributeError, TypeError):
-            # Fall back to old API
-            img = img.resize((128, 128), Image.LANCZOS)
-        print(f"   ✓ Resized to: {img.size}")
-        
-        print("   Step 3: Converting to numpy array...")
-        img_array = np.array(img, dtype=np.float32)
-        print(f"   ✓ Array shape: {img_array.shape}, dtype: {img_array.dtype}")
-        print(f"   ✓ Value range before norm: [{img_array.min():.1f}, {img_array.max():.1f}]")
-        
-        print("   Step 4: Normalizing to 0-1 range...")
-        img_array = img_array / 255.0
-        print(f"   ✓ Normalized range: [{img_array.min():.3f}, {img_array.max():.3f}]")
-        
-        print("   Step 5: Adding batch dimension...")
-        img_batch = np.expand_dims(img_array, axis=0)
-        print(f"   ✓ Batch shape: {img_batch.shape}")
+        img_array = preprocess_image(image_bytes)
+        predictions, tta_info, model_version, temperature = classify_leaf(img_array)
+        if log.isEnabledFor(logging.DEBUG):
+            # Array statistics are only computed when someone is reading them.
+            log.debug("   ✓ Input %s %s, range [%s, %s]; %s output, range [%.6f, %.6f], sum %.6f",
+                      img_array.shape, img_array.dtype, img_array.min(), img_array.max(), model_cnn.format,
+                      predictions.min(), predictions.max(), predictions.sum())
 
-        print("   Step 6: Running H5 model prediction...")
-        print(f"   Input characteristics: shape={img_batch.shape}, dtype={img_batch.dtype}")
-        print(f"   Model expects shape: (batch, 128, 128, 3)")
-        
-        predictions = model_cnn.predict(img_batch, verbose=0)
-        print(f"   ✓ Prediction output shape: {predictions.shape}")
-        print(f"   ✓ Prediction values - min: {predictions.min():.6f}, max: {predictions.max():.6f}")
-        print(f"   ✓ Prediction sum: {predictions.sum():.6f}")
-        
         # Get prediction
-        confidence = float(np.max(predictions[0]))
-        class_idx = np.argmax(predictions[0])
+        class_idx = int(np.argmax(predictions))
+        confidence = float(predictions[class_idx])
         raw_class = CLASS_NAMES[class_idx]
-        
-        print(f"   ✓ Predicted class index: {class_idx}")
-        print(f"   ✓ Class name: {raw_class}")
-        print(f"   ✓ Confidence: {confidence*100:.1f}%")
-        
+
         # Clean name
-        diagnosis = raw_class.replace("___", " - ").replace("_", " ")
-        is_healthy = "healthy" in raw_class.lower()
-        
-        print(f"   ✓ Clean: {diagnosis}")
-        print(f"   ✓ Healthy: {is_healthy}")
+        diagnosis = DIAGNOSIS_NAMES[class_idx]
+        is_healthy = bool(IS_HEALTHY[class_idx])
+        log.info("   ✓ CNN: %s (%.1f%%)", raw_class, confidence * 100,
+                 extra=fields(class_idx=class_idx, confidence=round(confidence, 4), healthy=is_healthy))
 
         # Select chemicals by disease type
-        print("   Step 7: Selecting treatment...")
         d = raw_class.lower()
         
         if "bacterial" in d:
@@ -685,11 +980,10 @@ Return ONLY valid JSON, no markdown:
             chems = ["Imidacloprid 17.8% - 1ml/L", "Neem Oil 3% - 5ml/L"]
         else:
             chems = ["Mancozeb 75% - 2.5g/L", "Copper Oxychloride 50% - 3g/L"]
-        
-        print(f"   ✓ Selected {len(chems)} chemicals")
+
 
         # Build response
-        crop = diagnosis.split(" - ")[0] if " - " in diagnosis else diagnosis.split()[0]
+        crop = CROP_DISPLAY_NAMES[CROP_OF_CLASS[class_idx]]
         
         result = {
             # New detailed format
@@ -717,16 +1011,19 @@ Return ONLY valid JSON, no markdown:
             "confidence": float(confidence),  # 0-1 range as number
             "healthy": is_healthy,
             "treatment": [] if is_healthy else chems,
-            "preventativeMeasures": [f"{'Maintain excellent hygiene and spacing.' if is_healthy else f'{crop}: Rotate crops 2-3 years, space plants properly, remove crop debris, use resistant varieties, avoid overhead watering.'}"]
+            "preventativeMeasures": [f"{'Maintain excellent hygiene and spacing.' if is_healthy else f'{crop}: Rotate crops 2-3 years, space plants properly, remove crop debris, use resistant varieties, avoid overhead watering.'}"],
+            "tta": tta_info,
+            "model_version": model_version,
+            **describe_prediction(predictions, temperature)
         }
         
-        print(f"\n✅ H5 COMPLETE: {diagnosis}\n")
-        return result
+        log.info("✅ H5 COMPLETE: %s", diagnosis, extra=fields(tier="cnn"))
+        record_scan(result, crop=crop, lat=lat, lon=lon)
+        return localize_scan(with_quality(result, quality), language, raw_class)
 
     except Exception as h5_error:
-        print(f"\n❌ H5 MODEL ERROR: {type(h5_error).__name__}: {str(h5_error)}\n")
-        traceback.print_exc()
-        
+        log.exception("❌ H5 MODEL ERROR: %s: %s", type(h5_error).__name__, h5_error)
+        do_not_store()
         return {
             "error": f"H5 processing failed: {str(h5_error)[:100]}",
             "diagnosis_name": "Processing Error",
@@ -740,16 +1037,146 @@ Return ONLY valid JSON, no markdown:
 
 
 @app.post("/predict")
-async def predict(file: UploadFile = File(...)):
+async def predict(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    lat: Optional[float] = Form(None),
+    lon: Optional[float] = Form(None),
+    language: Optional[str] = Form(DEFAULT_LANGUAGE),
+):
     """
     Backward compatibility endpoint.
     Redirects to /scan_disease for hybrid Gemini 3 + H5 analysis.
     """
-    return await scan_disease_hybrid(file)
+    return await scan_disease_hybrid(background_tasks, file, lat, lon, language)
+
+
+@app.get("/gemini-stats")
+def gemini_stats():
+    """Queue wait, shed and error counts per Gemini priority class (this worker)."""
+    return gemini_scheduler.report()
+
+
+@app.get("/shadow-stats")
+def shadow_stats(since_days: float = 30):
+    """CNN-vs-Gemini agreement from shadow evaluation, per class, confidence band and threshold."""
+    return shadow_eval.report(since_days)
+
+@app.get("/idempotency-stats")
+def idempotency_stats():
+    """Requests executed / replayed / joined via Idempotency-Key (counts: this worker)."""
+    return idempotency_store.report()
+
+
+def require_profile_token(request: Request):
+    # Fails closed, like the model admin routes: no PRITHVI_PROFILE_TOKEN, no profile access.
+    if not PROFILE_TOKEN:
+        raise HTTPException(status_code=403, detail="Profile access is disabled; set PRITHVI_PROFILE_TOKEN")
+    if not hmac.compare_digest(request.headers.get("x-profile", ""), PROFILE_TOKEN):
+        raise HTTPException(status_code=403, detail="Send the profiling token in X-Profile")
+
+@app.get("/profiles")
+def list_profiles(request: Request, path: Optional[str] = None, limit: int = 20, since_hours: float = 24):
+    """Slowest recent request profiles, optionally for one path (e.g. /scan_disease)."""
+    require_profile_token(request)
+    return {**profile_store.counts, "profiles": profile_store.slowest(path, min(limit, 200), since_hours)}
+
+@app.get("/profiles/{request_id}")
+def get_profile(request: Request, request_id: str):
+    """The profile artifact: pyinstrument HTML, or cProfile stats for `python -m pstats`."""
+    require_profile_token(request)
+    found = profile_store.get(request_id)
+    if found is None or not os.path.exists(found[1]):
+        raise HTTPException(status_code=404, detail=f"No profile for request {request_id}")
+    kind, path = found
+    if kind == "pyinstrument":
+        return FileResponse(path, media_type="text/html")
+    return FileResponse(path, media_type="application/octet-stream", filename=os.path.basename(path))
+
+ADMIN_TOKEN = os.environ.get("PRITHVI_ADMIN_TOKEN", "")
+
+def require_admin_token(request: Request):
+    # Fails closed: with no PRITHVI_ADMIN_TOKEN configured the model admin routes are disabled.
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model admin is disabled; set PRITHVI_ADMIN_TOKEN")
+    if not hmac.compare_digest(request.headers.get("x-admin-token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Send the admin token in X-Admin-Token")
+
+@app.get("/models")
+def list_models():
+    """Registered CNN versions and what this worker is serving, loading and draining."""
+    manifest = model_registry.load()
+    return {
+        **model_cnn.report(),
+        "active": manifest.get("active"),
+        "history": manifest.get("history", []),
+        "versions": {
+            name: {k: v for k, v in entry.items() if k != "classes"} | {"classes": len(entry["classes"])}
+            for name, entry in manifest["versions"].items()
+        },
+    }
+
+def ensure_swap_possible():
+    """Checked before the manifest is written, so a refused swap leaves `active` unchanged for every worker."""
+    if model_cnn.registry is None:
+        raise HTTPException(status_code=409, detail="Serving from the inference pool; restart the pool instead")
+    if model_cnn.loading:
+        raise HTTPException(status_code=409, detail=f"Already loading {model_cnn.loading}")
+
+def start_model_swap(entry: dict) -> dict:
+    if not model_cnn.swap_to(entry):
+        raise HTTPException(status_code=409, detail=f"Already loading {model_cnn.loading}")
+    # Other workers pick the manifest change up within a few seconds.
+    return {"activating": entry["version"], **model_cnn.report()}
+
+@app.post("/models/{version}/activate", status_code=202)
+def activate_model(request: Request, version: str):
+    """Load and warm `version` in the background, then switch traffic to it."""
+    require_admin_token(request)
+    ensure_swap_possible()
+    try:
+        return start_model_swap(model_registry.activate(version))
+    except RegistryError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/models/rollback", status_code=202)
+def rollback_model(request: Request):
+    """Switch back to the previously active version."""
+    require_admin_token(request)
+    ensure_swap_possible()
+    try:
+        return start_model_swap(model_registry.rollback())
+    except RegistryError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/outbreaks")
+def outbreaks(days: int = 30, precision: int = 4, crop: Optional[str] = None,
+              disease: Optional[str] = None, region: Optional[str] = None,
+              include_healthy: bool = False, limit: int = 1000):
+    """
+    Disease counts per day per region (geohash prefix of `precision` chars,
+    4 = ~district) over the last `days` days, from the scan history rollup.
+    """
+    start = time.perf_counter()
+    rows = scan_history.outbreaks(days, precision, crop, disease, region, include_healthy, limit)
+    return {
+        "days": days,
+        "precision": precision,
+        "rows": rows,
+        "query_ms": round((time.perf_counter() - start) * 1000, 2),
+        "writer": scan_history.stats(),
+    }
 
         
 
 # ===== 7A. CROP ADVISORY ENDPOINT (GEMINI 3 REASONING) =====
+# Soil x season x district answers are precomputed offline
+# (`python advisory_matrix.py build`); unseen combinations are generated
+# live and written back when they are a listed soil, season and district.
+ADVISORY_DB = os.environ.get("PRITHVI_ADVISORY_DB", os.path.join(BASE_DIR, "advisory_matrix.db"))
+advisory_matrix = AdvisoryMatrix(ADVISORY_DB)
+print(f"🧮 Advisory matrix: {len(advisory_matrix)} precomputed combinations")
+
 @app.post("/advise-crop")
 async def advise_crop(request: dict):
     """
@@ -760,54 +1187,23 @@ async def advise_crop(request: dict):
         soil = request.get("soil", "Unknown")
         season = request.get("season", "Unknown")
         location = request.get("location", "India")
+        language = normalize_language(request.get("language"))
         
-        print(f"🌾 CROP ADVISORY REQUEST: Soil={soil}, Season={season}, Location={location}")
+        log.info("🌾 CROP ADVISORY REQUEST: Soil=%s, Season=%s, Location=%s, Language=%s", soil, season, location, language)
+
+        # The matrix holds English answers; other languages are cached translations.
+        advisory = advisory_matrix.get(soil, season, location)
+        if advisory is not None:
+            log.info("⚡ MATRIX HIT: %s", " / ".join(advisory_matrix.key(soil, season, location)))
+            return await translate_cached(advisory, "advise_crop", language)
         
         # Craft a detailed prompt for Gemini 3
-        prompt = f"""
-        Act as an experienced Indian Agronomist with expertise in crop planning and market analysis.
-        
-        Farmer's Context:
-        - Soil Type: {soil}
-        - Season: {season}
-        - Location: {location}
-        
-        Task:
-        Recommend the TOP 3 most profitable crops for this farmer considering:
-        1. Soil compatibility and nutrient requirements
-        2. Seasonal suitability and climate factors
-        3. Current market demand and price trends in India
-        4. Expected yield and duration
-        5. Water requirements and sustainability
-        
-        Output Format (STRICT JSON):
-        {{
-            "recommendations": [
-                {{
-                    "name": "Crop Name (Local + Scientific)",
-                    "suitability": 85,
-                    "yield": "Expected yield per acre (e.g., 25-30 quintals/acre)",
-                    "duration": "Growth period in days (e.g., 90-120 days)",
-                    "reason": "Detailed explanation covering soil match, market demand, profitability, and farmer benefits",
-                    "marketTrend": "Up|Down|Stable",
-                    "waterRequirement": "Low|Medium|High",
-                    "investment": "Estimated cost per acre in INR"
-                }}
-            ],
-            "seasonalTips": "2-3 key tips for this season and soil type",
-            "warnings": "Any risks or challenges to watch out for"
-        }}
-        
-        Important:
-        - Use Indian crop names (e.g., Arhar, Bajra, Jowar)
-        - Consider kharif, rabi, zaid seasons
-        - Base recommendations on real agricultural science
-        - Provide actionable reasoning that helps farmers decide
-        - Include current 2026 market trends
-        """
+        prompt = render_prompt("advise_crop", soil=soil, season=season, location=location)
         
         # Call Gemini 3 with thinking mode
-        response = model_gemini.generate_content(prompt)
+        response = await gemini_scheduler.acall(
+            "advice", model_gemini.generate_content, prompt, generation_config=prompt_config("advise_crop")
+        )
         text = response.text.strip() if hasattr(response, 'text') else str(response)
         
         # Clean potential markdown
@@ -821,7 +1217,7 @@ async def advise_crop(request: dict):
             if start_idx != -1 and end_idx > start_idx:
                 text = text[start_idx:end_idx]
         
-        print(f"🌾 Advisory Response (first 150 chars): {text[:150]}...")
+        log.debug("🌾 Advisory Response (first 150 chars): %s...", text[:150])
         advisory = json.loads(text)
         
         # Validate structure
@@ -832,17 +1228,20 @@ async def advise_crop(request: dict):
         if len(advisory["recommendations"]) == 0:
             raise ValueError("No recommendations generated")
         
-        print(f"✅ Generated {len(advisory['recommendations'])} crop recommendations")
-        return advisory
+        log.info("✅ Generated %d crop recommendations", len(advisory["recommendations"]))
+        if advisory_matrix.put(soil, season, location, advisory):
+            log.info("🧮 Written back to the advisory matrix")
+        return await translate_cached(advisory, "advise_crop", language)
         
     except json.JSONDecodeError as e:
-        print(f"⚠️ JSON Parse Error in Crop Advisory: {e}")
+        log.warning("⚠️ JSON Parse Error in Crop Advisory: %s", e)
         return generate_fallback_advisory(soil, season)
     except Exception as e:
-        print(f"⚠️ Crop Advisory Error: {e}")
+        log.warning("⚠️ Crop Advisory Error: %s", e)
         return generate_fallback_advisory(soil, season)
 
 
+@fallback_response
 def generate_fallback_advisory(soil: str, season: str) -> dict:
     """Fallback recommendations if Gemini fails"""
     return {
@@ -890,46 +1289,17 @@ async def farm_plan(request: dict):
         water_source = request.get("waterSource", "Unknown")
         budget = request.get("budget", 0)
         land_size = request.get("landSize", 0)
+        language = normalize_language(request.get("language"))
+
+        log.info("🌱 FARM PLAN REQUEST: Soil=%s, Water=%s, Budget=%s, Land=%s", soil_type, water_source, budget, land_size)
+
+        prompt = render_prompt(
+            "farm_plan", soil_type=soil_type, water_source=water_source, budget=budget, land_size=land_size
+        ) + language_instruction(language)
 
-        print(f"🌱 FARM PLAN REQUEST: Soil={soil_type}, Water={water_source}, Budget={budget}, Land={land_size}")
-
-        prompt = f"""
-        You are a senior Indian agronomist and farm planner.
-
-        Farmer Inputs:
-        - Soil Type: {soil_type}
-        - Water Source: {water_source}
-        - Budget (INR): {budget}
-        - Land Size (acres): {land_size}
-
-        Task:
-        Create a single crop plan for one season, tailored for Indian conditions.
-        Use Indian context: mention Mandi pricing, FYM, Jeevamrutha (if organic fits),
-        and local practices. Keep language simple for farmers.
-
-        Output STRICT JSON (no markdown):
-        {{
-          "cropName": "Crop name with local variety",
-          "expectedProfit": "Estimated profit for total land size in INR",
-          "duration": "Total crop duration in days",
-          "shoppingList": ["Seeds", "FYM/Compost", "Drip pipes", "Bio pesticide"],
-          "timeline": [
-            {{"action": "Plowing", "description": "...", "icon": "package"}},
-            {{"action": "Sowing", "description": "...", "icon": "leaf"}},
-            {{"action": "Irrigation", "description": "...", "icon": "water"}},
-            {{"action": "Spray", "description": "...", "icon": "spray"}},
-            {{"action": "Harvest", "description": "...", "icon": "sun"}}
-          ]
-        }}
-
-        Rules:
-        - Use icons only from: spray, cut, water, leaf, package, eye, sun, droplets
-        - Timeline must include plowing, sowing, irrigation, pest management, harvest
-        - If organic is suitable, mention FYM and Jeevamrutha in shopping list or timeline
-        - Ensure profit is realistic for India 2026 Mandi prices
-        """
-
-        response = model_gemini.generate_content(prompt)
+        response = await gemini_scheduler.acall(
+            "plan", model_gemini.generate_content, prompt, generation_config=prompt_config("farm_plan")
+        )
         text = response.text.strip()
 
         if text.startswith('```'):
@@ -943,13 +1313,14 @@ async def farm_plan(request: dict):
         return plan
 
     except json.JSONDecodeError as e:
-        print(f"⚠️ JSON Parse Error in Farm Plan: {e}")
+        log.warning("⚠️ JSON Parse Error in Farm Plan: %s", e)
         return generate_fallback_farm_plan(soil_type, water_source, budget, land_size)
     except Exception as e:
-        print(f"⚠️ Farm Plan Error: {e}")
+        log.warning("⚠️ Farm Plan Error: %s", e)
         return generate_fallback_farm_plan(soil_type, water_source, budget, land_size)
 
 
+@fallback_response
 def generate_fallback_farm_plan(soil_type: str, water_source: str, budget: float, land_size: float) -> dict:
     return {
         "cropName": "Tomato (Desi Hybrid)",
@@ -1001,63 +1372,21 @@ async def generate_smart_plan(request: dict):
         water_source = request.get("water_source", "Unknown")
         season = request.get("season", "Unknown")
         sowing_month = request.get("sowing_month", "Unknown")
+        language = normalize_language(request.get("language"))
 
-        print(
-            f"🧠 SMART PLAN REQUEST: Soil={soil_type}, Land={land_size}, Budget={budget}, "
-            f"Water={water_source}, Season={season}, Sowing Month={sowing_month}"
+        log.info(
+            "🧠 SMART PLAN REQUEST: Soil=%s, Land=%s, Budget=%s, Water=%s, Season=%s, Sowing Month=%s",
+            soil_type, land_size, budget, water_source, season, sowing_month,
         )
 
-        prompt = f"""
-        Act as a senior agricultural scientist and financial advisor for an Indian farmer.
-        Context: Land: {land_size}, Soil: {soil_type}, Budget: {budget}, Water Source: {water_source}, Season: {season}, Sowing Month: {sowing_month}.
-        Task: Generate a precision farming plan for the MOST profitable crop this season.
-        Use Indian context (Mandi pricing, FYM, and Jeevamrutha if organic fits).
-
-        CRITICAL INSTRUCTION:
-        - Check if the {season} matches the {sowing_month}.
-        - If the farmer is trying to sow a crop in the WRONG month, your risk_analysis MUST warn:
-          "High Risk: Wrong season for this crop."
-        - Adjust timeline_weeks to show specific dates if possible (e.g., "Week 1 (Early {sowing_month})").
-
-        Output STRICT JSON with this schema:
-        {{
-          "summary": {{
-            "crop_name": "String (e.g., Chilli - Guntur Hot)",
-            "suitability_score": "String (e.g., 94%)",
-            "expected_revenue": "String (e.g., ₹1.5 Lakhs)",
-            "net_profit": "String (e.g., ₹90,000)",
-            "roi": "String (e.g., 2.5x)",
-            "duration": "String (e.g., 140 Days)"
-          }},
-          "financial_breakdown": [
-            {{"category": "Seeds", "cost": "₹2,500", "percent": 5}},
-            {{"category": "Fertilizers", "cost": "₹12,000", "percent": 25}},
-            {{"category": "Labor", "cost": "₹20,000", "percent": 40}},
-            {{"category": "Pesticides", "cost": "₹8,000", "percent": 15}},
-            {{"category": "Other", "cost": "₹7,500", "percent": 15}}
-          ],
-          "risk_analysis": {{
-            "primary_risk": "String (e.g., Thrips Infestation in Jan)",
-            "mitigation": "String (e.g., Use Blue Sticky Traps & Spinosad)"
-          }},
-          "timeline_weeks": [
-            {{
-              "phase": "Week 1 (Early {sowing_month}): Soil Prep",
-              "action": "Deep Ploughing",
-              "details": "Plow 30cm deep. Apply 5 tons FYM/acre.",
-              "icon": "plow"
-            }},
-            {{
-               "phase": "Week 6: Critical Care",
-               "action": "Micronutrient Spray",
-               "details": "Spray 'Chilli Special' (5g/L) to boost flowering.",
-               "icon": "spray"
-            }}
-          ]
-        }}
-        """
-
-        response = model_gemini.generate_content(prompt)
+        prompt = render_prompt(
+            "smart_plan", land_size=land_size, soil_type=soil_type, budget=budget,
+            water_source=water_source, season=season, sowing_month=sowing_month,
+        ) + language_instruction(language)
+
+        response = await gemini_scheduler.acall(
+            "plan", model_gemini.generate_content, prompt, generation_config=prompt_config("smart_plan")
+        )
         text = response.text.strip()
 
         if text.startswith('```'):
@@ -1071,13 +1400,14 @@ async def generate_smart_plan(request: dict):
         return plan
 
     except json.JSONDecodeError as e:
-        print(f"⚠️ JSON Parse Error in Smart Plan: {e}")
+        log.warning("⚠️ JSON Parse Error in Smart Plan: %s", e)
         return generate_fallback_smart_plan()
     except Exception as e:
-        print(f"⚠️ Smart Plan Error: {e}")
+        log.warning("⚠️ Smart Plan Error: %s", e)
         return generate_fallback_smart_plan()
 
 
+@fallback_response
 def generate_fallback_smart_plan() -> dict:
     return {
         "summary": {
@@ -1129,6 +1459,40 @@ def generate_fallback_smart_plan() -> dict:
 
 
 # ===== 10. PRECISION EXECUTION PLAN (CROP-SPECIFIC) =====
+# Seed, fertilizer and schedule arithmetic comes from agronomy.py for the
+# crops in its table. Gemini only writes the narrative, which doesn't depend
+# on land size or sowing date, so it is cached per crop/soil/water/variety.
+plan_narrative_cache = SharedCache(CACHE_DB, namespace="plan_narrative")
+PLAN_NARRATIVE_TTL = float(os.environ.get("PRITHVI_PLAN_NARRATIVE_TTL", str(30 * 24 * 3600)))
+
+async def get_execution_narrative(crop_name: str, variety: str, soil_type: str, water_source: str, plan: dict,
+                                  language: str = DEFAULT_LANGUAGE):
+    key = "|".join([resolve_crop(crop_name), *(str(v).strip().lower() for v in (variety, soil_type, water_source))])
+    narrative = plan_narrative_cache.get(key)
+    if narrative is not None:
+        log.info("⚡ CACHE HIT: plan narrative for %s", key)
+        # Stage names stay English: apply_narrative matches them to the plan.
+        return await translate_cached(narrative, "execution_narrative", language, keep={"action"})
+
+    stages = ", ".join(dict.fromkeys(event["action"] for event in plan["critical_timeline"]))
+    variety_text = f" (Variety: {variety})" if variety else ""
+    prompt = render_prompt(
+        "execution_narrative", crop_name=crop_name, variety_text=variety_text,
+        soil_type=soil_type, water_source=water_source, stages=stages,
+    )
+    try:
+        response = await gemini_scheduler.acall(
+            "plan", model_gemini.generate_content, prompt, generation_config=prompt_config("execution_narrative")
+        )
+        narrative = json.loads(response.text.strip().replace('```json', '').replace('```', '').strip())
+        if not isinstance(narrative, dict) or not narrative.get("limiting_factor"):
+            raise ValueError("Invalid narrative structure from Gemini")
+    except Exception as e:
+        log.warning("⚠️ Plan narrative unavailable (%s: %s); serving calculated plan only", type(e).__name__, e)
+        return None
+    plan_narrative_cache.set(key, narrative, ttl=PLAN_NARRATIVE_TTL)
+    return await translate_cached(narrative, "execution_narrative", language, keep={"action"})
+
 @app.post("/generate-execution-plan")
 async def generate_execution_plan(request: dict):
     """
@@ -1142,103 +1506,35 @@ async def generate_execution_plan(request: dict):
         soil_type = request.get("soil_type", "Unknown")
         water_source = request.get("water_source", "Unknown")
         sowing_date = request.get("sowing_date", "Unknown")
+        language = normalize_language(request.get("language"))
 
-        print(
-            f"🎯 EXECUTION PLAN REQUEST: Crop={crop_name}, Variety={variety}, "
-            f"Land={land_size}, Soil={soil_type}, Water={water_source}, Sowing={sowing_date}"
+        log.info(
+            "🎯 EXECUTION PLAN REQUEST: Crop=%s, Variety=%s, Land=%s, Soil=%s, Water=%s, Sowing=%s",
+            crop_name, variety, land_size, soil_type, water_source, sowing_date,
         )
 
+        plan = calculate_execution_plan(crop_name, land_size, soil_type, water_source, sowing_date, variety)
+        if plan is not None:
+            narrative = await get_execution_narrative(crop_name, variety, soil_type, water_source, plan, language)
+            if narrative is not None:
+                apply_narrative(plan, narrative)
+                plan["source"] = "🧮 Agronomy Calculator + Gemini 3 Notes"
+            else:
+                plan["source"] = "🧮 Agronomy Calculator"
+            log.info("✅ Calculated execution plan for %s on %s acres", crop_name, land_size)
+            return plan
+
+        # Crop (or land size) not in the rules table: Gemini writes the whole plan.
         variety_text = f" (Variety: {variety})" if variety else " (suggest best variety)"
 
-        prompt = f"""
-        Act as a Precision Farm Manager and Agricultural Scientist.
-        
-        Context:
-        - Crop: {crop_name}{variety_text}
-        - Land Size: {land_size} acres
-        - Soil Type: {soil_type}
-        - Water Source: {water_source}
-        - Planned Sowing Date: {sowing_date}
-        
-        Goal: Generate a SCIENTIFIC EXECUTION MANUAL to maximize yield to 100% potential.
-        
-        CALCULATIONS REQUIRED (MUST BE PRECISE):
-        1. **Yield Forecast:**
-           - Calculate realistic yield potential (0-100%) based on soil and water
-           - Estimate total output in kg or quintals for {land_size} acres
-           - Identify main limiting factor (e.g., water, nutrients, soil pH)
-        
-        2. **Input Requirements:**
-           - Calculate EXACT seed quantity needed for {land_size} acres
-           - Calculate N-P-K requirement and convert to commercial fertilizer bags
-             (Urea for N, DAP for P, MOP for K)
-           - Include micronutrients (Zinc, Boron, etc.) if needed
-           - Add soil amendments (Lime, Gypsum) if soil type requires
-           - List pesticides/fungicides for major pests
-        
-        3. **Critical Timeline:**
-           - Specify key days from sowing (Day 0, Day 21, Day 45, etc.)
-           - Focus on critical irrigation stages (e.g., Crown Root Initiation for rice)
-           - Include fertilizer application schedule (basal, top dressing)
-           - Mention pest/disease monitoring periods
-        
-        Output STRICT JSON:
-        {{
-          "yield_forecast": {{
-            "potential_percentage": 96,
-            "estimated_output": "5200 kg for {land_size} acres",
-            "limiting_factor": "Sandy soil may reduce water retention by 4-6%"
-          }},
-          "input_requirements": [
-            {{"item": "Seeds", "quantity": "25 kg", "note": "Use certified seeds (e.g., Pusa Basmati 1121)"}},
-            {{"item": "Urea (46% N)", "quantity": "120 kg", "note": "Apply in 3 split doses: 40kg each at basal, tillering, flowering"}},
-            {{"item": "DAP (18-46-0)", "quantity": "65 kg", "note": "Full dose as basal application before sowing"}},
-            {{"item": "MOP (Potash)", "quantity": "40 kg", "note": "50% basal, 50% at flowering stage"}},
-            {{"item": "Zinc Sulfate", "quantity": "10 kg", "note": "Mix with soil to prevent zinc deficiency"}}
-          ],
-          "critical_timeline": [
-            {{
-              "day": "Day 0 (Sowing Day: {sowing_date})",
-              "action": "Basal Fertilizer Application",
-              "detail": "Apply full DAP (65kg), 50% MOP (20kg), and Zinc Sulfate. Plow 30cm deep.",
-              "icon": "fertilizer"
-            }},
-            {{
-              "day": "Day 21 (3 Weeks After Sowing)",
-              "action": "First Top Dressing (Urea)",
-              "detail": "Apply 40kg Urea per acre. Ensure soil is moist before application.",
-              "icon": "mix"
-            }},
-            {{
-              "day": "Day 45 (Critical Irrigation Stage)",
-              "action": "Crown Root Initiation Watering",
-              "detail": "Maintain 5cm standing water for 7 days. This is the MOST critical stage for yield.",
-              "icon": "irrigation"
-            }},
-            {{
-              "day": "Day 60 (Flowering/Panicle Initiation)",
-              "action": "Second Top Dressing + Pest Monitoring",
-              "detail": "Apply remaining 40kg Urea and 20kg MOP. Monitor for stem borers and leaf folders.",
-              "icon": "spray"
-            }},
-            {{
-              "day": "Day 90-110 (Maturity)",
-              "action": "Harvest",
-              "detail": "Harvest when 80% grains turn golden yellow. Dry to 14% moisture before storage.",
-              "icon": "harvest"
-            }}
-          ]
-        }}
-        
-        Important:
-        - ALL quantities must be calculated for {land_size} acres
-        - Use standard Indian fertilizer grades (Urea 46%, DAP 18-46-0, MOP 60% K2O)
-        - Timeline days should be realistic for {crop_name} cultivation
-        - If variety is not specified, suggest the best local variety in notes
-        - Use Indian context (Mandi pricing, FYM, local practices)
-        """
-
-        response = model_gemini.generate_content(prompt)
+        prompt = render_prompt(
+            "execution_plan", crop_name=crop_name, variety_text=variety_text, land_size=land_size,
+            soil_type=soil_type, water_source=water_source, sowing_date=sowing_date,
+        ) + language_instruction(language)
+
+        response = await gemini_scheduler.acall(
+            "plan", model_gemini.generate_content, prompt, generation_config=prompt_config("execution_plan")
+        )
         text = response.text.strip()
 
         if text.startswith('```'):
@@ -1250,17 +1546,18 @@ async def generate_execution_plan(request: dict):
         if not plan.get("yield_forecast") or not plan.get("input_requirements") or not plan.get("critical_timeline"):
             raise ValueError("Invalid execution plan structure from Gemini")
 
-        print(f"✅ Generated execution plan for {crop_name} on {land_size} acres")
+        log.info("✅ Generated execution plan for %s on %s acres", crop_name, land_size)
         return plan
 
     except json.JSONDecodeError as e:
-        print(f"⚠️ JSON Parse Error in Execution Plan: {e}")
+        log.warning("⚠️ JSON Parse Error in Execution Plan: %s", e)
         return generate_fallback_execution_plan(crop_name, land_size, soil_type)
     except Exception as e:
-        print(f"⚠️ Execution Plan Error: {e}")
+        log.warning("⚠️ Execution Plan Error: %s", e)
         return generate_fallback_execution_plan(crop_name, land_size, soil_type)
 
 
+@fallback_response
 def generate_fallback_execution_plan(crop_name: str, land_size: str, soil_type: str) -> dict:
     """Fallback execution plan if Gemini fails"""
     return {
@@ -1312,6 +1609,50 @@ def generate_fallback_execution_plan(crop_name: str, land_size: str, soil_type:
 
 
 # ===== 11. DYNAMIC MARKET TRENDS ENGINE (GEMINI 3) =====
+# Regions with imported mandi data (`python market_prices.py import ...`) are
+# answered from the local price store; Gemini only writes the analyst note,
+# in the background, cached per region and data date.
+MARKET_PRICES_PATH = os.environ.get("PRITHVI_MARKET_PRICES", os.path.join(BASE_DIR, "market_prices.npz"))
+market_prices = PriceStore(MARKET_PRICES_PATH)
+market_note_cache = SharedCache(CACHE_DB, namespace="market_note")
+_market_notes_pending = {}  # key -> task generating its note
+
+def market_region_label(report: dict) -> str:
+    """The report's region, marked as state-wide when no district / market matched."""
+    return f"{report['region']} (state-wide)" if report.get("scope") == "state" else report["region"]
+
+async def refresh_market_note(key: str, report: dict):
+    prompt = render_prompt(
+        "market_note", region=market_region_label(report), last_updated=report["last_updated"],
+        summary=summarize_prices(report),
+    )
+    try:
+        response = await gemini_scheduler.acall(
+            "market", model_gemini.generate_content, prompt, generation_config=prompt_config("market_note")
+        )
+        note = json.loads(response.text.strip().replace('```json', '').replace('```', '').strip())["analyst_note"]
+        market_note_cache.set(key, note, ttl=24 * 3600)
+    except Exception as e:
+        log.warning("⚠️ Market note unavailable for %s: %s: %s", report["region"], type(e).__name__, e)
+    finally:
+        _market_notes_pending.pop(key, None)
+
+def market_note_key(report: dict) -> str:
+    return f"{market_region_label(report).strip().lower()}|{report['last_updated']}"
+
+def market_note(report: dict) -> str:
+    """Cached Gemini note; on a miss, a plain summary now and the Gemini note generated for next time."""
+    key = market_note_key(report)
+    note = market_note_cache.get(key)
+    if note is not None:
+        return note
+    if key not in _market_notes_pending:
+        _market_notes_pending[key] = asyncio.get_running_loop().create_task(refresh_market_note(key, report))
+    movers = sorted(report["crops"], key=lambda c: -abs(float(c["change"])))[:2]
+    where = f" in {report['region']}" if report.get("scope") == "state" else ""
+    return (f"{report['market_status']} week across {report['mandis']} mandis{where}. Biggest moves: "
+            + ", ".join(f"{c['name']} {c['change']}%" for c in movers) + ".")
+
 @app.post("/get-market-trends")
 async def get_market_trends(request: dict):
     """
@@ -1321,69 +1662,22 @@ async def get_market_trends(request: dict):
     try:
         region = request.get("region", "Nashik, Maharashtra")
         
-        print(f"📊 MARKET TRENDS REQUEST: Region={region}")
-        
-        prompt = f"""
-        Act as an expert Indian Mandi Market Analyst with deep knowledge of agricultural economics.
-        
-        Context: Generate a REALISTIC market price report for {region} for the current season.
-        
-        Requirements:
-        1. Include 10-12 major crops relevant to this region (mix of vegetables, fruits, grains, pulses)
-        2. Use realistic 2025-2026 Indian Mandi prices (in ₹/Quintal)
-        3. Reflect current market conditions (seasonal supply, demand patterns)
-        4. For each crop, provide:
-           - Current price in ₹/Quintal or ₹/Kg
-           - Price trend (up/down/stable)
-           - Percentage change from last week
-           - Price forecast for next week
-        5. Add an analyst note about market conditions
-        
-        Regional Context for {region}:
-        - Research typical crops grown in this region
-        - Consider seasonal variations
-        - Reflect local market dynamics and supply patterns
-        
-        Output STRICT JSON (no markdown):
-        {{
-          "region": "{region}",
-          "market_status": "Bullish|Bearish|Neutral",
-          "analyst_note": "2-3 sentence insight about current market conditions, price drivers, and outlook",
-          "last_updated": "Today, HH:MM IST",
-          "crops": [
-            {{
-              "id": "crop_1",
-              "name": "Crop Name (with variety if relevant)",
-              "price": 2400,
-              "unit": "₹/Quintal",
-              "change": "+5.2",
-              "trend": "up",
-              "forecast": "Rising next week due to [reason]",
-              "market_note": "Supply tight, expect higher prices"
-            }},
-            {{
-              "id": "crop_2",
-              "name": "Another Crop",
-              "price": 1800,
-              "unit": "₹/Quintal",
-              "change": "-1.5",
-              "trend": "down",
-              "forecast": "Stable this week",
-              "market_note": "Good supply, prices moderating"
-            }}
-            // ... 10-12 total items
-          ]
-        }}
+        log.info("📊 MARKET TRENDS REQUEST: Region=%s", region)
+
+        market_prices.maybe_reload()
+        report = market_prices.report(region)
+        if report is not None:
+            report["analyst_note"] = market_note(report)
+            report["source"] = f"📈 Mandi Price Data ({report['mandis']} mandis)"
+            log.info("✅ Market trends for %d crops in %s from local price data",
+                     len(report["crops"]), market_region_label(report))
+            return report
         
-        Important:
-        - Prices should be realistic for Indian mandis in 2025-2026
-        - Include seasonal crops relevant to the region
-        - Trends should reflect real market patterns (supply, demand, imports)
-        - Be specific in forecasts and market notes
-        - Use actual crop varieties where applicable (e.g., "Tomato Hybrid F1", "Onion Red", "Wheat Lokwan")
-        """
+        prompt = render_prompt("market_trends", region=region)
         
-        response = model_gemini.generate_content(prompt)
+        response = await gemini_scheduler.acall(
+            "market", model_gemini.generate_content, prompt, generation_config=prompt_config("market_trends")
+        )
         text = response.text.strip()
         
         if text.startswith('```'):
@@ -1395,17 +1689,18 @@ async def get_market_trends(request: dict):
         if not market_data.get("crops") or not isinstance(market_data["crops"], list):
             raise ValueError("Invalid market data structure from Gemini")
         
-        print(f"✅ Generated market trends for {len(market_data['crops'])} crops in {region}")
+        log.info("✅ Generated market trends for %d crops in %s", len(market_data["crops"]), region)
         return market_data
         
     except json.JSONDecodeError as e:
-        print(f"⚠️ JSON Parse Error in Market Trends: {e}")
+        log.warning("⚠️ JSON Parse Error in Market Trends: %s", e)
         return generate_fallback_market_trends(region)
     except Exception as e:
-        print(f"⚠️ Market Trends Error: {e}")
+        log.warning("⚠️ Market Trends Error: %s", e)
         return generate_fallback_market_trends(region)
 
 
+@fallback_response
 def generate_fallback_market_trends(region: str) -> dict:
     """Fallback market data if Gemini fails"""
     return {
@@ -1518,5 +1813,236 @@ def generate_fallback_market_trends(region: str) -> dict:
     }
 
 
+# ===== 11B. CACHEABLE GET VARIANTS (ETag / 304) =====
+# GET versions of market trends and advice for clients that poll them. The
+# serialized response is stored with a weak ETag and Last-Modified; a client
+# sending back If-None-Match (or If-Modified-Since) gets an empty 304 without
+# the payload being generated or serialized again. Fallback payloads are not
+# stored. Mandi reports are keyed by the price store's file mtime, so an
+# import changes the ETag.
+HTTP_CACHE_TTL = float(os.environ.get("PRITHVI_HTTP_CACHE_TTL", "900"))
+http_cache = HttpCache(SharedCache(CACHE_DB, namespace="http"),
+                       max_age=int(os.environ.get("PRITHVI_HTTP_MAX_AGE", "300")))
+
+def market_trends_ttl(report: dict) -> float:
+    if report.get("source") == FALLBACK_SOURCE:
+        return 0
+    if "mandis" in report and market_note_cache.get(market_note_key(report)) is None:
+        return 60  # placeholder note: revalidate once the Gemini note is in
+    return HTTP_CACHE_TTL
+
+@app.get("/market-trends")
+async def market_trends_get(request: Request, region: str = "Nashik, Maharashtra"):
+    """Cacheable GET of /get-market-trends."""
+    market_prices.maybe_reload()
+    key = f"market|{region.strip().lower()}|{market_prices.loaded_mtime}"
+    return await http_cache.respond(request, key, lambda: get_market_trends({"region": region}),
+                                    ttl=market_trends_ttl)
+
+@app.get("/advise-crop")
+async def advise_crop_get(request: Request, soil: str = "Unknown", season: str = "Unknown",
+                          location: str = "India", language: str = DEFAULT_LANGUAGE):
+    """Cacheable GET of /advise-crop."""
+    language = normalize_language(language)
+    body = {"soil": soil, "season": season, "location": location, "language": language}
+    key = cache_key(language, "advise_crop", *advisory_matrix.key(soil, season, location))
+    return await http_cache.respond(
+        request, key, lambda: advise_crop(body), max_age=24 * 3600,
+        ttl=lambda advisory: 0 if advisory.get("source") == FALLBACK_SOURCE
+        or advisory.get("language", DEFAULT_LANGUAGE) != language else 24 * 3600,
+    )
+
+@app.get("/advice/{class_name}")
+async def disease_advice_get(request: Request, class_name: str, language: str = DEFAULT_LANGUAGE):
+    """Treatment advice for one CNN class (e.g. Tomato___Early_blight)."""
+    if class_name not in CLASS_NAMES:
+        raise HTTPException(status_code=404, detail=f"Unknown class: {class_name}")
+    language = normalize_language(language)
+    return await http_cache.respond(
+        request, cache_key(language, "advice", class_name),
+        lambda: asyncio.to_thread(get_gemini_advice, class_name, language), max_age=24 * 3600,
+        ttl=lambda advice: 24 * 3600 if advice_catalog.cached(class_name, language) is not None else 0,
+    )
+
+@app.get("/http-cache-stats")
+def http_cache_stats():
+    """Conditional GETs answered with 304, served from the stored body, and generated."""
+    return http_cache.counts
+
+
+# ===== 12. ASYNC PLAN JOBS (SUBMIT / POLL) =====
+# Plans take several seconds; clients on flaky connections submit a job,
+# get its id at once and poll (or get a callback) instead of holding the
+# request open. Results are kept in SQLite for PRITHVI_JOB_TTL seconds.
+plan_jobs = PlanJobs(
+    CACHE_DB,
+    handlers={
+        "execution-plan": generate_execution_plan,
+        "smart-plan": generate_smart_plan,
+    },
+    workers=int(os.environ.get("PRITHVI_JOB_WORKERS", "2")),
+    max_pending=int(os.environ.get("PRITHVI_JOB_QUEUE", "32")),
+    ttl_seconds=float(os.environ.get("PRITHVI_JOB_TTL", str(6 * 3600))),
+    # Comma-separated hosts callbacks may go to; unset = any public address.
+    callback_hosts=os.environ.get("PRITHVI_CALLBACK_HOSTS", "").split(","),
+)
+
+@app.post("/jobs/{kind}", status_code=202)
+async def submit_plan_job(kind: str, request: dict):
+    """
+    Same body as /generate-{kind}, plus an optional "callback_url" that gets
+    the finished job POSTed to it. Identical pending requests share one job.
+    """
+    callback_url = request.pop("callback_url", None)
+    try:
+        if callback_url:
+            # DNS lookup: off the event loop, so a slow resolver stalls only this request.
+            await asyncio.to_thread(plan_jobs.check_callback, callback_url)
+        job = plan_jobs.submit(kind, request, callback_url)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown job kind '{kind}'")
+    except InvalidCallback as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+    log.info("🧾 JOB %s (%s): %s%s", job["job_id"][:8], kind, job["status"], " (deduplicated)" if job["deduplicated"] else "")
+    return {**job, "poll": f"/jobs/{kind}/{job['job_id']}"}
+
+@app.get("/jobs/{kind}/{job_id}")
+def get_plan_job(kind: str, job_id: str):
+    job = plan_jobs.get(job_id)
+    if job is None or job["kind"] != kind:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+
+# ===== 13. DASHBOARD (ONE ROUND TRIP) =====
+# The dashboard used to make three slow client round trips. /dashboard runs
+# market trends, crop advice and the smart plan concurrently, each under its
+# own deadline, and answers with whatever finished. A component that misses
+# its deadline keeps running in the background and refreshes the cache, so
+# the next load has it; until then the last good answer (or the fallback)
+# is served.
+DASHBOARD_DEADLINES = {
+    name: float(os.environ.get(f"PRITHVI_DASHBOARD_{name.upper()}_DEADLINE", default))
+    for name, default in (("market", "4"), ("advice", "6"), ("plan", "8"))
+}
+DASHBOARD_TTL = float(os.environ.get("PRITHVI_DASHBOARD_TTL", str(24 * 3600)))
+dashboard_cache = SharedCache(CACHE_DB, namespace="dashboard")
+
+def dashboard_components(request: dict) -> dict:
+    """name -> (route coroutine function, its request body, fallback factory)."""
+    region = request.get("region", "Nashik, Maharashtra")
+    soil = request.get("soil_type", "Unknown")
+    season = request.get("season", "Unknown")
+    language = normalize_language(request.get("language"))
+    return {
+        "market": (get_market_trends, {"region": region},
+                   lambda: generate_fallback_market_trends(region)),
+        "advice": (advise_crop, {"soil": soil, "season": season, "location": request.get("location", region),
+                                 "language": language},
+                   lambda: generate_fallback_advisory(soil, season)),
+        "plan": (generate_smart_plan, {
+            "soil_type": soil, "season": season, "land_size": request.get("land_size", "Unknown"),
+            "budget": request.get("budget", "Unknown"), "water_source": request.get("water_source", "Unknown"),
+            "sowing_month": request.get("sowing_month", "Unknown"), "language": language,
+        }, generate_fallback_smart_plan),
+    }
+
+def dashboard_deadlines(overrides) -> dict:
+    """Per-component deadlines: the client's, where given, within 0 < d <= the server default."""
+    if not isinstance(overrides, dict):
+        raise HTTPException(status_code=400, detail='"deadlines" must be an object of seconds per component')
+    deadlines = {}
+    for name, default in DASHBOARD_DEADLINES.items():
+        value = overrides.get(name, default)
+        try:
+            if isinstance(value, bool):
+                raise ValueError
+            seconds = float(value)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail=f"deadlines.{name} must be a number of seconds")
+        if not seconds > 0:  # also rejects NaN
+            raise HTTPException(status_code=400, detail=f"deadlines.{name} must be greater than 0")
+        deadlines[name] = min(seconds, default)
+    return deadlines
+
+def dashboard_key(name: str, body: dict) -> str:
+    return name + "|" + hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def remember_component(key: str, task: asyncio.Task):
+    """Done callback: cache a real (non-fallback) answer, even one that arrived after its deadline."""
+    if task.cancelled() or task.exception() is not None:
+        return
+    result = task.result()
+    if isinstance(result, dict) and result.get("source") != FALLBACK_SOURCE:
+        dashboard_cache.set(key, result, ttl=DASHBOARD_TTL)
+
+async def run_component(name: str, route, body: dict, fallback, deadline: float) -> tuple:
+    """(payload, status) for one component: fresh if it beat `deadline`, else cached, else fallback."""
+    start = time.perf_counter()
+    key = dashboard_key(name, body)
+    task = asyncio.ensure_future(route(dict(body)))
+    task.add_done_callback(functools.partial(remember_component, key))
+    try:
+        result = await asyncio.wait_for(asyncio.shield(task), deadline)
+        reason = "fallback" if result.get("source") == FALLBACK_SOURCE else None
+    except asyncio.TimeoutError:
+        result, reason = None, "timeout"
+    except Exception as e:
+        log.warning("⚠️ Dashboard %s failed: %s: %s", name, type(e).__name__, e)
+        result, reason = None, "error"
+
+    status = {"state": "fresh", "deadline_s": deadline}
+    if reason is not None:
+        cached = dashboard_cache.get(key)
+        if cached is not None:
+            result, status["state"] = cached, "cached"
+        else:
+            result, status["state"] = result or fallback(), "fallback"
+        status["reason"] = reason
+    status["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result, status
+
+@app.post("/dashboard")
+async def dashboard(request: dict):
+    """
+    Market trends, crop advice and a smart plan for one farmer context in a
+    single response, bounded by the slowest component deadline. Body:
+    region, location, soil_type, season, land_size, budget, water_source,
+    sowing_month, language (all optional), and optional "deadlines"
+    ({"market": s, "advice": s, "plan": s}, positive, capped at the server
+    defaults; anything else is a 400).
+    """
+    start = time.perf_counter()
+    deadlines = dashboard_deadlines(request.get("deadlines") or {})
+    components = dashboard_components(request)
+    log.info("🧭 DASHBOARD REQUEST: %s", ", ".join(f"{n} ≤{d:g}s" for n, d in deadlines.items()))
+
+    results = await asyncio.gather(*(
+        run_component(name, route, body, fallback, deadlines[name])
+        for name, (route, body, fallback) in components.items()
+    ))
+    response = {name: payload for name, (payload, _) in zip(components, results)}
+    response["status"] = {name: status for name, (_, status) in zip(components, results)}
+    response["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    log.info("✅ Dashboard in %s ms: %s", response["ms"],
+             ", ".join(f"{n}={st['state']}" for n, st in response["status"].items()))
+    return response
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    host = os.environ.get("PRITHVI_HOST", "0.0.0.0")
+    port = int(os.environ.get("PRITHVI_PORT", "8000"))
+
+    if SERVE_WORKERS > 1:
+        # Export the shared-memory model once, before any worker starts.
+        if MODEL_FORMAT == "tflite" and not MODEL_PATH.endswith(".tflite") \
+                and not os.path.exists(tflite_path_for(MODEL_PATH)) and os.path.exists(MODEL_PATH):
+            export_tflite(MODEL_PATH)
+        # One inference pool shared by every HTTP worker.
+        if INFERENCE_WORKERS > 0 and not os.environ.get("PRITHVI_INFERENCE_ADDR"):
+            start_inference_service()
+        print(f"🚀 Starting {SERVE_WORKERS} workers (model format: {MODEL_FORMAT})")
+        uvicorn.run("main:app", host=host, port=port, workers=SERVE_WORKERS, app_dir=BASE_DIR)
+    else:
+        uvicorn.run(app, host=host, port=port)
\ No newline at end of file
@@ -0,0 +1,324 @@
+"""
+Local mandi price store for /get-market-trends.
+
+Daily modal prices per mandi and commodity are kept as four NumPy columns
+(day, market, commodity, price) sorted by day, in market_prices.npz. The
+report for a region is computed from them with array operations:
+
+- prices in the window are pivoted with np.add.at into a (commodity,
+  mandi, day) array, forward-filled per mandi and averaged over the
+  region's mandis;
+- `price` is the latest value, `change` the % change over 7 days and
+  `trend` that change bucketed at +-2%;
+- `forecast` is Holt's linear exponential smoothing, 7 days ahead, run for
+  all commodities at once.
+
+A report takes about a millisecond. Only the prose `analyst_note` comes
+from Gemini (cached in main.py).
+
+Import Agmarknet-style CSV dumps (State, District, Market, Commodity,
+Arrival_Date, Modal Price; re-importing overlapping days keeps the newest):
+
+    python market_prices.py import dumps/*.csv
+    python market_prices.py report "Nashik, Maharashtra"
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE = os.path.join(BASE_DIR, "market_prices.npz")
+
+EPOCH = datetime.date(1970, 1, 1)
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y", "%d-%b-%Y")
+# Normalized CSV header -> column (Agmarknet exports spell these several ways).
+HEADERS = {
+    "state": "state", "district": "district", "market": "market", "commodity": "commodity",
+    "arrivaldate": "date", "date": "date", "pricedate": "date",
+    "modalprice": "price", "modalx0020price": "price", "modalpricersquintal": "price",
+}
+TREND_THRESHOLD = 2.0  # % change over a week that counts as up / down
+MAX_FILL_DAYS = 7  # a mandi's last price stands in for at most this many missing days
+
+
+def _norm(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+def parse_day(text: str) -> int:
+    for fmt in DATE_FORMATS:
+        try:
+            return (datetime.datetime.strptime(text.strip(), fmt).date() - EPOCH).days
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date '{text}'")
+
+
+def day_to_date(day: int) -> datetime.date:
+    return EPOCH + datetime.timedelta(days=int(day))
+
+
+def forward_fill(matrix: np.ndarray, max_age: int = None) -> np.ndarray:
+    """
+    Fill NaNs along axis 1 with the last valid value; leading NaNs take the
+    first valid one. With `max_age`, a value fills at most that many columns
+    away from where it was observed; further gaps stay NaN.
+    """
+    valid = ~np.isnan(matrix)
+    columns = np.arange(matrix.shape[1])
+    idx = np.where(valid, columns, 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    filled = matrix[np.arange(matrix.shape[0])[:, None], idx]
+    first = np.argmax(valid, axis=1)
+    lead = np.isnan(filled)
+    filled[lead] = np.broadcast_to(matrix[np.arange(matrix.shape[0]), first][:, None], matrix.shape)[lead]
+    if max_age is not None:
+        source = np.where(lead, first[:, None], idx)
+        filled[np.abs(columns - source) > max_age] = np.nan
+    return filled
+
+
+def holt_forecast(series: np.ndarray, horizon: int = 7, alpha: float = 0.5, beta: float = 0.2) -> np.ndarray:
+    """Holt's linear exponential smoothing over each row of a (series, days) matrix, `horizon` days ahead."""
+    level = series[:, 0].copy()
+    trend = np.zeros_like(level)
+    for t in range(1, series.shape[1]):
+        previous = level
+        level = alpha * series[:, t] + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous) + (1 - beta) * trend
+    return level + horizon * trend
+
+
+class PriceStore:
+    def __init__(self, path: str = DEFAULT_STORE):
+        self.path = path
+        self.loaded_mtime = None
+        self._clear()
+        self.maybe_reload()
+
+    def _clear(self):
+        self.day = np.zeros(0, np.int32)
+        self.market = np.zeros(0, np.int32)
+        self.commodity = np.zeros(0, np.int32)
+        self.price = np.zeros(0, np.float32)
+        self.markets = []      # [(state, district, market)], normalized
+        self.commodities = []  # display names
+
+    def maybe_reload(self):
+        """Pick up a re-imported store (cheap stat; called per request)."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime == self.loaded_mtime:
+            return
+        with np.load(self.path, allow_pickle=False) as data:
+            self.day, self.market = data["day"], data["market"]
+            self.commodity, self.price = data["commodity"], data["price"]
+            self.markets = [tuple(m) for m in json.loads(str(data["markets"]))]
+            self.commodities = json.loads(str(data["commodities"]))
+        self.loaded_mtime = mtime
+        print(f"📈 Market prices: {len(self.price):,} rows, {len(self.markets)} mandis, "
+              f"{len(self.commodities)} commodities")
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    # ----- import -----
+
+    def import_csv(self, paths: list) -> int:
+        market_ids = {m: i for i, m in enumerate(self.markets)}
+        commodity_ids = {_norm(c): i for i, c in enumerate(self.commodities)}
+        rows, skipped = [], 0
+        for path in paths:
+            with open(path, "r", encoding="utf-8-sig", newline="") as f:
+                reader = csv.reader(f)
+                header = [HEADERS.get(re.sub(r"[^a-z0-9]", "", h.lower())) for h in next(reader)]
+                col = {name: header.index(name) for name in set(HEADERS.values()) if name in header}
+                missing = {"market", "commodity", "date", "price"} - set(col)
+                if missing:
+                    raise ValueError(f"{path}: missing columns {sorted(missing)}")
+                for record in reader:
+                    try:
+                        price = float(record[col["price"]])
+                        day = parse_day(record[col["date"]])
+                    except (ValueError, IndexError):
+                        skipped += 1
+                        continue
+                    if price <= 0:
+                        skipped += 1
+                        continue
+                    key = tuple(_norm(record[col[c]]) if c in col else "" for c in ("state", "district", "market"))
+                    market_id = market_ids.setdefault(key, len(market_ids))
+                    name = record[col["commodity"]].strip()
+                    commodity_id = commodity_ids.setdefault(_norm(name), len(commodity_ids))
+                    if commodity_id == len(self.commodities):
+                        self.commodities.append(name)
+                    rows.append((day, market_id, commodity_id, price))
+        self.markets = [m for m, _ in sorted(market_ids.items(), key=lambda item: item[1])]
+        if rows:
+            new = np.array(rows, dtype=np.float64)
+            day = np.concatenate([self.day, new[:, 0].astype(np.int32)])
+            market = np.concatenate([self.market, new[:, 1].astype(np.int32)])
+            commodity = np.concatenate([self.commodity, new[:, 2].astype(np.int32)])
+            price = np.concatenate([self.price, new[:, 3].astype(np.float32)])
+            # Sort by (day, market, commodity), keeping the last-imported row of each duplicate.
+            order = np.lexsort((np.arange(len(day)), commodity, market, day))
+            day, market, commodity, price = day[order], market[order], commodity[order], price[order]
+            last = np.ones(len(day), bool)
+            last[:-1] = (day[1:] != day[:-1]) | (market[1:] != market[:-1]) | (commodity[1:] != commodity[:-1])
+            self.day, self.market, self.commodity, self.price = day[last], market[last], commodity[last], price[last]
+        print(f"📥 Imported {len(rows):,} rows ({skipped} skipped); store now {len(self):,} rows")
+        return len(rows)
+
+    def save(self, path: str = None):
+        path = path or self.path
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp, day=self.day, market=self.market, commodity=self.commodity, price=self.price,
+            markets=np.array(json.dumps(self.markets)), commodities=np.array(json.dumps(self.commodities)),
+        )
+        os.replace(tmp, path)
+
+    # ----- queries -----
+
+    def region_markets(self, region: str):
+        """
+        (mandi indices, scope, label) for a region: the mandis matching its
+        district / market name (scope "district", labelled with the region as
+        given), else every mandi in its state (scope "state", labelled with
+        the state).
+        """
+        names = [p.strip() for p in str(region).split(",") if p.strip()]
+        parts = [_norm(p) for p in names]
+        if not parts:
+            return np.zeros(0, np.int32), "district", str(region)
+        local = [i for i, (state, district, market) in enumerate(self.markets)
+                 if parts[0] in (district, market)]
+        if local:
+            return np.array(local, np.int32), "district", str(region).strip()
+        states = [name for name, part in zip(names, parts) if any(part == m[0] for m in self.markets)]
+        found = {_norm(name) for name in states}
+        markets = np.array([i for i, (state, _, _) in enumerate(self.markets) if state in found], np.int32)
+        return markets, "state", ", ".join(states)
+
+    def report(self, region: str, window_days: int = 60, top: int = 12, horizon: int = 7,
+               max_fill_days: int = MAX_FILL_DAYS):
+        """
+        The /get-market-trends payload (minus analyst_note), or None if there
+        is no data for the region. `region` is where the prices come from,
+        which is the state when `scope` is "state" (nothing matched the
+        requested district / market); `requested_region` is what was asked for.
+        """
+        markets, scope, label = self.region_markets(region)
+        markets = np.sort(markets)
+        if len(self) == 0 or len(markets) == 0:
+            return None
+        latest = int(self.day[-1])
+        start = np.searchsorted(self.day, latest - window_days + 1)
+        day, market = self.day[start:], self.market[start:]
+        mask = np.isin(market, markets)
+        if not mask.any():
+            return None
+        day, commodity, price = day[mask], self.commodity[start:][mask], self.price[start:][mask]
+        last_day = int(day.max())
+        days = last_day - latest + window_days
+
+        # Most-traded commodities in the window; each mandi's series is forward-filled
+        # on its own (for up to max_fill_days) before averaging, so a mandi missing a
+        # day doesn't shift the mean and one that stopped reporting drops out of it.
+        counts = np.bincount(commodity, minlength=len(self.commodities))
+        chosen = np.argsort(-counts, kind="stable")[:top]
+        chosen = chosen[counts[chosen] > 0]
+        row = np.full(len(self.commodities), -1)
+        row[chosen] = np.arange(len(chosen))
+        keep = row[commodity] >= 0
+        local = np.searchsorted(markets, market[mask][keep])
+        r = row[commodity[keep]] * len(markets) + local
+        c = day[keep] - (latest - window_days + 1)
+        sums = np.zeros((len(chosen) * len(markets), days))
+        hits = np.zeros_like(sums)
+        np.add.at(sums, (r, c), price[keep])
+        np.add.at(hits, (r, c), 1)
+        with np.errstate(invalid="ignore"):
+            per_mandi = forward_fill(sums / hits, max_fill_days).reshape(len(chosen), len(markets), days)
+            reported = ~np.isnan(per_mandi)
+            series = np.where(reported, per_mandi, 0).sum(axis=1) / reported.sum(axis=1)
+        # Days on which every mandi's price is too old carry the regional mean forward.
+        series = forward_fill(series)
+        # Mandis with an actual report on the last day, not a carried-forward price.
+        mandis = (hits.reshape(len(chosen), len(markets), days)[:, :, -1] > 0).sum(axis=1)
+
+        now = series[:, -1]
+        week_ago = series[:, max(0, days - 1 - 7)]
+        change = (now / week_ago - 1) * 100
+        forecast = holt_forecast(series, horizon)
+        forecast_change = (forecast / now - 1) * 100
+        recent = series[:, -7:]
+        trend = np.where(change > TREND_THRESHOLD, "up", np.where(change < -TREND_THRESHOLD, "down", "stable"))
+
+        crops = []
+        for i, cid in enumerate(chosen):
+            direction = "rise" if forecast_change[i] > 1 else "ease" if forecast_change[i] < -1 else "hold steady"
+            crops.append({
+                "id": f"crop_{i + 1}",
+                "name": self.commodities[cid],
+                "price": int(round(float(now[i]))),
+                "unit": "₹/Quintal",
+                "change": f"{change[i]:+.1f}",
+                "trend": str(trend[i]),
+                "forecast": f"Likely to {direction}: ~₹{forecast[i]:,.0f} next week ({forecast_change[i]:+.1f}%)",
+                "market_note": f"7-day range ₹{recent[i].min():,.0f}-₹{recent[i].max():,.0f}; "
+                               f"{mandis[i]} mandi{'s' if mandis[i] != 1 else ''} reported on "
+                               f"{day_to_date(last_day):%d %b}",
+            })
+        ups, downs = int((trend == "up").sum()), int((trend == "down").sum())
+        status = "Bullish" if ups > max(downs, len(crops) / 3) else "Bearish" if downs > max(ups, len(crops) / 3) else "Neutral"
+        return {
+            "region": label,
+            "scope": scope,
+            "requested_region": region,
+            "market_status": status,
+            "last_updated": f"{day_to_date(last_day):%d %b %Y}",
+            "crops": crops,
+            "mandis": int(len(np.unique(market[mask]))),
+        }
+
+
+def summary_for_note(report: dict) -> str:
+    """Compact table of the computed report for the analyst_note prompt."""
+    return "; ".join(f"{c['name']} ₹{c['price']} ({c['change']}%, {c['trend']})" for c in report["crops"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    i = sub.add_parser("import", help="append CSV dumps to the store")
+    i.add_argument("csv", nargs="+")
+    i.add_argument("--store", default=DEFAULT_STORE)
+    r = sub.add_parser("report", help="print the report for a region and its timing")
+    r.add_argument("region")
+    r.add_argument("--store", default=DEFAULT_STORE)
+    args = parser.parse_args()
+
+    store = PriceStore(args.store)
+    if args.command == "import":
+        store.import_csv(args.csv)
+        store.save()
+        print(f"✅ Saved {args.store}")
+    else:
+        start = time.perf_counter()
+        report = store.report(args.region)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"⏱️ {elapsed:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
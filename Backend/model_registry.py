@@ -0,0 +1,421 @@
+"""
+Versioned CNN registry and zero-downtime hot-swap.
+
+The registry is a directory of immutable model versions plus a manifest:
+
+    models/
+      registry.json          {"active": "v3", "history": [...], "versions": {...}}
+      v3/model.tflite
+      v2/model.h5
+
+Each version records its artifact, format (h5 / tflite), class list and
+checksum. A version's classes may be a subset or a reordering of
+class_index.CLASS_NAMES; its softmax is mapped onto CLASS_NAMES order, so
+the rest of the backend is unchanged.
+
+ModelSlot serves one version in-process. Activating another version loads
+and warms it in a background thread while the current one keeps serving,
+then swaps atomically. Requests hold the version they started with
+(`with slot.acquire() as model:`), and the old model's memory is released
+once the last of them finishes. Workers follow the manifest's "active"
+entry, so activating through one worker (or the CLI) moves them all.
+
+    python model_registry.py register retrained.h5 --version v2 [--classes classes.json] [--activate]
+    python model_registry.py list
+    python model_registry.py activate v2
+    python model_registry.py rollback
+"""
+import argparse
+import contextlib
+import gc
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from class_index import CLASS_NAMES
+from cnn_model import IMG_SIZE, load_cnn
+from structured_log import get_logger
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DIR = os.path.join(BASE_DIR, "models")
+FORMATS = {".h5": "h5", ".keras": "h5", ".tflite": "tflite"}
+
+log = get_logger("models")
+
+
+class RegistryError(ValueError):
+    pass
+
+
+# ===== 1. REGISTRY (ON DISK) =====
+class ModelRegistry:
+    """The manifest and artifacts under `directory`."""
+
+    def __init__(self, directory: str = DEFAULT_DIR):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "registry.json")
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"active": None, "history": [], "versions": {}}
+
+    def _save(self, manifest: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def mtime(self):
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def version(self, name: str) -> dict:
+        entry = self.load()["versions"].get(name)
+        if entry is None:
+            raise RegistryError(f"Unknown model version '{name}'")
+        return {**entry, "version": name, "path": os.path.join(self.directory, entry["file"])}
+
+    def active(self):
+        """The active version's entry, or None."""
+        name = self.load().get("active")
+        return self.version(name) if name else None
+
+    def register(self, artifact: str, version: str, classes: list = None, notes: str = "",
+                 temperature: float = None) -> dict:
+        """Copy `artifact` into the registry as `version` (versions are immutable)."""
+        model_format = FORMATS.get(os.path.splitext(artifact)[1].lower())
+        if model_format is None:
+            raise RegistryError(f"Unsupported model file {artifact} (expected {', '.join(FORMATS)})")
+        classes = list(classes or CLASS_NAMES)
+        unknown = [c for c in classes if c not in CLASS_NAMES]
+        if unknown:
+            raise RegistryError(f"Classes not in class_index.CLASS_NAMES: {unknown[:5]}")
+        with self._lock:
+            manifest = self.load()
+            if version in manifest["versions"]:
+                raise RegistryError(f"Version '{version}' already exists")
+            filename = os.path.join(version, "model" + os.path.splitext(artifact)[1].lower())
+            os.makedirs(os.path.join(self.directory, version), exist_ok=True)
+            shutil.copy2(artifact, os.path.join(self.directory, filename))
+            manifest["versions"][version] = {
+                "file": filename,
+                "format": model_format,
+                "classes": classes,
+                "temperature": temperature,
+                "sha256": file_sha256(artifact),
+                "size_mb": round(os.path.getsize(artifact) / 1e6, 2),
+                "registered_at": time.time(),
+                "notes": notes,
+            }
+            self._save(manifest)
+        return self.version(version)
+
+    def activate(self, version: str) -> dict:
+        with self._lock:
+            manifest = self.load()
+            if version not in manifest["versions"]:
+                raise RegistryError(f"Unknown model version '{version}'")
+            if manifest.get("active") != version:
+                manifest["active"] = version
+                manifest["history"] = (manifest.get("history") or [])[-19:] + [version]
+                self._save(manifest)
+        return self.version(version)
+
+    def rollback(self) -> dict:
+        """Re-activate the version that was active before the current one."""
+        with self._lock:
+            manifest = self.load()
+            history = manifest.get("history") or []
+            if len(history) < 2:
+                raise RegistryError("No earlier version to roll back to")
+            history.pop()
+            manifest["active"] = history[-1]
+            manifest["history"] = history
+            self._save(manifest)
+        return self.version(manifest["active"])
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ===== 2. SERVING (IN-PROCESS) =====
+class LoadedModel:
+    """
+    One loaded version. predict() returns probabilities in CLASS_NAMES
+    order; in-flight calls are counted so a retired model can be freed.
+    """
+
+    def __init__(self, version: str, model, classes: list = None, temperature: float = None):
+        self.version = version
+        self.model = model
+        self.temperature = temperature  # fitted for this version, if registered with one
+        self.format = getattr(model, "format", "unknown")
+        classes = list(classes or CLASS_NAMES)
+        self.class_names = classes
+        self._index = None if classes == list(CLASS_NAMES) else np.array([CLASS_NAMES.index(c) for c in classes])
+        self.classes = len(classes)
+        self.inflight = 0
+        self.retired = False
+        self._lock = threading.Lock()
+
+    @property
+    def supports_embedding(self) -> bool:
+        return hasattr(self.model, "predict_with_embedding")
+
+    def _to_canonical(self, probs: np.ndarray) -> np.ndarray:
+        if self._index is None:
+            return probs
+        out = np.zeros((probs.shape[0], len(CLASS_NAMES)), dtype=probs.dtype)
+        out[:, self._index] = probs
+        return out
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self._to_canonical(self.model.predict(batch))
+
+    def predict_with_embedding(self, batch: np.ndarray):
+        probs, features = self.model.predict_with_embedding(batch)
+        return self._to_canonical(probs), features
+
+    def warm_up(self, rounds: int = 3, batch_sizes=(1,)):
+        """First calls trace graphs / size tensors; pay for that before taking traffic."""
+        for size in batch_sizes:
+            batch = np.zeros((size, IMG_SIZE, IMG_SIZE, 3), dtype=np.uint8)
+            for _ in range(rounds):
+                out = self.model.predict(batch)
+            if out.shape != (size, self.classes):
+                raise RegistryError(f"{self.version}: output shape {out.shape}, expected {(size, self.classes)}")
+        if self.supports_embedding:
+            self.model.predict_with_embedding(np.zeros((1, IMG_SIZE, IMG_SIZE, 3), dtype=np.uint8))
+
+    def enter(self) -> bool:
+        """Count a call in; False if this model was already released (the caller re-reads the slot)."""
+        with self._lock:
+            if self.model is None:
+                return False
+            self.inflight += 1
+            return True
+
+    def exit(self):
+        with self._lock:
+            self.inflight -= 1
+            drained = self.retired and self.inflight == 0
+        if drained:
+            self.release()
+
+    def retire(self):
+        with self._lock:
+            self.retired = True
+            drained = self.inflight == 0
+        if drained:
+            self.release()
+
+    def release(self):
+        with self._lock:
+            if self.model is None or self.inflight:
+                return
+            self.model = None
+        log.info("♻️ Model %s drained and released", self.version)
+        threading.Thread(target=gc.collect, daemon=True).start()
+
+
+class ModelSlot:
+    """
+    The CNN a worker serves: one LoadedModel at a time, swapped atomically.
+    `with slot.acquire() as model:` pins the current version for a request.
+    """
+
+    def __init__(self, registry: ModelRegistry = None, warmup_batch_sizes=(1,), follow_interval: float = 5.0):
+        self.registry = registry
+        self.warmup_batch_sizes = tuple(warmup_batch_sizes)
+        self.follow_interval = follow_interval
+        self.current = None
+        self.loading = None
+        self.last_error = None
+        self.retired = []
+        self.swaps = 0
+        self._swap_lock = threading.Lock()
+        self._seen_mtime = registry.mtime() if registry else None
+        self._next_check = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.current is not None
+
+    @property
+    def version(self):
+        return self.current.version if self.current else None
+
+    @property
+    def supports_embedding(self) -> bool:
+        return self.current is not None and self.current.supports_embedding
+
+    @property
+    def format(self):
+        return self.current.format if self.current else None
+
+    @contextlib.contextmanager
+    def acquire(self):
+        self.maybe_follow()
+        while True:
+            model = self.current
+            if model is None:
+                raise RuntimeError("No CNN model loaded")
+            if model.enter():
+                break
+        try:
+            yield model
+        finally:
+            model.exit()
+
+    def serve(self, model: LoadedModel):
+        """Make `model` current; the previous one is retired and freed once drained."""
+        previous, self.current = self.current, model
+        self.swaps += 1
+        log.info("🔀 Serving CNN %s (%s)%s", model.version, model.format,
+                 f", replacing {previous.version}" if previous else "")
+        if previous is not None and previous is not model:
+            self.retired = [m for m in self.retired if m.model is not None] + [previous]
+            previous.retire()
+
+    def load_version(self, entry: dict) -> LoadedModel:
+        start = time.perf_counter()
+        model = LoadedModel(entry["version"], load_cnn(entry["path"], entry["format"]), entry.get("classes"),
+                            entry.get("temperature"))
+        model.warm_up(batch_sizes=self.warmup_batch_sizes)
+        log.info("🧠 Loaded and warmed CNN %s in %.1f s", entry["version"], time.perf_counter() - start)
+        return model
+
+    def swap_to(self, entry: dict, background: bool = True):
+        """Load `entry` and swap to it. Returns False if a swap is already running."""
+        if not self._swap_lock.acquire(blocking=False):
+            return False
+        self.loading = entry["version"]
+
+        def run():
+            try:
+                self.serve(self.load_version(entry))
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{entry['version']}: {type(e).__name__}: {e}"
+                log.error("❌ Could not load CNN %s (still serving %s): %s", entry["version"], self.version, e)
+            finally:
+                self.loading = None
+                self._swap_lock.release()
+            self._follow_after_load(entry["version"])
+
+        if background:
+            threading.Thread(target=run, name=f"load-{entry['version']}", daemon=True).start()
+        else:
+            run()
+        return True
+
+    def _follow_after_load(self, loaded: str):
+        """If the manifest moved to another version while `loaded` was loading, load that one too."""
+        if self.registry is None:
+            return
+        try:
+            entry = self.registry.active()
+        except (RegistryError, ValueError):
+            return
+        # Not when the active version is the one that just loaded (or failed to): no retry loop.
+        if entry is not None and entry["version"] not in (loaded, self.version):
+            log.info("🔀 Registry moved to %s while %s was loading", entry["version"], loaded)
+            self.swap_to(entry)
+
+    def maybe_follow(self):
+        """Start loading the registry's active version if it changed (checked every follow_interval s)."""
+        if self.registry is None or time.monotonic() < self._next_check:
+            return
+        self._next_check = time.monotonic() + self.follow_interval
+        mtime = self.registry.mtime()
+        if mtime == self._seen_mtime:
+            return
+        try:
+            entry = self.registry.active()
+        except (RegistryError, ValueError) as e:
+            log.warning("⚠️ Model registry unreadable: %s", e)
+            return
+        if entry is not None and entry["version"] != self.version and entry["version"] != self.loading:
+            # Only mark this manifest as seen once its swap has started; while
+            # another version is still loading, look again at the next check.
+            if not self.swap_to(entry):
+                return
+        self._seen_mtime = mtime
+
+    def report(self) -> dict:
+        return {
+            "serving": self.version,
+            "format": self.format,
+            "loading": self.loading,
+            "swaps": self.swaps,
+            "last_error": self.last_error,
+            "draining": [{"version": m.version, "inflight": m.inflight} for m in self.retired if m.model is not None],
+        }
+
+
+# ===== 3. CLI =====
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=os.environ.get("PRITHVI_MODEL_REGISTRY", DEFAULT_DIR))
+    sub = parser.add_subparsers(dest="command", required=True)
+    r = sub.add_parser("register", help="add a model file as a new version")
+    r.add_argument("artifact")
+    r.add_argument("--version", required=True)
+    r.add_argument("--classes", default=None, help="JSON list of class names in output order (default: CLASS_NAMES)")
+    r.add_argument("--notes", default="")
+    r.add_argument("--temperature", type=float, default=None, help="softmax temperature from calibration.py")
+    r.add_argument("--activate", action="store_true")
+    r.add_argument("--no-check", action="store_true", help="skip loading the model to check its output shape")
+    sub.add_parser("list", help="versions, newest first")
+    a = sub.add_parser("activate", help="switch every worker to a version")
+    a.add_argument("version")
+    sub.add_parser("rollback", help="switch back to the previously active version")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.dir)
+    if args.command == "register":
+        classes = None
+        if args.classes:
+            with open(args.classes, "r") as f:
+                classes = json.load(f)
+        if not args.no_check:
+            fmt = FORMATS.get(os.path.splitext(args.artifact)[1].lower())
+            LoadedModel(args.version, load_cnn(args.artifact, fmt), classes).warm_up(rounds=1)
+        entry = registry.register(args.artifact, args.version, classes, args.notes, args.temperature)
+        print(f"✅ Registered {entry['version']} ({entry['format']}, {len(entry['classes'])} classes, "
+              f"{entry['size_mb']} MB)")
+        if args.activate:
+            registry.activate(args.version)
+            print(f"🔀 Active: {args.version}")
+    elif args.command == "list":
+        manifest = registry.load()
+        for name, entry in sorted(manifest["versions"].items(), key=lambda kv: -kv[1]["registered_at"]):
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["registered_at"]))
+            marker = "*" if name == manifest.get("active") else " "
+            print(f"{marker} {name:<16} {entry['format']:<7} {len(entry['classes']):>3} classes "
+                  f"{entry['size_mb']:>8} MB  {when}  {entry['notes']}")
+    elif args.command == "activate":
+        print(f"🔀 Active: {registry.activate(args.version)['version']}")
+    else:
+        print(f"⏪ Rolled back to {registry.rollback()['version']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Submit/poll job API for the slow Gemini plan routes.
+
+A plan takes several seconds to generate, and on rural mobile networks the
+connection often drops before it arrives. Instead the client submits the
+request, gets a job id back at once, and polls for the result (or passes a
+`callback_url` to have it POSTed back).
+
+- Jobs run on a bounded asyncio pool in the worker that accepted them; the
+  pool's queue is bounded too, and a full queue rejects new jobs.
+- State and results live in SQLite (WAL), so any HTTP worker can answer a
+  poll, and results survive until their TTL expires.
+- A submit identical to a job that is still queued or running (same kind,
+  same request body) returns that job's id instead of starting another
+  generation. Each submitter's callback_url is kept, and all of them are
+  notified when the job finishes.
+- Callbacks go only to http(s) URLs on public addresses, or to the hosts in
+  `callback_hosts` when that allow-list is set. When the callback is sent,
+  the host is resolved and checked again and the connection goes to that
+  checked address (Host header and TLS SNI still name the host), so a DNS
+  answer that changes between check and connect can't redirect it to
+  localhost, the LAN or cloud metadata. Redirects are not followed.
+"""
+import asyncio
+import hashlib
+import http.client
+import ipaddress
+import json
+import socket
+import sqlite3
+import ssl
+import threading
+import time
+import urllib.parse
+import uuid
+
+from structured_log import get_logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    kind         TEXT NOT NULL,
+    request_hash TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    request      TEXT NOT NULL,
+    result       TEXT,
+    error        TEXT,
+    created_at   REAL NOT NULL,
+    updated_at   REAL NOT NULL,
+    expires_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_pending ON jobs (request_hash, status);
+CREATE INDEX IF NOT EXISTS idx_jobs_expires ON jobs (expires_at);
+CREATE TABLE IF NOT EXISTS job_callbacks (
+    job_id  TEXT NOT NULL,
+    url     TEXT NOT NULL,
+    sent_at REAL,
+    PRIMARY KEY (job_id, url)
+);
+"""
+
+PENDING = ("queued", "running")
+
+log = get_logger("jobs")
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+class InvalidCallback(ValueError):
+    pass
+
+
+def resolve_callback(url: str, allowed_hosts=()):
+    """(split URL, vetted IP address to connect to) for a callback URL; raises InvalidCallback. Blocks on DNS."""
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise InvalidCallback("callback_url must be an http(s) URL")
+    host = parts.hostname.lower()
+    if allowed_hosts and host not in allowed_hosts:
+        raise InvalidCallback(f"callback host {host} is not in the allow-list")
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = [info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)]
+    except ValueError:
+        raise InvalidCallback("callback_url has an invalid port")
+    except (socket.gaierror, UnicodeError):
+        raise InvalidCallback(f"callback host {host} does not resolve")
+    if not allowed_hosts:
+        for address in addresses:
+            if not ipaddress.ip_address(address.split("%")[0]).is_global:
+                raise InvalidCallback(f"callback host {host} resolves to a non-public address")
+    return parts, addresses[0]
+
+
+def check_callback_url(url: str, allowed_hosts=()) -> str:
+    """Return `url` if a callback may be POSTed to it, else raise InvalidCallback. Blocks on DNS."""
+    resolve_callback(url, allowed_hosts)
+    return url
+
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    """Connects to an address resolved and checked beforehand, not to whatever `host` resolves to now."""
+
+    def __init__(self, host: str, address: str, **kwargs):
+        super().__init__(host, **kwargs)
+        self.address = address
+
+    def connect(self):
+        self.sock = socket.create_connection((self.address, self.port), self.timeout)
+
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS to a checked address; SNI and certificate verification use the hostname."""
+
+    def __init__(self, host: str, address: str, **kwargs):
+        self.tls_context = ssl.create_default_context()
+        super().__init__(host, context=self.tls_context, **kwargs)
+        self.address = address
+
+    def connect(self):
+        sock = socket.create_connection((self.address, self.port), self.timeout)
+        self.sock = self.tls_context.wrap_socket(sock, server_hostname=self.host)
+
+
+def post_callback(url: str, body: bytes, allowed_hosts=(), timeout: float = 10):
+    """POST `body` to a callback URL over a connection pinned to its checked address. Redirects are not followed."""
+    parts, address = resolve_callback(url, allowed_hosts)
+    connection_class = _PinnedHTTPSConnection if parts.scheme == "https" else _PinnedHTTPConnection
+    conn = connection_class(parts.hostname, address, port=parts.port, timeout=timeout)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    try:
+        conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+        status = conn.getresponse().status
+    finally:
+        conn.close()
+    if status >= 300:  # a 3xx could point anywhere; treated as a failed callback
+        raise RuntimeError(f"HTTP {status}")
+
+
+def request_hash(kind: str, request: dict) -> str:
+    body = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{kind}\n{body}".encode("utf-8")).hexdigest()
+
+
+class PlanJobs:
+    """
+    handlers: kind -> async fn(request dict) -> result dict.
+    A job still marked queued/running after `stale_seconds` (its worker died
+    or restarted) is reported as failed.
+    """
+
+    def __init__(self, db_path: str, handlers: dict, workers: int = 2, max_pending: int = 32,
+                 ttl_seconds: float = 6 * 3600, stale_seconds: float = 600, callback_hosts=()):
+        self.db_path = db_path
+        self.callback_hosts = frozenset(h.strip().lower() for h in callback_hosts if h.strip())
+        self.handlers = handlers
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.pending = 0
+        self._slots = None
+        self._tasks = set()
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        self._connect().execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    # ----- submit / poll -----
+
+    def check_callback(self, url: str) -> str:
+        """check_callback_url with this queue's allow-list. Resolves DNS, so run it off the event loop."""
+        return check_callback_url(url, self.callback_hosts)
+
+    def submit(self, kind: str, request: dict, callback_url: str = None) -> dict:
+        """
+        Start (or join) a job; must be called from the event loop. `callback_url`
+        must already have passed check_callback().
+        """
+        if kind not in self.handlers:
+            raise KeyError(kind)
+        now = time.time()
+        digest = request_hash(kind, request)
+        conn = self._connect()
+        conn.execute("DELETE FROM jobs WHERE expires_at < ?", (now,))
+        conn.execute("DELETE FROM job_callbacks WHERE job_id NOT IN (SELECT id FROM jobs)")
+
+        existing = conn.execute(
+            "SELECT id, status FROM jobs WHERE request_hash = ? AND status IN (?, ?) AND updated_at > ? "
+            "ORDER BY created_at DESC LIMIT 1",
+            (digest, *PENDING, now - self.stale_seconds),
+        ).fetchone()
+        if existing:
+            if callback_url:
+                self._add_callback(existing[0], callback_url)
+                # The job may have finished (on any worker) just before the callback was stored.
+                if self.get(existing[0])["status"] not in PENDING:
+                    self._spawn(self._notify(existing[0]))
+            return {"job_id": existing[0], "status": existing[1], "deduplicated": True}
+
+        if self.pending >= self.max_pending:
+            raise JobQueueFull(f"{self.pending} jobs already pending")
+
+        job_id = uuid.uuid4().hex
+        conn.execute(
+            "INSERT INTO jobs (id, kind, request_hash, status, request, created_at, updated_at, expires_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, kind, digest, json.dumps(request), now, now, now + self.ttl_seconds),
+        )
+        if callback_url:
+            self._add_callback(job_id, callback_url)
+        self.pending += 1
+        self._spawn(self._run(job_id, kind, request))
+        return {"job_id": job_id, "status": "queued", "deduplicated": False}
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def get(self, job_id: str):
+        row = self._connect().execute(
+            "SELECT kind, status, result, error, created_at, updated_at, expires_at FROM jobs "
+            "WHERE id = ? AND expires_at >= ?",
+            (job_id, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        kind, status, result, error, created_at, updated_at, expires_at = row
+        if status in PENDING and time.time() - updated_at > self.stale_seconds:
+            status, error = "failed", "job was interrupted (server restarted)"
+        job = {
+            "job_id": job_id,
+            "kind": kind,
+            "status": status,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "expires_at": expires_at,
+        }
+        if result is not None:
+            job["result"] = json.loads(result)
+        if error:
+            job["error"] = error
+        return job
+
+    # ----- execution -----
+
+    async def _run(self, job_id: str, kind: str, request: dict):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        try:
+            async with self._slots:
+                self._update(job_id, status="running")
+                try:
+                    result = await self.handlers[kind](request)
+                except Exception as e:
+                    log.warning("⚠️ Job %s (%s) failed: %s: %s", job_id[:8], kind, type(e).__name__, e)
+                    self._update(job_id, status="failed", error=f"{type(e).__name__}: {e}")
+                else:
+                    self._update(job_id, status="done", result=json.dumps(result))
+        finally:
+            self.pending -= 1
+        await self._notify(job_id)
+
+    # ----- callbacks -----
+
+    def _add_callback(self, job_id: str, url: str):
+        self._connect().execute("INSERT OR IGNORE INTO job_callbacks (job_id, url) VALUES (?, ?)", (job_id, url))
+
+    def _claim_callbacks(self, job_id: str) -> list:
+        """Mark the job's unsent callbacks as sent and return their URLs (each URL is claimed exactly once)."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            urls = [row[0] for row in conn.execute(
+                "SELECT url FROM job_callbacks WHERE job_id = ? AND sent_at IS NULL", (job_id,))]
+            conn.execute("UPDATE job_callbacks SET sent_at = ? WHERE job_id = ? AND sent_at IS NULL",
+                         (time.time(), job_id))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return urls
+
+    async def _notify(self, job_id: str):
+        urls = self._claim_callbacks(job_id)
+        if urls:
+            job = self.get(job_id)
+            await asyncio.gather(*(asyncio.to_thread(self._post_callback, url, job) for url in urls))
+
+    def _post_callback(self, url: str, job: dict):
+        try:
+            # Resolved and checked again (DNS may have changed since submit), then pinned.
+            post_callback(url, json.dumps(job).encode("utf-8"), self.callback_hosts)
+        except Exception as e:
+            log.warning("⚠️ Job callback to %s failed: %s", url, e)
@@ -0,0 +1,254 @@
+"""
+On-demand per-request profiling.
+
+When one scan is slow, its log lines say how long it took but not whether
+decoding, the CNN, waiting on Gemini or JSON handling was to blame. This
+ASGI middleware profiles selected requests and keeps the artifact under the
+request id:
+
+- requests carrying `X-Profile: <PRITHVI_PROFILE_TOKEN>` (admin opt-in), and
+- a random PRITHVI_PROFILE_SAMPLE fraction (0-1) of requests to the
+  profiled paths (/scan_disease and the planning routes by default).
+
+pyinstrument (a sampling profiler; `pip install pyinstrument`) is used when
+installed and writes an HTML flame view. Otherwise cProfile writes a
+.pstats file (`python -m pstats file` or snakeviz) and its top functions are
+stored with the index entry. Only one request is profiled at a time, since
+both profilers hook the event-loop thread; while one runs, other
+selected requests run unprofiled. cProfile also records whatever other
+coroutines ran on the loop meanwhile, so read it with that in mind.
+
+The index (path, status, wall ms, artifact) lives in SQLite next to the
+other caches; the newest PRITHVI_PROFILE_KEEP artifacts are kept. Entries
+are keyed by the request id reduced to [A-Za-z0-9_-], with a random suffix
+if that key is taken (a client reusing X-Request-ID), and artifact file
+names are generated here, never taken from the client.
+
+    GET /profiles?path=/scan_disease&limit=10   slowest recent profiles
+    GET /profiles/{request_id}                  the artifact
+    python profiling.py list --path /generate-execution-plan
+"""
+import argparse
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from structured_log import get_logger, request_id
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+log = get_logger("profiling")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DIR = os.path.join(BASE_DIR, "profiles")
+DEFAULT_PATHS = ("/scan_disease", "/predict", "/farm-plan", "/generate-smart-plan",
+                 "/generate-execution-plan", "/dashboard")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    request_id  TEXT PRIMARY KEY,
+    method      TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    status      INTEGER,
+    ms          REAL NOT NULL,
+    trigger     TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    file        TEXT NOT NULL,
+    top         TEXT,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS profiles_path_ms ON profiles (path, ms);
+"""
+
+
+class ProfileStore:
+    """Profile artifacts in `directory`, indexed in a SQLite table shared by every worker."""
+
+    def __init__(self, db_path: str, directory: str = DEFAULT_DIR, keep: int = 200):
+        self.db_path = db_path
+        self.directory = directory
+        self.keep = keep
+        self._local = threading.local()
+        os.makedirs(directory, exist_ok=True)
+        self._connect().executescript(SCHEMA)
+        self.counts = {"profiled": 0, "skipped_busy": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def save(self, rid: str, method: str, path: str, status: int, ms: float, trigger: str,
+             kind: str, artifact: bytes, top: list = None) -> str:
+        """Store one profile; returns the key it is listed and fetched under."""
+        filename = f"{int(time.time())}_{uuid.uuid4().hex[:12]}.{'html' if kind == 'pyinstrument' else 'pstats'}"
+        with open(os.path.join(self.directory, filename), "wb") as f:
+            f.write(artifact)
+        conn = self._connect()
+        key = re.sub(r"[^A-Za-z0-9_-]", "_", rid or "")[:64] or "request"
+        while True:
+            try:
+                conn.execute(
+                    "INSERT INTO profiles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, method, path, status, round(ms, 1), trigger, kind, filename,
+                     json.dumps(top) if top else None, time.time()),
+                )
+                break
+            except sqlite3.IntegrityError:
+                key = f"{key[:64]}-{uuid.uuid4().hex[:6]}"
+        stale = conn.execute(
+            "SELECT request_id, file FROM profiles ORDER BY created_at DESC LIMIT -1 OFFSET ?", (self.keep,)
+        ).fetchall()
+        for old_id, old_file in stale:
+            conn.execute("DELETE FROM profiles WHERE request_id = ?", (old_id,))
+            try:
+                os.remove(os.path.join(self.directory, old_file))
+            except OSError:
+                pass
+        return key
+
+    def slowest(self, path: str = None, limit: int = 20, since_hours: float = 24) -> list:
+        query = "SELECT * FROM profiles WHERE created_at >= ?"
+        params = [time.time() - since_hours * 3600]
+        if path:
+            query += " AND path = ?"
+            params.append(path)
+        cursor = self._connect().execute(query + " ORDER BY ms DESC LIMIT ?", (*params, limit))
+        columns = [c[0] for c in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for row in rows:
+            row["top"] = json.loads(row["top"]) if row["top"] else None
+        return rows
+
+    def get(self, rid: str):
+        """(kind, artifact path) or None."""
+        row = self._connect().execute("SELECT kind, file FROM profiles WHERE request_id = ?", (rid,)).fetchone()
+        if row is None:
+            return None
+        return row[0], os.path.join(self.directory, row[1])
+
+
+def top_functions(profile: cProfile.Profile, n: int = 15) -> list:
+    """[{"function", "calls", "total_ms", "cumulative_ms"}] by cumulative time."""
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({name})",
+            "calls": calls,
+            "total_ms": round(total * 1000, 2),
+            "cumulative_ms": round(cumulative * 1000, 2),
+        })
+    rows.sort(key=lambda r: -r["cumulative_ms"])
+    return rows[:n]
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: `app.add_middleware(ProfilingMiddleware, store=ProfileStore(...), token=..., sample_rate=...)`."""
+
+    def __init__(self, app, store: ProfileStore, token: str = "", sample_rate: float = 0.0,
+                 paths=DEFAULT_PATHS, header: str = "x-profile"):
+        self.app = app
+        self.store = store
+        self.token = token
+        self.sample_rate = sample_rate
+        self.paths = tuple(paths)
+        self.header = header.lower().encode("latin-1")
+        self._busy = threading.Lock()
+
+    def _trigger(self, scope):
+        if scope["type"] != "http":
+            return None
+        supplied = dict(scope.get("headers") or []).get(self.header, b"").decode("latin-1")
+        if self.token and supplied == self.token:
+            return "header"
+        if self.sample_rate > 0 and scope["path"].startswith(self.paths) and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope)
+        if trigger is None:
+            return await self.app(scope, receive, send)
+        if not self._busy.acquire(blocking=False):
+            self.store.counts["skipped_busy"] += 1
+            return await self.app(scope, receive, send)
+
+        status = {}
+
+        async def recording_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        if SamplingProfiler is not None:
+            profiler, kind = SamplingProfiler(interval=0.001, async_mode="enabled"), "pyinstrument"
+            profiler.start()
+        else:
+            profiler, kind = cProfile.Profile(), "cprofile"
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, recording_send)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            if kind == "pyinstrument":
+                profiler.stop()
+            else:
+                profiler.disable()
+            self._busy.release()
+            self._save(profiler, kind, scope, status.get("code"), ms, trigger)
+
+    def _save(self, profiler, kind: str, scope, status: int, ms: float, trigger: str):
+        try:
+            if kind == "pyinstrument":
+                artifact, top = profiler.output_html().encode("utf-8"), None
+            else:
+                profiler.create_stats()  # the bytes Profile.dump_stats() would write
+                artifact, top = marshal.dumps(profiler.stats), top_functions(profiler)
+            key = self.store.save(request_id.get(), scope["method"], scope["path"], status, ms, trigger, kind,
+                                  artifact, top)
+            self.store.counts["profiled"] += 1
+            log.info("🔬 Profiled %s %s (%.0f ms, %s) as %s", scope["method"], scope["path"], ms, trigger, key)
+        except Exception as e:
+            log.warning("⚠️ Could not store profile: %s: %s", type(e).__name__, e)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("list", help="slowest recent profiles")
+    p.add_argument("--path", default=None)
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--since-hours", type=float, default=24)
+    p.add_argument("--cache-db", default=os.environ.get("PRITHVI_CACHE_DB", os.path.join(BASE_DIR, "prithvi_cache.db")))
+    p.add_argument("--dir", default=os.environ.get("PRITHVI_PROFILE_DIR", DEFAULT_DIR))
+    args = parser.parse_args()
+
+    store = ProfileStore(args.cache_db, args.dir)
+    for row in store.slowest(args.path, args.limit, args.since_hours):
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["created_at"]))
+        print(f"{when}  {row['ms']:>9.1f} ms  {row['status']}  {row['method']} {row['path']:<28} "
+              f"{row['request_id']}  {os.path.join(args.dir, row['file'])}")
+        for fn in (row["top"] or [])[:5]:
+            print(f"{'':<24}{fn['cumulative_ms']:>9.1f} ms  {fn['function']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Prompt / response-schema registry for the Gemini routes.
+
+The old prompts described their output by embedding a full example JSON
+document, re-sent on every call. Here each prompt keeps only its
+instructions, and the output shape is passed as a typed `response_schema`
+(structured output), which the API enforces, so the reply always parses.
+
+    prompt = render("execution_plan", crop_name=..., ...)
+    model.generate_content(prompt, generation_config=generation_config("execution_plan"))
+
+prompts_legacy.py keeps the old prompts as the baseline for bench_prompts.py.
+"""
+
+
+# ----- schema helpers (the OpenAPI subset response_schema accepts) -----
+
+def _str(description: str = None) -> dict:
+    return {"type": "string", "description": description} if description else {"type": "string"}
+
+
+def _num(kind: str = "integer", description: str = None) -> dict:
+    return {"type": kind, "description": description} if description else {"type": kind}
+
+
+def _enum(*values) -> dict:
+    return {"type": "string", "enum": list(values)}
+
+
+def _obj(properties: dict, required: list = None) -> dict:
+    return {"type": "object", "properties": properties, "required": list(properties) if required is None else required}
+
+
+def _list(items: dict) -> dict:
+    return {"type": "array", "items": items}
+
+
+ICON = _enum("spray", "cut", "water", "leaf", "package", "eye", "sun", "droplets")
+
+
+class PromptSpec:
+    def __init__(self, template: str, schema: dict):
+        self.template = template
+        self.schema = schema
+
+    @property
+    def required(self) -> list:
+        return self.schema.get("required", [])
+
+
+PROMPTS = {
+    "advise_crop": PromptSpec(
+        "Act as an experienced Indian agronomist.\n"
+        "Farmer: soil {soil}, season {season}, location {location}.\n"
+        "Recommend the TOP 3 most profitable crops, weighing soil fit, season and climate, current Indian "
+        "market demand and 2026 price trends, yield, duration and water needs. Use Indian crop names "
+        "(e.g. Arhar, Bajra, Jowar) plus scientific names and kharif/rabi/zaid seasons. Reasons must be "
+        "concrete enough for the farmer to decide.",
+        _obj({
+            "recommendations": _list(_obj({
+                "name": _str("local + scientific name"),
+                "suitability": _num("integer", "0-100"),
+                "yield": _str("per acre, e.g. 25-30 quintals/acre"),
+                "duration": _str("e.g. 90-120 days"),
+                "reason": _str(),
+                "marketTrend": _enum("Up", "Down", "Stable"),
+                "waterRequirement": _enum("Low", "Medium", "High"),
+                "investment": _str("INR per acre"),
+            })),
+            "seasonalTips": _str("2-3 tips for this season and soil"),
+            "warnings": _str("risks to watch"),
+        }),
+    ),
+
+    "farm_plan": PromptSpec(
+        "You are a senior Indian agronomist and farm planner.\n"
+        "Farmer: soil {soil_type}, water {water_source}, budget INR {budget}, land {land_size} acres.\n"
+        "Create a single-crop plan for one season in simple language. Use Indian context: Mandi pricing, "
+        "FYM, Jeevamrutha if organic fits, local practices. The timeline must cover plowing, sowing, "
+        "irrigation, pest management and harvest. Profit must be realistic for 2026 Mandi prices.",
+        _obj({
+            "cropName": _str("crop with local variety"),
+            "expectedProfit": _str("INR for the whole land"),
+            "duration": _str("days"),
+            "shoppingList": _list(_str()),
+            "timeline": _list(_obj({"action": _str(), "description": _str(), "icon": ICON})),
+        }),
+    ),
+
+    "smart_plan": PromptSpec(
+        "Act as a senior agricultural scientist and financial advisor for an Indian farmer.\n"
+        "Land {land_size}, soil {soil_type}, budget {budget}, water {water_source}, season {season}, "
+        "sowing month {sowing_month}.\n"
+        "Plan the MOST profitable crop this season (Mandi pricing, FYM, Jeevamrutha if organic fits). "
+        "If {sowing_month} is the wrong month for {season} or the crop, risk_analysis.primary_risk MUST say "
+        "\"High Risk: Wrong season for this crop.\" Label timeline phases with dates where possible, "
+        "e.g. \"Week 1 (Early {sowing_month}): Soil Prep\".",
+        _obj({
+            "summary": _obj({
+                "crop_name": _str("with variety"),
+                "suitability_score": _str("e.g. 94%"),
+                "expected_revenue": _str("e.g. ₹1.5 Lakhs"),
+                "net_profit": _str(),
+                "roi": _str("e.g. 2.5x"),
+                "duration": _str("e.g. 140 Days"),
+            }),
+            "financial_breakdown": _list(_obj({
+                "category": _str("Seeds, Fertilizers, Labor, Pesticides, Other"),
+                "cost": _str("e.g. ₹12,000"),
+                "percent": _num("integer"),
+            })),
+            "risk_analysis": _obj({"primary_risk": _str(), "mitigation": _str()}),
+            "timeline_weeks": _list(_obj({"phase": _str(), "action": _str(), "details": _str(), "icon": _str()})),
+        }),
+    ),
+
+    "execution_plan": PromptSpec(
+        "Act as a precision farm manager and agricultural scientist.\n"
+        "Crop {crop_name}{variety_text}; land {land_size} acres; soil {soil_type}; water {water_source}; "
+        "sowing {sowing_date}.\n"
+        "Write a scientific execution manual to reach full yield potential. Calculate precisely for "
+        "{land_size} acres:\n"
+        "1. Yield: realistic potential %, total output in kg or quintals, main limiting factor.\n"
+        "2. Inputs: exact seed quantity; N-P-K converted to Urea 46%, DAP 18-46-0 and MOP 60% K2O; "
+        "micronutrients (Zn, B) and amendments (lime, gypsum) if the soil needs them; pesticides for major "
+        "pests. Put the best local variety in the seed note if none was given.\n"
+        "3. Timeline: key days from sowing (Day 0, 21, 45...), critical irrigation stages, basal and "
+        "top-dressing schedule, pest monitoring windows, realistic for {crop_name}.",
+        _obj({
+            "yield_forecast": _obj({
+                "potential_percentage": _num("integer", "0-100"),
+                "estimated_output": _str(),
+                "limiting_factor": _str(),
+            }),
+            "input_requirements": _list(_obj({"item": _str(), "quantity": _str(), "note": _str()})),
+            "critical_timeline": _list(_obj({
+                "day": _str("e.g. Day 21 (3 Weeks After Sowing)"),
+                "action": _str(),
+                "detail": _str(),
+                "icon": _str("fertilizer, mix, irrigation, spray or harvest"),
+            })),
+        }),
+    ),
+
+    # Narrative only: quantities come from agronomy.py, so this depends on
+    # crop/soil/water alone and is cached per combination.
+    "execution_narrative": PromptSpec(
+        "Act as a precision farm manager for an Indian farmer.\n"
+        "Crop {crop_name}{variety_text}; soil {soil_type}; water {water_source}.\n"
+        "Quantities are already calculated; do not give any. Write: the main factor limiting yield on this "
+        "soil and water source (one sentence), the best local variety, and one practical tip (one sentence) "
+        "for each of these plan stages: {stages}.",
+        _obj({
+            "limiting_factor": _str(),
+            "variety": _str("best local variety or hybrid"),
+            "stage_tips": _list(_obj({"action": _str("stage name exactly as given"), "tip": _str()})),
+        }),
+    ),
+
+    "market_trends": PromptSpec(
+        "Act as an expert Indian Mandi market analyst.\n"
+        "Write a realistic current-season price report for {region}: 10-12 major crops grown there "
+        "(vegetables, fruits, grains, pulses) at realistic 2025-26 Mandi prices, reflecting seasonal "
+        "supply, demand and imports. Use real varieties (e.g. \"Tomato Hybrid F1\", \"Wheat Lokwan\"). "
+        "change is the % change from last week, e.g. \"+5.2\"; forecast is next week's outlook with its reason.",
+        _obj({
+            "region": _str(),
+            "market_status": _enum("Bullish", "Bearish", "Neutral"),
+            "analyst_note": _str("2-3 sentences on conditions, drivers and outlook"),
+            "last_updated": _str("Today, HH:MM IST"),
+            "crops": _list(_obj({
+                "id": _str("crop_1, crop_2, ..."),
+                "name": _str(),
+                "price": _num("number"),
+                "unit": _str("₹/Quintal or ₹/Kg"),
+                "change": _str(),
+                "trend": _enum("up", "down", "stable"),
+                "forecast": _str(),
+                "market_note": _str(),
+            })),
+        }),
+    ),
+
+    # Prose only: prices, changes and forecasts come from market_prices.py.
+    "market_note": PromptSpec(
+        "Act as an expert Indian Mandi market analyst.\n"
+        "Latest mandi data for {region} ({last_updated}), price per quintal with 7-day change: {summary}.\n"
+        "Write the analyst note for farmers: 2-3 sentences on current conditions, the likely drivers "
+        "(season, arrivals, demand) and what to watch next week. Do not restate every price.",
+        _obj({"analyst_note": _str()}),
+    ),
+
+    # Per disease class, generated once in English and cached; other
+    # languages are translations of it (see localization.py).
+    "disease_advice": PromptSpec(
+        "You are an agricultural expert for Indian farmers.\n"
+        "Diagnosis: {disease} ({status}).\n"
+        "{task} Each step needs an image_query: a searchable description of the action in an Indian farm "
+        "(e.g. \"farmer spraying fungicide on tomato plant\").",
+        _obj({
+            "title": _str(),
+            "medicine_name": _str("chemical or organic medicine, e.g. Mancozeb 75% WP; 'No treatment needed' if healthy"),
+            "treatment": _str("brief summary of the approach"),
+            "prevention": _str("key prevention measure"),
+            "steps": _list(_obj({
+                "action": _str("e.g. Spray, Prune, Apply, Remove, Monitor"),
+                "description": _str("instruction with dosage"),
+                "icon": ICON,
+                "image_query": _str(),
+            })),
+        }),
+    ),
+
+    "vision_diagnosis": PromptSpec(
+        "You are an expert plant pathologist. Analyse this leaf image. If it is not a plant leaf, set "
+        "is_plant false. Otherwise identify the disease (or healthy), estimate confidence 0.0-1.0 from "
+        "visual clarity, describe the visible symptoms and give 3-5 specific treatment steps with dosages.",
+        _obj({
+            "is_plant": {"type": "boolean"},
+            "predicted_class": _str("e.g. Tomato Early Blight"),
+            "crop": _str(),
+            "disease": _str(),
+            "is_healthy": {"type": "boolean"},
+            "confidence": _num("number"),
+            "confidence_percentage": _str("e.g. 95%"),
+            "visual_symptoms": _str(),
+            "treatment": _list(_obj({
+                "step": _num("integer"), "action": _str(), "description": _str(),
+                "icon": _enum("cut", "spray", "water", "eye", "leaf"),
+            })),
+            "prevention": _list(_str()),
+            "medicine_recommendation": _str(),
+        }, required=["is_plant"]),
+    ),
+}
+
+
+# Translation reuses the source prompt's schema, so the reply has the same shape.
+TRANSLATE = (
+    "Translate this JSON document for Indian farmers into {language}. Translate every human-readable text "
+    "value in simple, natural {language}; keep keys, numbers, dosages, units, chemical names, icons, enum "
+    "values and image_query unchanged.\n{document}"
+)
+
+
+def render(name: str, **fields) -> str:
+    return PROMPTS[name].template.format(**fields)
+
+
+def generation_config(name: str) -> dict:
+    """Per-call config: merged by the SDK over the model's own generation_config."""
+    return {"response_mime_type": "application/json", "response_schema": PROMPTS[name].schema}
@@ -0,0 +1,354 @@
+"""
+The original example-document prompts, kept only as the baseline for
+bench_prompts.py. The API itself uses the compact prompts and response
+schemas in prompts.py.
+
+Templates use str.format fields, the same names prompts.render() takes.
+"""
+
+ADVISE_CROP = """
+        Act as an experienced Indian Agronomist with expertise in crop planning and market analysis.
+        
+        Farmer's Context:
+        - Soil Type: {soil}
+        - Season: {season}
+        - Location: {location}
+        
+        Task:
+        Recommend the TOP 3 most profitable crops for this farmer considering:
+        1. Soil compatibility and nutrient requirements
+        2. Seasonal suitability and climate factors
+        3. Current market demand and price trends in India
+        4. Expected yield and duration
+        5. Water requirements and sustainability
+        
+        Output Format (STRICT JSON):
+        {{
+            "recommendations": [
+                {{
+                    "name": "Crop Name (Local + Scientific)",
+                    "suitability": 85,
+                    "yield": "Expected yield per acre (e.g., 25-30 quintals/acre)",
+                    "duration": "Growth period in days (e.g., 90-120 days)",
+                    "reason": "Detailed explanation covering soil match, market demand, profitability, and farmer benefits",
+                    "marketTrend": "Up|Down|Stable",
+                    "waterRequirement": "Low|Medium|High",
+                    "investment": "Estimated cost per acre in INR"
+                }}
+            ],
+            "seasonalTips": "2-3 key tips for this season and soil type",
+            "warnings": "Any risks or challenges to watch out for"
+        }}
+        
+        Important:
+        - Use Indian crop names (e.g., Arhar, Bajra, Jowar)
+        - Consider kharif, rabi, zaid seasons
+        - Base recommendations on real agricultural science
+        - Provide actionable reasoning that helps farmers decide
+        - Include current 2026 market trends
+        """
+
+FARM_PLAN = """
+        You are a senior Indian agronomist and farm planner.
+
+        Farmer Inputs:
+        - Soil Type: {soil_type}
+        - Water Source: {water_source}
+        - Budget (INR): {budget}
+        - Land Size (acres): {land_size}
+
+        Task:
+        Create a single crop plan for one season, tailored for Indian conditions.
+        Use Indian context: mention Mandi pricing, FYM, Jeevamrutha (if organic fits),
+        and local practices. Keep language simple for farmers.
+
+        Output STRICT JSON (no markdown):
+        {{
+          "cropName": "Crop name with local variety",
+          "expectedProfit": "Estimated profit for total land size in INR",
+          "duration": "Total crop duration in days",
+          "shoppingList": ["Seeds", "FYM/Compost", "Drip pipes", "Bio pesticide"],
+          "timeline": [
+            {{"action": "Plowing", "description": "...", "icon": "package"}},
+            {{"action": "Sowing", "description": "...", "icon": "leaf"}},
+            {{"action": "Irrigation", "description": "...", "icon": "water"}},
+            {{"action": "Spray", "description": "...", "icon": "spray"}},
+            {{"action": "Harvest", "description": "...", "icon": "sun"}}
+          ]
+        }}
+
+        Rules:
+        - Use icons only from: spray, cut, water, leaf, package, eye, sun, droplets
+        - Timeline must include plowing, sowing, irrigation, pest management, harvest
+        - If organic is suitable, mention FYM and Jeevamrutha in shopping list or timeline
+        - Ensure profit is realistic for India 2026 Mandi prices
+        """
+
+SMART_PLAN = """
+        Act as a senior agricultural scientist and financial advisor for an Indian farmer.
+        Context: Land: {land_size}, Soil: {soil_type}, Budget: {budget}, Water Source: {water_source}, Season: {season}, Sowing Month: {sowing_month}.
+        Task: Generate a precision farming plan for the MOST profitable crop this season.
+        Use Indian context (Mandi pricing, FYM, and Jeevamrutha if organic fits).
+
+        CRITICAL INSTRUCTION:
+        - Check if the {season} matches the {sowing_month}.
+        - If the farmer is trying to sow a crop in the WRONG month, your risk_analysis MUST warn:
+          "High Risk: Wrong season for this crop."
+        - Adjust timeline_weeks to show specific dates if possible (e.g., "Week 1 (Early {sowing_month})").
+
+        Output STRICT JSON with this schema:
+        {{
+          "summary": {{
+            "crop_name": "String (e.g., Chilli - Guntur Hot)",
+            "suitability_score": "String (e.g., 94%)",
+            "expected_revenue": "String (e.g., ₹1.5 Lakhs)",
+            "net_profit": "String (e.g., ₹90,000)",
+            "roi": "String (e.g., 2.5x)",
+            "duration": "String (e.g., 140 Days)"
+          }},
+          "financial_breakdown": [
+            {{"category": "Seeds", "cost": "₹2,500", "percent": 5}},
+            {{"category": "Fertilizers", "cost": "₹12,000", "percent": 25}},
+            {{"category": "Labor", "cost": "₹20,000", "percent": 40}},
+            {{"category": "Pesticides", "cost": "₹8,000", "percent": 15}},
+            {{"category": "Other", "cost": "₹7,500", "percent": 15}}
+          ],
+          "risk_analysis": {{
+            "primary_risk": "String (e.g., Thrips Infestation in Jan)",
+            "mitigation": "String (e.g., Use Blue Sticky Traps & Spinosad)"
+          }},
+          "timeline_weeks": [
+            {{
+              "phase": "Week 1 (Early {sowing_month}): Soil Prep",
+              "action": "Deep Ploughing",
+              "details": "Plow 30cm deep. Apply 5 tons FYM/acre.",
+              "icon": "plow"
+            }},
+            {{
+               "phase": "Week 6: Critical Care",
+               "action": "Micronutrient Spray",
+               "details": "Spray 'Chilli Special' (5g/L) to boost flowering.",
+               "icon": "spray"
+            }}
+          ]
+        }}
+        """
+
+EXECUTION_PLAN = """
+        Act as a Precision Farm Manager and Agricultural Scientist.
+        
+        Context:
+        - Crop: {crop_name}{variety_text}
+        - Land Size: {land_size} acres
+        - Soil Type: {soil_type}
+        - Water Source: {water_source}
+        - Planned Sowing Date: {sowing_date}
+        
+        Goal: Generate a SCIENTIFIC EXECUTION MANUAL to maximize yield to 100% potential.
+        
+        CALCULATIONS REQUIRED (MUST BE PRECISE):
+        1. **Yield Forecast:**
+           - Calculate realistic yield potential (0-100%) based on soil and water
+           - Estimate total output in kg or quintals for {land_size} acres
+           - Identify main limiting factor (e.g., water, nutrients, soil pH)
+        
+        2. **Input Requirements:**
+           - Calculate EXACT seed quantity needed for {land_size} acres
+           - Calculate N-P-K requirement and convert to commercial fertilizer bags
+             (Urea for N, DAP for P, MOP for K)
+           - Include micronutrients (Zinc, Boron, etc.) if needed
+           - Add soil amendments (Lime, Gypsum) if soil type requires
+           - List pesticides/fungicides for major pests
+        
+        3. **Critical Timeline:**
+           - Specify key days from sowing (Day 0, Day 21, Day 45, etc.)
+           - Focus on critical irrigation stages (e.g., Crown Root Initiation for rice)
+           - Include fertilizer application schedule (basal, top dressing)
+           - Mention pest/disease monitoring periods
+        
+        Output STRICT JSON:
+        {{
+          "yield_forecast": {{
+            "potential_percentage": 96,
+            "estimated_output": "5200 kg for {land_size} acres",
+            "limiting_factor": "Sandy soil may reduce water retention by 4-6%"
+          }},
+          "input_requirements": [
+            {{"item": "Seeds", "quantity": "25 kg", "note": "Use certified seeds (e.g., Pusa Basmati 1121)"}},
+            {{"item": "Urea (46% N)", "quantity": "120 kg", "note": "Apply in 3 split doses: 40kg each at basal, tillering, flowering"}},
+            {{"item": "DAP (18-46-0)", "quantity": "65 kg", "note": "Full dose as basal application before sowing"}},
+            {{"item": "MOP (Potash)", "quantity": "40 kg", "note": "50% basal, 50% at flowering stage"}},
+            {{"item": "Zinc Sulfate", "quantity": "10 kg", "note": "Mix with soil to prevent zinc deficiency"}}
+          ],
+          "critical_timeline": [
+            {{
+              "day": "Day 0 (Sowing Day: {sowing_date})",
+              "action": "Basal Fertilizer Application",
+              "detail": "Apply full DAP (65kg), 50% MOP (20kg), and Zinc Sulfate. Plow 30cm deep.",
+              "icon": "fertilizer"
+            }},
+            {{
+              "day": "Day 21 (3 Weeks After Sowing)",
+              "action": "First Top Dressing (Urea)",
+              "detail": "Apply 40kg Urea per acre. Ensure soil is moist before application.",
+              "icon": "mix"
+            }},
+            {{
+              "day": "Day 45 (Critical Irrigation Stage)",
+              "action": "Crown Root Initiation Watering",
+              "detail": "Maintain 5cm standing water for 7 days. This is the MOST critical stage for yield.",
+              "icon": "irrigation"
+            }},
+            {{
+              "day": "Day 60 (Flowering/Panicle Initiation)",
+              "action": "Second Top Dressing + Pest Monitoring",
+              "detail": "Apply remaining 40kg Urea and 20kg MOP. Monitor for stem borers and leaf folders.",
+              "icon": "spray"
+            }},
+            {{
+              "day": "Day 90-110 (Maturity)",
+              "action": "Harvest",
+              "detail": "Harvest when 80% grains turn golden yellow. Dry to 14% moisture before storage.",
+              "icon": "harvest"
+            }}
+          ]
+        }}
+        
+        Important:
+        - ALL quantities must be calculated for {land_size} acres
+        - Use standard Indian fertilizer grades (Urea 46%, DAP 18-46-0, MOP 60% K2O)
+        - Timeline days should be realistic for {crop_name} cultivation
+        - If variety is not specified, suggest the best local variety in notes
+        - Use Indian context (Mandi pricing, FYM, local practices)
+        """
+
+MARKET_TRENDS = """
+        Act as an expert Indian Mandi Market Analyst with deep knowledge of agricultural economics.
+        
+        Context: Generate a REALISTIC market price report for {region} for the current season.
+        
+        Requirements:
+        1. Include 10-12 major crops relevant to this region (mix of vegetables, fruits, grains, pulses)
+        2. Use realistic 2025-2026 Indian Mandi prices (in ₹/Quintal)
+        3. Reflect current market conditions (seasonal supply, demand patterns)
+        4. For each crop, provide:
+           - Current price in ₹/Quintal or ₹/Kg
+           - Price trend (up/down/stable)
+           - Percentage change from last week
+           - Price forecast for next week
+        5. Add an analyst note about market conditions
+        
+        Regional Context for {region}:
+        - Research typical crops grown in this region
+        - Consider seasonal variations
+        - Reflect local market dynamics and supply patterns
+        
+        Output STRICT JSON (no markdown):
+        {{
+          "region": "{region}",
+          "market_status": "Bullish|Bearish|Neutral",
+          "analyst_note": "2-3 sentence insight about current market conditions, price drivers, and outlook",
+          "last_updated": "Today, HH:MM IST",
+          "crops": [
+            {{
+              "id": "crop_1",
+              "name": "Crop Name (with variety if relevant)",
+              "price": 2400,
+              "unit": "₹/Quintal",
+              "change": "+5.2",
+              "trend": "up",
+              "forecast": "Rising next week due to [reason]",
+              "market_note": "Supply tight, expect higher prices"
+            }},
+            {{
+              "id": "crop_2",
+              "name": "Another Crop",
+              "price": 1800,
+              "unit": "₹/Quintal",
+              "change": "-1.5",
+              "trend": "down",
+              "forecast": "Stable this week",
+              "market_note": "Good supply, prices moderating"
+            }}
+            // ... 10-12 total items
+          ]
+        }}
+        
+        Important:
+        - Prices should be realistic for Indian mandis in 2025-2026
+        - Include seasonal crops relevant to the region
+        - Trends should reflect real market patterns (supply, demand, imports)
+        - Be specific in forecasts and market notes
+        - Use actual crop varieties where applicable (e.g., "Tomato Hybrid F1", "Onion Red", "Wheat Lokwan")
+        """
+
+VISION_DIAGNOSIS = """
+        You are an expert agricultural plant pathologist specializing in crop disease identification.
+        
+        Analyze this plant leaf image carefully:
+        
+        1. **Is this a plant leaf?** If not, respond with {{"is_plant": false}}
+        2. **Disease Identification:** Identify the specific disease or if the plant is healthy
+        3. **Confidence:** Estimate confidence (0.0-1.0) based on visual clarity and symptom visibility
+        4. **Treatment Steps:** Provide 3-5 specific treatment steps
+        
+        IMPORTANT: Respond in STRICT JSON format (no markdown, no code blocks):
+        {{
+          "is_plant": true,
+          "predicted_class": "Tomato Early Blight",
+          "crop": "Tomato",
+          "disease": "Early Blight",
+          "is_healthy": false,
+          "confidence": 0.95,
+          "confidence_percentage": "95%",
+          "visual_symptoms": "Brown circular lesions with concentric rings on lower leaves",
+          "treatment": [
+            {{
+              "step": 1,
+              "action": "Remove infected leaves",
+              "description": "Prune all infected leaves from the base of the plant",
+              "icon": "cut"
+            }},
+            {{
+              "step": 2,
+              "action": "Apply fungicide",
+              "description": "Spray Mancozeb (2g per liter) every 10-14 days",
+              "icon": "spray"
+            }},
+            {{
+              "step": 3,
+              "action": "Improve drainage",
+              "description": "Ensure proper spacing and avoid overhead watering",
+              "icon": "water"
+            }},
+            {{
+              "step": 4,
+              "action": "Monitor regularly",
+              "description": "Check plants every 2-3 days for new lesions",
+              "icon": "eye"
+            }},
+            {{
+              "step": 5,
+              "action": "Crop rotation",
+              "description": "Next season, plant in a different field location",
+              "icon": "leaf"
+            }}
+          ],
+          "prevention": [
+            "Use disease-resistant varieties",
+            "Maintain proper plant spacing",
+            "Avoid overhead watering",
+            "Remove plant debris after harvest"
+          ],
+          "medicine_recommendation": "Mancozeb, Chlorothalonil, or Neem oil"
+        }}
+        """
+
+LEGACY_PROMPTS = {
+    "advise_crop": ADVISE_CROP,
+    "farm_plan": FARM_PLAN,
+    "smart_plan": SMART_PLAN,
+    "execution_plan": EXECUTION_PLAN,
+    "market_trends": MARKET_TRENDS,
+    "vision_diagnosis": VISION_DIAGNOSIS,
+}
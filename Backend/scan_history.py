@@ -0,0 +1,230 @@
+"""
+Append-only store of every diagnosis served by /scan_disease, for outbreak
+dashboards.
+
+- Writes never touch the request path: `record()` only enqueues, and one
+  background thread per process drains the queue in batches, one SQLite
+  transaction per batch (WAL mode, so readers and other workers' writers
+  are not blocked for long).
+- `scan_records` keeps every scan, indexed on time, crop, disease and
+  geohash for drill-down queries.
+- `daily_counts` is a rollup (precision, day, region, crop, disease) ->
+  count, upserted in the same transaction as the raw rows, at two region
+  sizes: 4-character geohash (~39 x 20 km, about district scale) and
+  2-character (~1250 x 625 km, state scale). A query at a stored precision
+  is a primary-key range scan with no GROUP BY, so it stays in the
+  milliseconds however many scans have been recorded; other precisions
+  group the next finer level.
+"""
+import queue
+import sqlite3
+import threading
+import time
+
+from structured_log import get_logger
+
+ROLLUP_PRECISIONS = (2, 4)
+RECORD_PRECISION = 6
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+log = get_logger("history")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scan_records (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts         REAL NOT NULL,
+    day        INTEGER NOT NULL,
+    crop       TEXT,
+    disease    TEXT NOT NULL,
+    healthy    INTEGER,
+    confidence TEXT,
+    source     TEXT,
+    geohash    TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_scan_records_ts ON scan_records (ts);
+CREATE INDEX IF NOT EXISTS idx_scan_records_crop ON scan_records (crop, ts);
+CREATE INDEX IF NOT EXISTS idx_scan_records_disease ON scan_records (disease, ts);
+CREATE INDEX IF NOT EXISTS idx_scan_records_geohash ON scan_records (geohash, ts);
+
+CREATE TABLE IF NOT EXISTS daily_counts (
+    precision INTEGER NOT NULL,
+    day       INTEGER NOT NULL,
+    region    TEXT NOT NULL,
+    crop      TEXT NOT NULL,
+    disease   TEXT NOT NULL,
+    count     INTEGER NOT NULL,
+    PRIMARY KEY (precision, day, region, crop, disease)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_daily_counts_crop ON daily_counts (precision, crop, day);
+CREATE INDEX IF NOT EXISTS idx_daily_counts_disease ON daily_counts (precision, disease, day);
+"""
+
+
+def geohash(lat: float, lon: float, precision: int = RECORD_PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def epoch_day(ts: float) -> int:
+    return int(ts // 86400)
+
+
+def day_string(day: int) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(day * 86400))
+
+
+class ScanHistory:
+    """Batched, asynchronous writer plus aggregation queries over one SQLite file."""
+
+    def __init__(self, db_path: str, batch_size: int = 500, flush_seconds: float = 1.0,
+                 max_pending: int = 50_000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.written = 0
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+        self._writer = threading.Thread(target=self._run, name="scan-history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    # ----- writes -----
+
+    def record(self, disease: str, crop: str = None, healthy: bool = None, confidence=None,
+               source: str = None, lat: float = None, lon: float = None, ts: float = None):
+        """Queue one scan; never blocks. Drops (and counts) if the writer is far behind."""
+        ts = time.time() if ts is None else ts
+        gh = geohash(lat, lon) if lat is not None and lon is not None else None
+        row = (ts, epoch_day(ts), crop, (disease or "unknown").strip().lower(), None if healthy is None else int(healthy),
+               None if confidence is None else str(confidence), source, gh)
+        try:
+            self.pending.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            try:
+                first = self.pending.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                continue
+            if first is None:
+                return
+            batch = [first]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    row = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if row is None:
+                    stop = True
+                    break
+                batch.append(row)
+            try:
+                self.write_batch(batch)
+            except sqlite3.Error as e:
+                log.error("⚠️ Scan history write failed (%d rows): %s", len(batch), e)
+            if stop:
+                return
+
+    def write_batch(self, rows):
+        """Insert raw rows and bump the daily rollup in one transaction."""
+        rollup = {}
+        for ts, day, crop, disease, healthy, confidence, source, gh in rows:
+            for precision in ROLLUP_PRECISIONS:
+                key = (precision, day, (gh or "")[:precision], crop or "", disease)
+                rollup[key] = rollup.get(key, 0) + 1
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO scan_records (ts, day, crop, disease, healthy, confidence, source, geohash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.executemany(
+                "INSERT INTO daily_counts (precision, day, region, crop, disease, count) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (precision, day, region, crop, disease) DO UPDATE SET count = count + excluded.count",
+                [(*key, n) for key, n in rollup.items()],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.written += len(rows)
+
+    def close(self, timeout: float = 10.0):
+        """Flush everything queued so far and stop the writer."""
+        if self._writer.is_alive():
+            self.pending.put(None)
+            self._writer.join(timeout)
+
+    # ----- reads -----
+
+    def outbreaks(self, days: int = 30, precision: int = 4, crop: str = None,
+                  disease: str = None, region: str = None, include_healthy: bool = False,
+                  limit: int = 1000) -> list:
+        """Scan counts per (day, region, crop, disease), newest day first, busiest cells first."""
+        precision = max(0, min(int(precision), ROLLUP_PRECISIONS[-1]))
+        level = next(p for p in ROLLUP_PRECISIONS if p >= precision)
+        if precision == level:
+            sql = ["SELECT day, region, crop, disease, count AS n FROM daily_counts"]
+            params = []
+        else:
+            sql = ["SELECT day, substr(region, 1, ?) AS r, crop, disease, SUM(count) AS n FROM daily_counts"]
+            params = [precision]
+        sql.append("WHERE precision = ? AND day >= ?")
+        params += [level, epoch_day(time.time()) - int(days) + 1]
+        if crop:
+            sql.append("AND crop = ?")
+            params.append(crop)
+        if disease:
+            sql.append("AND disease = ?")
+            params.append(disease.strip().lower())
+        if region:
+            # Range instead of LIKE so the primary key order can be used.
+            sql.append("AND region >= ? AND region < ?")
+            params += [region, region + "~"]
+        if not include_healthy:
+            sql.append("AND disease NOT LIKE '%healthy%'")
+        if precision != level:
+            sql.append("GROUP BY day, r, crop, disease")
+        sql.append("ORDER BY day DESC, n DESC LIMIT ?")
+        params.append(int(limit))
+
+        rows = self._connect().execute(" ".join(sql), params).fetchall()
+        return [
+            {"day": day_string(day), "region": r or None, "crop": c or None, "disease": d, "count": n}
+            for day, r, c, d, n in rows
+        ]
+
+    def stats(self) -> dict:
+        return {"queued": self.pending.qsize(), "written": self.written, "dropped": self.dropped}
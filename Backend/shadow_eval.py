@@ -0,0 +1,217 @@
+"""
+Shadow evaluation: how often does the local CNN agree with Gemini?
+
+For a sampled fraction (PRITHVI_SHADOW_SAMPLE) of successful Tier-1 Gemini
+scans, the same upload is classified by the CNN in the background and both
+answers are recorded. The report gives agreement per Gemini class and per
+CNN confidence band, and for candidate thresholds the share of scans the
+CNN could have answered alone and how often it agreed on those. That is the
+data needed to decide how much traffic can stay local.
+
+The shadow work never touches the request:
+
+- scans are queued after the response has been sent (a FastAPI background
+  task), into a bounded queue; when it is full the sample is dropped;
+- one worker thread runs at the lowest OS priority (nice 19, Linux);
+- its CPU is duty-cycled to PRITHVI_SHADOW_CPU (default 0.25): after a job
+  that took t seconds it sleeps t * (1/budget - 1);
+- if `busy()` says a request is using the model, a job waits up to
+  BUSY_WAIT seconds for it to finish, then is dropped.
+
+Gemini often answers a healthy leaf with just "Healthy"; its `crop` field
+then picks the class (e.g. Tomato___healthy).
+
+    python shadow_eval.py report [--since-days 30]
+"""
+import argparse
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+
+from class_index import CLASS_NAMES, CROP_OF_CLASS, class_for_scan
+from structured_log import get_logger
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(BASE_DIR, "prithvi_cache.db")
+
+# Lower edges of the CNN confidence bands.
+BANDS = (0.0, 0.5, 0.7, 0.85, 0.95)
+THRESHOLDS = (0.7, 0.8, 0.9, 0.95)
+BUSY_WAIT = 2.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shadow_results (
+    ts              REAL NOT NULL,
+    gemini_label    TEXT,
+    gemini_class    TEXT,
+    gemini_score    TEXT,
+    cnn_class       TEXT NOT NULL,
+    cnn_confidence  REAL NOT NULL,
+    agree           INTEGER,
+    crop_agree      INTEGER,
+    model_version   TEXT,
+    ms              REAL
+);
+CREATE INDEX IF NOT EXISTS shadow_results_ts ON shadow_results (ts);
+"""
+
+log = get_logger("shadow")
+
+
+def band_of(confidence: float) -> str:
+    lower = max(b for b in BANDS if confidence >= b)
+    upper = next((b for b in BANDS if b > lower), 1.0)
+    return f"{lower:.2f}-{upper:.2f}"
+
+
+class ShadowEvaluator:
+    """
+    `classify(image_bytes) -> (probs over CLASS_NAMES, model version)` runs
+    the CNN; submit() is cheap and never blocks. `busy()`, if given, is True
+    while shadow work would contend with a request.
+    """
+
+    def __init__(self, db_path: str, classify, sample_rate: float = 0.0, cpu_budget: float = 0.25,
+                 max_queue: int = 32, busy=None):
+        self.db_path = db_path
+        self.classify = classify
+        self.busy = busy
+        self.sample_rate = sample_rate
+        self.cpu_budget = min(max(cpu_budget, 0.01), 1.0)
+        self.pending = queue.Queue(maxsize=max_queue)
+        self.counts = {"sampled": 0, "dropped": 0, "busy": 0, "evaluated": 0, "errors": 0}
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+        if sample_rate > 0:
+            threading.Thread(target=self._run, name="shadow-eval", daemon=True).start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def submit(self, image_bytes: bytes, diagnosis: dict):
+        """Maybe queue one Gemini-diagnosed scan for shadow classification."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return
+        self.counts["sampled"] += 1
+        try:
+            self.pending.put_nowait((image_bytes, diagnosis))
+        except queue.Full:
+            self.counts["dropped"] += 1
+
+    def _run(self):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)  # this thread only, on Linux
+        except (AttributeError, OSError):
+            pass
+        while True:
+            job = self.pending.get()
+            if not self._wait_idle():
+                self.counts["busy"] += 1
+                continue
+            start = time.perf_counter()
+            try:
+                self._evaluate(*job, start)
+                self.counts["evaluated"] += 1
+            except Exception as e:
+                self.counts["errors"] += 1
+                log.warning("⚠️ Shadow evaluation failed: %s: %s", type(e).__name__, e)
+            # Duty cycle: busy for t, idle for t * (1/budget - 1).
+            busy = time.perf_counter() - start
+            time.sleep(busy * (1 / self.cpu_budget - 1))
+
+    def _wait_idle(self) -> bool:
+        deadline = time.monotonic() + BUSY_WAIT
+        while self.busy is not None and self.busy():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _evaluate(self, image_bytes: bytes, diagnosis: dict, start: float):
+        probs, version = self.classify(image_bytes)
+        idx = int(probs.argmax())
+        cnn_class, confidence = CLASS_NAMES[idx], float(probs[idx])
+        expected = class_for_scan(diagnosis)
+        if expected is None:
+            agree = crop_agree = None  # Gemini's label doesn't name a class we know
+        else:
+            agree = int(expected == cnn_class)
+            crop_agree = int(CROP_OF_CLASS[CLASS_NAMES.index(expected)] == CROP_OF_CLASS[idx])
+        score = diagnosis.get("confidence_score")
+        self._connect().execute(
+            "INSERT INTO shadow_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (time.time(), diagnosis.get("diagnosis_name"), expected, None if score is None else str(score),
+             cnn_class, confidence, agree, crop_agree, version, round((time.perf_counter() - start) * 1000, 1)),
+        )
+
+    def report(self, since_days: float = 30) -> dict:
+        rows = self._connect().execute(
+            "SELECT gemini_class, cnn_confidence, agree, crop_agree FROM shadow_results WHERE ts >= ?",
+            (time.time() - since_days * 86400,),
+        ).fetchall()
+        matched = [r for r in rows if r[2] is not None]
+
+        def summary(subset: list) -> dict:
+            n = len(subset)
+            return {
+                "scans": n,
+                "agreement": round(sum(r[2] for r in subset) / n, 3) if n else None,
+                "crop_agreement": round(sum(r[3] for r in subset) / n, 3) if n else None,
+            }
+
+        per_class, per_band = {}, {}
+        for row in matched:
+            per_class.setdefault(row[0], []).append(row)
+            per_band.setdefault(band_of(row[1]), []).append(row)
+        return {
+            **self.counts,
+            "since_days": since_days,
+            "recorded": len(rows),
+            "unmapped": len(rows) - len(matched),
+            "overall": summary(matched),
+            "per_band": {band: summary(per_band[band]) for band in sorted(per_band)},
+            "per_class": {name: summary(per_class[name]) for name in sorted(per_class)},
+            # "If scans at or above t stayed local": share of traffic kept, and how often it was right.
+            "thresholds": {
+                f"{t:.2f}": {**summary([r for r in matched if r[1] >= t]),
+                             "local_share": round(sum(r[1] >= t for r in matched) / len(matched), 3) if matched else None}
+                for t in THRESHOLDS
+            },
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    r = sub.add_parser("report", help="agreement per class, confidence band and threshold")
+    r.add_argument("--since-days", type=float, default=30)
+    r.add_argument("--db", default=os.environ.get("PRITHVI_CACHE_DB", DEFAULT_DB))
+    args = parser.parse_args()
+
+    report = ShadowEvaluator(args.db, classify=None).report(args.since_days)
+    overall = report["overall"]
+    print(f"🌓 {report['recorded']} shadow scans ({report['unmapped']} with a Gemini label outside the 38 classes); "
+          f"agreement {overall['agreement']}, crop agreement {overall['crop_agreement']}")
+    print(f"\n{'CNN confidence':<16} {'scans':>6} {'agree':>7} {'crop':>7}")
+    for band, s in report["per_band"].items():
+        print(f"{band:<16} {s['scans']:>6} {s['agreement']:>7} {s['crop_agreement']:>7}")
+    print(f"\n{'keep local if ≥':<16} {'share':>6} {'agree':>7}")
+    for t, s in report["thresholds"].items():
+        print(f"{t:<16} {s['local_share']!s:>6} {s['agreement']!s:>7}")
+    print(f"\n{'Gemini class':<48} {'scans':>6} {'agree':>7}")
+    for name, s in sorted(report["per_class"].items(), key=lambda kv: -kv[1]["scans"]):
+        print(f"{name:<48} {s['scans']:>6} {s['agreement']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+SQLite-backed key/value cache shared by every worker process.
+
+Replaces the old advice_cache.json read-modify-write cycle, which raced as
+soon as more than one uvicorn worker was running. The database runs in WAL
+mode so readers never block the single writer, and every write is one
+atomic UPSERT instead of a full-file rewrite.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SharedCache:
+    """
+    Namespaced JSON cache stored in one SQLite file.
+
+    Connections are per thread (sqlite3 objects can't be shared across
+    threads), and every process opens its own, so the file is the only
+    shared state.
+    """
+
+    def __init__(self, db_path: str, namespace: str = "default"):
+        self.db_path = db_path
+        self.namespace = namespace
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace  TEXT NOT NULL,
+                key        TEXT NOT NULL,
+                value      TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+
+    def get(self, key: str):
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value, ttl: float = None):
+        now = time.time()
+        self._connect().execute(
+            """
+            INSERT INTO cache (namespace, key, value, updated_at, expires_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (namespace, key) DO UPDATE SET
+                value = excluded.value,
+                updated_at = excluded.updated_at,
+                expires_at = excluded.expires_at
+            """,
+            (self.namespace, key, json.dumps(value), now, now + ttl if ttl else None),
+        )
+
+    def update(self, entries: dict, ttl: float = None):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for key, value in entries.items():
+                self.set(key, value, ttl)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, key: str):
+        self._connect().execute(
+            "DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+        )
+
+    def __len__(self) -> int:
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+    def import_json_file(self, json_path: str) -> int:
+        """One-time migration of a legacy {key: value} JSON cache file."""
+        if not os.path.exists(json_path) or len(self) > 0:
+            return 0
+        with open(json_path, "r") as f:
+            entries = json.load(f)
+        self.update(entries)
+        return len(entries)
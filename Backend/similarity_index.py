@@ -0,0 +1,202 @@
+"""
+"Seen this before" index over CNN embeddings of confirmed past scans.
+
+Every confirmed diagnosis is stored as (penultimate-layer embedding, label,
+payload). A new upload whose nearest neighbours all carry the same label at
+high cosine similarity can reuse the stored Gemini diagnosis instead of
+paying for a fresh cloud call.
+
+Storage / search:
+- SQLite (WAL) is the source of truth, so every worker process sees the
+  same history. Each process keeps an in-memory float32 matrix and pulls in
+  new rows incrementally (id > last seen).
+- Up to IVF_MIN_VECTORS rows: exact brute-force search, one matrix-vector
+  product + argpartition.
+- Beyond that: an IVF index (k-means coarse quantiser, search only the
+  `nprobe` closest lists), retrained whenever the index doubles in size.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+IVF_MIN_VECTORS = 100_000
+
+
+def _normalise(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norm = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norm, 1e-12)
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors; returns (k, dim) unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        empty = np.bincount(assign, minlength=k) == 0
+        sums[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+        centroids = _normalise(sums)
+    return centroids
+
+
+class VectorIndex:
+    """In-memory cosine-similarity index (brute force, then IVF)."""
+
+    def __init__(self, dim: int, ivf_min_vectors: int = IVF_MIN_VECTORS, nprobe: int = 8):
+        self.dim = dim
+        self.ivf_min_vectors = ivf_min_vectors
+        self.nprobe = nprobe
+        self.vectors = np.zeros((1024, dim), dtype=np.float32)
+        self.size = 0
+        self.centroids = None
+        self.lists = None
+        self.trained_size = 0
+
+    def add(self, vectors: np.ndarray):
+        vectors = _normalise(np.atleast_2d(vectors))
+        needed = self.size + len(vectors)
+        if needed > len(self.vectors):
+            grown = np.zeros((max(needed, 2 * len(self.vectors)), self.dim), dtype=np.float32)
+            grown[:self.size] = self.vectors[:self.size]
+            self.vectors = grown
+        start = self.size
+        self.vectors[start:needed] = vectors
+        self.size = needed
+
+        if self.size >= self.ivf_min_vectors and self.size >= 2 * self.trained_size:
+            self._train_ivf()
+        elif self.centroids is not None:
+            assign = np.argmax(vectors @ self.centroids.T, axis=1)
+            for offset, lst in enumerate(assign):
+                self.lists[lst].append(start + offset)
+
+    def _train_ivf(self):
+        data = self.vectors[:self.size]
+        nlist = int(np.sqrt(self.size))
+        rng = np.random.default_rng(0)
+        sample = data[rng.choice(self.size, size=min(self.size, nlist * 64), replace=False)]
+        self.centroids = kmeans(sample, nlist)
+        assign = np.argmax(data @ self.centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        self.lists = [list(order[bounds[i]:bounds[i + 1]]) for i in range(nlist)]
+        self.trained_size = self.size
+
+    def search(self, query: np.ndarray, k: int = 5):
+        """Returns (row indices, cosine similarities), best first."""
+        if self.size == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32)
+        q = _normalise(query)
+        if self.centroids is None:
+            candidates = None
+            sims = self.vectors[:self.size] @ q
+        else:
+            probe = np.argpartition(self.centroids @ q, -self.nprobe)[-self.nprobe:]
+            candidates = np.fromiter((i for p in probe for i in self.lists[p]), dtype=np.intp)
+            sims = self.vectors[candidates] @ q
+
+        k = min(k, len(sims))
+        if k == 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(sims, -k)[-k:]
+        top = top[np.argsort(sims[top])[::-1]]
+        rows = top if candidates is None else candidates[top]
+        return rows, sims[top]
+
+
+class ScanSimilarityIndex:
+    """VectorIndex kept in sync with a shared SQLite table of confirmed scans."""
+
+    def __init__(self, db_path: str, refresh_seconds: float = 5.0, **index_kwargs):
+        self.db_path = db_path
+        self.refresh_seconds = refresh_seconds
+        self.index_kwargs = index_kwargs
+        self.index = None
+        self.row_ids = []
+        self.labels = []
+        self.last_id = 0
+        self.last_refresh = 0.0
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._connect().execute(
+            """
+            CREATE TABLE IF NOT EXISTS scan_embeddings (
+                id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                label      TEXT NOT NULL,
+                embedding  BLOB NOT NULL,
+                payload    TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def refresh(self, force: bool = False):
+        """Pull rows written since the last refresh (by any process)."""
+        if not force and time.time() - self.last_refresh < self.refresh_seconds:
+            return
+        with self.lock:
+            rows = self._connect().execute(
+                "SELECT id, label, embedding FROM scan_embeddings WHERE id > ? ORDER BY id",
+                (self.last_id,),
+            ).fetchall()
+            if rows:
+                vectors = np.stack([np.frombuffer(r[2], dtype=np.float32) for r in rows])
+                if self.index is None:
+                    self.index = VectorIndex(vectors.shape[1], **self.index_kwargs)
+                self.index.add(vectors)
+                self.row_ids += [r[0] for r in rows]
+                self.labels += [r[1] for r in rows]
+                self.last_id = rows[-1][0]
+            self.last_refresh = time.time()
+
+    def add(self, embedding: np.ndarray, label: str, payload: dict):
+        self._connect().execute(
+            "INSERT INTO scan_embeddings (label, embedding, payload, created_at) VALUES (?, ?, ?, ?)",
+            (label, np.asarray(embedding, dtype=np.float32).tobytes(), json.dumps(payload), time.time()),
+        )
+
+    def __len__(self) -> int:
+        return 0 if self.index is None else self.index.size
+
+    def find_match(self, embedding: np.ndarray, k: int = 5, min_similarity: float = 0.92,
+                   min_neighbours: int = 3):
+        """
+        Stored payload of the closest scan if the k nearest neighbours agree:
+        at least `min_neighbours` found, all above `min_similarity`, one label.
+        Returns (payload or None, match info dict).
+        """
+        self.refresh()
+        if self.index is None:
+            return None, {"neighbours": 0}
+        with self.lock:
+            rows, sims = self.index.search(embedding, k)
+            labels = [self.labels[r] for r in rows]
+            ids = [self.row_ids[r] for r in rows]
+
+        info = {
+            "neighbours": len(rows),
+            "labels": labels,
+            "similarities": [round(float(s), 4) for s in sims],
+        }
+        if len(rows) < min_neighbours or float(sims.min()) < min_similarity or len(set(labels)) != 1:
+            return None, info
+
+        payload = self._connect().execute(
+            "SELECT payload FROM scan_embeddings WHERE id = ?", (ids[0],)
+        ).fetchone()
+        return (json.loads(payload[0]) if payload else None), info
@@ -0,0 +1,161 @@
+"""
+Structured, non-blocking logging for the request path.
+
+`print` on the event loop is a synchronous stdout write per line, and the
+scan route made ~30 of them per request (some computing array statistics
+just to print them). Here every record goes onto an in-memory queue; a
+background thread formats and writes it. Messages use %-style arguments, so
+a record below PRITHVI_LOG_LEVEL is dropped before anything is formatted,
+and formatting of the rest happens on the writer thread:
+
+    log = get_logger()
+    log.info("CNN prediction %s (%.1f%%)", raw_class, confidence * 100,
+             extra=fields(class_idx=class_idx, confidence=confidence))
+    if log.isEnabledFor(logging.DEBUG):     # costly diagnostics
+        log.debug("value range [%s, %s]", img_array.min(), img_array.max())
+
+RequestIdMiddleware gives each HTTP request an id (the client's
+X-Request-ID, or a new one), echoes it in the response header and stamps it
+on every record logged while handling it, so one scan's lines can be
+grouped: `grep 3f2a9c1e0b7d` in text mode, or filter on `request_id` in
+JSON mode.
+
+    PRITHVI_LOG_LEVEL   DEBUG | INFO (default) | WARNING | ERROR
+    PRITHVI_LOG_FORMAT  text (default) | json
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+import uuid
+
+LOGGER_NAME = "prithvi"
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s [%(request_id)s] %(message)s"
+
+request_id = contextvars.ContextVar("request_id", default="-")
+_listener = None
+
+
+def get_logger(name: str = None) -> logging.Logger:
+    return logging.getLogger(LOGGER_NAME if name is None else f"{LOGGER_NAME}.{name}")
+
+
+def fields(**values) -> dict:
+    """`extra=` for structured key/value fields: `log.info("...", extra=fields(ms=12.5))`."""
+    return {"fields": values}
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps the current request id on each record (runs in the logging thread, before queueing)."""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that queues the record as is. The stdlib one formats the
+    message in the caller's thread (prepare); here that is left to the
+    listener. Arguments are therefore formatted slightly later, which is
+    fine for the immutable values (str, numbers, tuples) logged here.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record):
+        text = super().format(record)
+        extra = getattr(record, "fields", None)
+        if extra:
+            text += " " + " ".join(f"{key}={value}" for key, value in extra.items())
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, request_id, msg, the record's fields and any exception."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure(level: str = "INFO", fmt: str = "text", stream=None) -> logging.Logger:
+    """Route the "prithvi" logger through a queue to a writer thread. Safe to call more than once."""
+    global _listener
+    logger = get_logger()
+    if _listener is not None:
+        _listener.stop()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    records = queue.SimpleQueue()
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    _listener = logging.handlers.QueueListener(records, output)
+    _listener.start()
+
+    handler = DeferredQueueHandler(records)
+    handler.addFilter(RequestIdFilter())
+    logger.addHandler(handler)
+    logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    logger.propagate = False
+    return logger
+
+
+@atexit.register
+def flush():
+    """Write out queued records (at exit, or before a process is torn down). Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """ASGI middleware: sets the request id for the request's logs and returns it as X-Request-ID."""
+
+    def __init__(self, app, header: str = "x-request-id"):
+        self.app = app
+        self.header = header.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        supplied = dict(scope.get("headers") or []).get(self.header, b"").decode("latin-1")
+        rid = supplied[:64] if supplied else uuid.uuid4().hex[:12]
+        token = request_id.set(rid)
+        start = time.perf_counter()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers") or []) +
+                           [(self.header, rid.encode("latin-1"))]}
+                get_logger("http").info(
+                    "%s %s -> %s", scope["method"], scope["path"], message["status"],
+                    extra=fields(status=message["status"], ms=round((time.perf_counter() - start) * 1000, 1)),
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
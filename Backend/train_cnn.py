@@ -0,0 +1,285 @@
+"""
+Reproducible retraining of the 38-class leaf CNN.
+
+    python train_cnn.py --train shards/train --val shards/valid --epochs 10 --version v4 --register
+    python train_cnn.py --train "<...>/train" --val "<...>/valid" --limit 200   # JPEG folders
+
+Input pipeline (tf.data):
+- shard directories from dataset_shards.py (preferred) are streamed as
+  zero-copy batch slices of the memory-mapped files; no decoding at all;
+- JPEG class folders are decoded and resized with num_parallel_calls,
+  then cached (in memory, or to --cache FILE) so that only the first
+  epoch pays for decoding;
+- augmentation (flips, brightness, contrast) runs on whole batches as
+  tensor ops, and batches are prefetched so the input never waits on the
+  model step.
+
+Pixels are scaled to 0-1 like cnn_model.to_model_input, so the exported
+model is a drop-in for the server. With --precision auto, bfloat16 mixed
+precision is used when the CPU has native bf16 (AVX512_BF16 / AMX); the
+classifier head and exported weights stay float32.
+
+Each run writes runs/<version>/: model.h5, saved_model/, model.tflite and
+train_report.json (images/sec per epoch and wall time until validation
+accuracy first reached --target-accuracy). --register adds the .h5 or
+.tflite to the model registry; activating it is left to the operator.
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+
+from class_index import CLASS_NAMES
+from cnn_model import IMG_SIZE, configure_runtime
+from dataset_shards import MANIFEST, ShardDataset, list_images
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RUNS = os.path.join(BASE_DIR, "runs")
+
+
+def cpu_has_bf16() -> bool:
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+# ===== 1. INPUT PIPELINE =====
+def shard_source(tf, root: str, batch_size: int, shuffle: bool, seed: int):
+    """Batches of (uint8 images, labels) read from mapped shards; reshuffled every epoch."""
+    shards = ShardDataset(root)
+    epochs = itertools.count()
+
+    def batches():
+        yield from shards.batches(batch_size, shuffle=shuffle, seed=seed + next(epochs))
+
+    signature = (tf.TensorSpec((None, IMG_SIZE, IMG_SIZE, 3), tf.uint8), tf.TensorSpec((None,), tf.uint8))
+    steps = sum(-(-len(labels) // batch_size) for labels in shards.labels)
+    ds = tf.data.Dataset.from_generator(batches, output_signature=signature)
+    return ds.apply(tf.data.experimental.assert_cardinality(steps)), len(shards)
+
+
+def jpeg_source(tf, data_dir: str, batch_size: int, shuffle: bool, seed: int, cache: str, limit: int = None):
+    items = list_images(data_dir, limit)
+    if not items:
+        raise SystemExit(f"❌ No class folders matching CLASS_NAMES under {data_dir}")
+    paths, labels = zip(*items)
+
+    def decode(path, label):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        image = tf.image.resize(image, (IMG_SIZE, IMG_SIZE), method="lanczos3", antialias=True)
+        return tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8), tf.cast(label, tf.uint8)
+
+    ds = tf.data.Dataset.from_tensor_slices((list(paths), list(labels)))
+    ds = ds.map(decode, num_parallel_calls=tf.data.AUTOTUNE, deterministic=False)
+    if cache != "none":
+        # Cached as decoded uint8, so epochs after the first skip the JPEG work entirely.
+        ds = ds.cache("" if cache == "memory" else cache)
+    if shuffle:
+        ds = ds.shuffle(min(len(items), 8192), seed=seed, reshuffle_each_iteration=True)
+    return ds.batch(batch_size), len(items)
+
+
+def augment_batch(tf):
+    def augment(images, labels):
+        x = tf.cast(images, tf.float32) / 255.0
+        n = tf.shape(x)[0]
+        x = tf.where(tf.random.uniform((n, 1, 1, 1)) < 0.5, tf.reverse(x, axis=[2]), x)
+        x = tf.where(tf.random.uniform((n, 1, 1, 1)) < 0.5, tf.reverse(x, axis=[1]), x)
+        mean = tf.reduce_mean(x, axis=[1, 2, 3], keepdims=True)
+        contrast = tf.random.uniform((n, 1, 1, 1), 0.8, 1.2)
+        brightness = tf.random.uniform((n, 1, 1, 1), -0.1, 0.1)
+        x = tf.clip_by_value((x - mean) * contrast + mean + brightness, 0.0, 1.0)
+        return x, tf.cast(labels, tf.int32)
+    return augment
+
+
+def scale_batch(tf):
+    def scale(images, labels):
+        return tf.cast(images, tf.float32) / 255.0, tf.cast(labels, tf.int32)
+    return scale
+
+
+def make_dataset(tf, source: str, args, training: bool):
+    if os.path.exists(os.path.join(source, MANIFEST)):
+        ds, count = shard_source(tf, source, args.batch_size, training, args.seed)
+    else:
+        ds, count = jpeg_source(tf, source, args.batch_size, training, args.seed,
+                                args.cache if training else "memory", args.limit)
+    ds = ds.map(augment_batch(tf) if training else scale_batch(tf), num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.prefetch(tf.data.AUTOTUNE), count
+
+
+# ===== 2. MODEL =====
+def build_model(tf):
+    """Conv/BN/pool blocks -> global pooling -> 38-way softmax over 0-1 pixels."""
+    layers = tf.keras.layers
+    inputs = tf.keras.Input((IMG_SIZE, IMG_SIZE, 3))
+    x = inputs
+    for filters in (32, 64, 128, 256):
+        x = layers.Conv2D(filters, 3, padding="same", use_bias=False)(x)
+        x = layers.BatchNormalization()(x)
+        x = layers.ReLU()(x)
+        x = layers.Conv2D(filters, 3, padding="same", use_bias=False)(x)
+        x = layers.BatchNormalization()(x)
+        x = layers.ReLU()(x)
+        x = layers.MaxPooling2D()(x)
+    x = layers.GlobalAveragePooling2D()(x)
+    x = layers.Dropout(0.3)(x)
+    x = layers.Dense(256, activation="relu")(x)
+    # Softmax in float32 even under mixed precision, for a stable loss and exported probabilities.
+    outputs = layers.Dense(len(CLASS_NAMES), activation="softmax", dtype="float32")(x)
+    return tf.keras.Model(inputs, outputs, name="plant_disease_cnn")
+
+
+def make_throughput_callback(tf, train_images: int, target: float):
+    class Throughput(tf.keras.callbacks.Callback):
+        """Per-epoch training images/sec (validation excluded) and time to target accuracy."""
+
+        def __init__(self):
+            super().__init__()
+            self.epochs, self.time_to_target, self.epoch_to_target = [], None, None
+
+        def on_train_begin(self, logs=None):
+            self.train_start = time.perf_counter()
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self.epoch_start = self.last_batch = time.perf_counter()
+
+        def on_train_batch_end(self, batch, logs=None):
+            self.last_batch = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            logs = logs or {}
+            seconds = self.last_batch - self.epoch_start
+            row = {"epoch": epoch + 1, "train_seconds": round(seconds, 1),
+                   "images_per_sec": round(train_images / seconds, 1),
+                   "elapsed": round(time.perf_counter() - self.train_start, 1),
+                   **{key: round(float(value), 4) for key, value in logs.items()}}
+            self.epochs.append(row)
+            if self.time_to_target is None and logs.get("val_accuracy", 0) >= target:
+                self.time_to_target, self.epoch_to_target = row["elapsed"], epoch + 1
+            print(f"   epoch {epoch + 1}: {row['images_per_sec']:.0f} img/s, "
+                  f"val_accuracy {logs.get('val_accuracy', float('nan')):.4f}")
+
+    return Throughput()
+
+
+# ===== 3. EXPORT =====
+def export(tf, model, out_dir: str) -> dict:
+    """model.h5 + saved_model/ + model.tflite, always from float32 weights."""
+    if model.dtype_policy.name != "float32":
+        tf.keras.mixed_precision.set_global_policy("float32")
+        float_model = build_model(tf)
+        float_model.set_weights(model.get_weights())  # mixed-precision variables are float32 already
+        model = float_model
+
+    paths = {"h5": os.path.join(out_dir, "model.h5"),
+             "saved_model": os.path.join(out_dir, "saved_model"),
+             "tflite": os.path.join(out_dir, "model.tflite")}
+    model.save(paths["h5"])
+    model.export(paths["saved_model"], verbose=False)
+    flatbuffer = tf.lite.TFLiteConverter.from_saved_model(paths["saved_model"]).convert()
+    with open(paths["tflite"], "wb") as f:
+        f.write(flatbuffer)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train", required=True, help="shard directory or JPEG class folders")
+    parser.add_argument("--val", required=True, help="shard directory or JPEG class folders")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--learning-rate", type=float, default=1e-3)
+    parser.add_argument("--init", default=None, help="fine-tune from an existing .h5 instead of a fresh model")
+    parser.add_argument("--precision", default="auto", choices=["auto", "float32", "mixed_bfloat16"])
+    parser.add_argument("--cache", default="memory", help="JPEG input only: memory | none | FILE")
+    parser.add_argument("--limit", type=int, default=None, help="JPEG input only: images per class")
+    parser.add_argument("--target-accuracy", type=float, default=0.95)
+    parser.add_argument("--stop-at-target", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--version", default=time.strftime("train-%Y%m%d-%H%M%S"))
+    parser.add_argument("--out", default=DEFAULT_RUNS)
+    parser.add_argument("--register", action="store_true", help="add the exported model to the registry as --version")
+    parser.add_argument("--register-format", default="h5", choices=["h5", "tflite"])
+    args = parser.parse_args()
+
+    configure_runtime()
+    import tensorflow as tf
+
+    tf.keras.utils.set_random_seed(args.seed)
+    precision = args.precision
+    if precision == "auto":
+        precision = "mixed_bfloat16" if cpu_has_bf16() else "float32"
+    if args.init and precision != "float32":
+        print(f"⚠️ --init keeps the saved model's float32 layers; {precision} not applied")
+        precision = "float32"
+    tf.keras.mixed_precision.set_global_policy(precision)
+
+    train_ds, train_images = make_dataset(tf, args.train, args, training=True)
+    val_ds, val_images = make_dataset(tf, args.val, args, training=False)
+    print(f"🌱 {train_images} training / {val_images} validation images, batch {args.batch_size}, {precision}")
+
+    model = tf.keras.models.load_model(args.init) if args.init else build_model(tf)
+    model.compile(optimizer=tf.keras.optimizers.Adam(args.learning_rate),
+                  loss="sparse_categorical_crossentropy", metrics=["accuracy"])
+
+    throughput = make_throughput_callback(tf, train_images, args.target_accuracy)
+    callbacks = [throughput]
+    if args.stop_at_target:
+        callbacks.append(tf.keras.callbacks.LambdaCallback(
+            on_epoch_end=lambda epoch, logs: setattr(model, "stop_training", throughput.time_to_target is not None)))
+    start = time.perf_counter()
+    model.fit(train_ds, validation_data=val_ds, epochs=args.epochs, callbacks=callbacks, shuffle=False, verbose=2)
+    wall = time.perf_counter() - start
+
+    out_dir = os.path.join(args.out, args.version)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = export(tf, model, out_dir)
+    steady = throughput.epochs[1:] or throughput.epochs  # epoch 1 includes tracing and cache fill
+    report = {
+        "version": args.version,
+        "train": os.path.abspath(args.train),
+        "val": os.path.abspath(args.val),
+        "train_images": train_images,
+        "val_images": val_images,
+        "batch_size": args.batch_size,
+        "precision": precision,
+        "init": args.init,
+        "seed": args.seed,
+        "wall_seconds": round(wall, 1),
+        "images_per_sec": round(float(np.median([e["images_per_sec"] for e in steady])), 1),
+        "target_accuracy": args.target_accuracy,
+        "seconds_to_target": throughput.time_to_target,
+        "epochs_to_target": throughput.epoch_to_target,
+        "final_val_accuracy": throughput.epochs[-1].get("val_accuracy"),
+        "epochs": throughput.epochs,
+        "exports": paths,
+    }
+    with open(os.path.join(out_dir, "train_report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+
+    reached = (f"{report['seconds_to_target']:.0f} s (epoch {report['epochs_to_target']})"
+               if report["seconds_to_target"] is not None else "not reached")
+    print(f"\n📈 {report['images_per_sec']:.0f} img/s steady-state, {wall:.0f} s total, "
+          f"val accuracy {report['final_val_accuracy']}")
+    print(f"   time to {args.target_accuracy:.0%} val accuracy: {reached}")
+    print(f"✅ Exported to {out_dir}")
+
+    if args.register:
+        from model_registry import DEFAULT_DIR, ModelRegistry
+
+        registry = ModelRegistry(os.environ.get("PRITHVI_MODEL_REGISTRY", DEFAULT_DIR))
+        registry.register(paths[args.register_format], args.version,
+                          notes=f"train_cnn.py, val accuracy {report['final_val_accuracy']}")
+        print(f"📦 Registered {args.version}; activate with: python model_registry.py activate {args.version}")
+
+
+if __name__ == "__main__":
+    main()
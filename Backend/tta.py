@@ -0,0 +1,43 @@
+"""
+Test-time augmentation for low-confidence CNN predictions.
+
+All views of one leaf are built as a single uint8 batch with NumPy (flips and
+rotations are strided views; crops use precomputed gather indices), so the
+model sees them in one forward pass and the softmax is averaged across views.
+"""
+import numpy as np
+
+from cnn_model import IMG_SIZE
+
+# 8 views = one inference-pool slot (max_batch) = one forward pass.
+DEFAULT_VIEWS = ("identity", "hflip", "vflip", "rot90", "rot180", "rot270", "crop80", "crop80_hflip")
+
+
+def _crop_index(scale: float, size: int = IMG_SIZE) -> np.ndarray:
+    """Nearest-neighbour source rows/cols for a centred crop resized back to `size`."""
+    margin = (1.0 - scale) * size / 2
+    return np.round(np.linspace(margin, size - 1 - margin, size)).astype(np.intp)
+
+
+_CROP80 = _crop_index(0.8)
+
+
+def build_tta_batch(image: np.ndarray, views=DEFAULT_VIEWS) -> np.ndarray:
+    """(H, W, 3) uint8 -> (len(views), H, W, 3) uint8 batch."""
+    crop = image[_CROP80[:, None], _CROP80[None, :]]
+    makers = {
+        "identity": lambda: image,
+        "hflip": lambda: image[:, ::-1],
+        "vflip": lambda: image[::-1, :],
+        "rot90": lambda: np.rot90(image, 1),
+        "rot180": lambda: image[::-1, ::-1],
+        "rot270": lambda: np.rot90(image, 3),
+        "crop80": lambda: crop,
+        "crop80_hflip": lambda: crop[:, ::-1],
+    }
+    return np.stack([makers[v]() for v in views])
+
+
+def predict_tta(model, image: np.ndarray, views=DEFAULT_VIEWS) -> np.ndarray:
+    """Average softmax over all augmented views of one image."""
+    return model.predict(build_tta_batch(image, views)).mean(axis=0)
@@ -386,8 +386,8 @@ const App: React.FC = () => {
             />
           )}
           {view === 'crops' && <CropsDashboard />}
-          {view === 'crop_advisor' && <CropAdvisorView />}
-          {view === 'farm_planner' && <FarmPlannerView />}
+          {view === 'crop_advisor' && <CropAdvisorView lang={lang} />}
+          {view === 'farm_planner' && <FarmPlannerView lang={lang} />}
           {view === 'crop_calendar' && <CropCalendar t={t} onBack={() => setView('dashboard')} />}
           {view === 'market' && <MarketView items={MOCK_MARKET_DATA} t={t} />}
           {view === 'profile' && <ProfileView />}
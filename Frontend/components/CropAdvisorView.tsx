@@ -2,6 +2,7 @@ import React, { useState } from 'react';
 import { BarChart, Bar, XAxis, Tooltip, ResponsiveContainer } from 'recharts';
 import { AlertTriangle, Sprout, Coins, Loader } from 'lucide-react';
 import { getSmartPlanBackend, SmartPlanResponse } from '../services/backendService';
+import { Language } from '../types';
 import { getSmartImage, preloadSmartImages } from '../utils/SmartImageMapper';
 
 const SOIL_TYPES = ['Black', 'Red', 'Alluvial', 'Clay', 'Loamy'];
@@ -29,7 +30,7 @@ const OptionCard: React.FC<OptionCardProps> = ({ label, selected, onClick }) =>
   </button>
 );
 
-export const CropAdvisorView: React.FC = () => {
+export const CropAdvisorView: React.FC<{ lang?: Language }> = ({ lang = Language.ENGLISH }) => {
   const [soilType, setSoilType] = useState('');
   const [landSize, setLandSize] = useState('');
   const [budget, setBudget] = useState('');
@@ -57,6 +58,7 @@ export const CropAdvisorView: React.FC = () => {
         water_source: waterSource,
         season,
         sowing_month: sowingMonth,
+        language: lang,
       });
       setPlan(result);
       
@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { Sprout, Droplets, Coins, ArrowRight, Loader, Package, Calendar, CheckCircle, AlertTriangle } from 'lucide-react';
 import { getExecutionPlanBackend, ExecutionPlanResponse } from '../services/backendService';
+import { Language } from '../types';
 import { getSmartImage, preloadSmartImages } from '../utils/SmartImageMapper';
 
 const POPULAR_CROPS = [
@@ -31,7 +32,7 @@ const OptionCard: React.FC<OptionCardProps> = ({ label, selected, onClick }) =>
   </button>
 );
 
-export const FarmPlannerView: React.FC = () => {
+export const FarmPlannerView: React.FC<{ lang?: Language }> = ({ lang = Language.ENGLISH }) => {
   const [step, setStep] = useState(1);
   
   // Step 1: Target
@@ -64,6 +65,7 @@ export const FarmPlannerView: React.FC = () => {
         soil_type: soilType,
         water_source: waterSource,
         sowing_date: sowingDate,
+        language: lang,
       });
       setPlan(result);
       
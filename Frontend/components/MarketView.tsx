@@ -125,6 +125,12 @@ export const MarketView: React.FC<Props> = ({ t }) => {
             <div className="w-2 h-2 rounded-full bg-white animate-pulse" />
             <span>Updated {marketData.last_updated}</span>
           </div>
+          {marketData.scope === 'state' && (
+            <p className="mt-1 text-xs text-white/80 font-semibold">
+              Showing state-wide prices for {marketData.region}
+              {selectedRegion.includes(',') && ` (no mandi data for ${selectedRegion.split(',')[0]})`}
+            </p>
+          )}
         </div>
       </div>
 
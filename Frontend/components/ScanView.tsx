@@ -2,7 +2,7 @@ import React, { useState } from 'react';
 import { AlertCircle, CheckCircle, Zap, Droplet, Shield, Upload, Loader, ChevronLeft } from 'lucide-react';
 import { StepCard } from './StepCard';
 import { TreatmentTimeline } from './TreatmentTimeline';
-import { API_ENDPOINTS } from '../services/api';
+import { API_ENDPOINTS, apiRequest } from '../services/api';
 
 interface DiagnosisData {
   diagnosis_name: string;
@@ -56,17 +56,11 @@ export const ScanView: React.FC<ScanViewProps> = ({ onBack }) => {
       const formData = new FormData();
       formData.append('file', imageFile);
 
-      const response = await fetch(API_ENDPOINTS.scanDisease, {
+      const data = await apiRequest<DiagnosisData>(API_ENDPOINTS.scanDisease, {
         method: 'POST',
         body: formData,
       });
 
-      if (!response.ok) {
-        throw new Error(`API Error: ${response.statusText}`);
-      }
-
-      const data: DiagnosisData = await response.json();
-
       if (data.error) {
         setError(data.error);
         setDiagnosis(null);
@@ -122,39 +122,77 @@ export const checkBackendHealth = async (): Promise<boolean> => {
 };
 
 /**
- * Helper function for API requests with timeout
+ * Idempotency-Key for one logical POST: send the same key on every retry so
+ * the backend runs the request once and replays its response.
+ */
+export const newIdempotencyKey = (): string =>
+  typeof crypto !== 'undefined' && 'randomUUID' in crypto
+    ? crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
+/**
+ * Error for a non-2xx response; keeps the status so callers can branch on it
+ */
+export class ApiError extends Error {
+  constructor(public status: number, statusText: string) {
+    super(`HTTP ${status}: ${statusText}`);
+    this.name = 'ApiError';
+  }
+}
+
+// 4xx is the client's fault and fails the same way on every retry
+// (including 422 for a reused key); 409 only means the first attempt is still running
+const isRetryable = (error: unknown): boolean =>
+  !(error instanceof ApiError) || error.status >= 500 || error.status === 409;
+
+/**
+ * Helper function for API requests with timeout and retries
+ * (POST retries reuse one Idempotency-Key)
  */
 export const apiRequest = async <T>(
   endpoint: string,
   options: RequestInit = {}
 ): Promise<T> => {
-  const controller = new AbortController();
-  const timeoutId = setTimeout(() => controller.abort(), API_CONFIG.timeout);
+  const headers = new Headers(options.headers);
+  if ((options.method || 'GET').toUpperCase() === 'POST' && !headers.has('Idempotency-Key')) {
+    headers.set('Idempotency-Key', newIdempotencyKey());
+  }
 
-  try {
-    const response = await fetch(endpoint, {
-      ...options,
-      signal: controller.signal
-    });
+  for (let attempt = 0; ; attempt++) {
+    const controller = new AbortController();
+    const timeoutId = setTimeout(() => controller.abort(), API_CONFIG.timeout);
 
-    clearTimeout(timeoutId);
+    try {
+      const response = await fetch(endpoint, {
+        ...options,
+        headers,
+        signal: controller.signal
+      });
 
-    if (!response.ok) {
-      throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-    }
+      clearTimeout(timeoutId);
 
-    return await response.json();
-  } catch (error) {
-    clearTimeout(timeoutId);
-    
-    if (error instanceof Error) {
-      if (error.name === 'AbortError') {
-        throw new Error(ERROR_MESSAGES.TIMEOUT);
+      if (!response.ok) {
+        throw new ApiError(response.status, response.statusText);
       }
-      throw error;
+
+      return await response.json();
+    } catch (error) {
+      clearTimeout(timeoutId);
+
+      if (attempt < API_CONFIG.retries && isRetryable(error)) {
+        await new Promise(resolve => setTimeout(resolve, API_CONFIG.retryDelay));
+        continue;
+      }
+
+      if (error instanceof Error) {
+        if (error.name === 'AbortError') {
+          throw new Error(ERROR_MESSAGES.TIMEOUT);
+        }
+        throw error;
+      }
+
+      throw new Error(ERROR_MESSAGES.NETWORK_ERROR);
     }
-    
-    throw new Error(ERROR_MESSAGES.NETWORK_ERROR);
   }
 };
 
@@ -169,5 +207,6 @@ export default {
   ERROR_MESSAGES,
   buildUrl,
   checkBackendHealth,
-  apiRequest
+  apiRequest,
+  ApiError
 };
@@ -1,5 +1,5 @@
 import { DiagnosisResult, VisualAdvice } from "../types";
-import { API_ENDPOINTS, BASE_URL } from "./api";
+import { API_ENDPOINTS, ApiError, BASE_URL, apiRequest } from "./api";
 
 /**
  * Analyzes a leaf image using Gemini 3 Vision (Primary) or Local .h5 Model (Fallback)
@@ -12,25 +12,17 @@ export const analyzeLeafImageBackend = async (
   try {
     const formData = new FormData();
     formData.append("file", imageFile);
+    formData.append("language", language);
 
     console.log("📤 Uploading image to backend...");
     console.log(`   File: ${imageFile.name} (${(imageFile.size / 1024).toFixed(2)} KB)`);
 
-    const response = await fetch(API_ENDPOINTS.scanDisease, {
+    // Retries (timeouts, 5xx, 409) reuse one Idempotency-Key, so the scan runs once
+    const data = await apiRequest<any>(API_ENDPOINTS.scanDisease, {
       method: "POST",
       body: formData
     });
 
-    if (!response.ok) {
-      if (response.status === 404) {
-        throw new Error("Backend endpoint not found. Is the server running on port 8000?");
-      }
-      throw new Error(`Backend returned ${response.status}: ${response.statusText}`);
-    }
-
-    // CRITICAL: Parse JSON response from backend
-    const data = await response.json();
-
     console.log("🔄 Backend Response Received");
     console.log(`   Method: ${data.method || 'unknown'}`);
     console.log(`   Source: ${data.source || 'unknown'}`);
@@ -107,7 +99,8 @@ export const analyzeLeafImageBackend = async (
       : data.physical_actions_checklist || [];
 
     // Create visual advice from backend response
-    const visualAdvice: VisualAdvice = {
+    // (pre-translated class advice when the scan was in Hindi/Tamil)
+    const visualAdvice: VisualAdvice = data.advice ?? {
       title: diseaseName,
       medicine_name: data.chemical_prescription?.specific_active_ingredients?.[0] || "Consult local agricultural expert",
       treatment: diseaseName,
@@ -149,13 +142,13 @@ export const analyzeLeafImageBackend = async (
         "✓ Verify no firewall blocking port 8000",
         "✓ Try restarting both frontend and backend"
       ];
-    } else if (error.message.includes('404')) {
+    } else if (error instanceof ApiError && error.status === 404) {
       errorMessage = "Backend endpoint not found";
       treatmentSteps = [
         "✓ Check the /predict endpoint exists in backend/main.py",
         "✓ Restart the backend server"
       ];
-    } else if (error.message.includes('timeout')) {
+    } else if (/timed? ?out/i.test(error.message)) {
       errorMessage = "Analysis timeout - backend took too long";
       treatmentSteps = [
         "✓ The server may be processing another request",
@@ -188,6 +181,7 @@ export interface CropAdvisoryRequest {
   soil: string;
   season: string;
   location?: string;
+  language?: string;
 }
 
 export interface CropRecommendation {
@@ -214,7 +208,7 @@ export const getCropAdvisoryBackend = async (
   request: CropAdvisoryRequest
 ): Promise<CropAdvisoryResponse> => {
   try {
-    const response = await fetch(`${BASE_URL}/advise-crop`, {
+    return await apiRequest<CropAdvisoryResponse>(`${BASE_URL}/advise-crop`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -222,17 +216,10 @@ export const getCropAdvisoryBackend = async (
       body: JSON.stringify({
         soil: request.soil,
         season: request.season,
-        location: request.location || "India"
+        location: request.location || "India",
+        language: request.language || "en"
       }),
     });
-
-    if (!response.ok) {
-      throw new Error(`Backend returned ${response.status}: ${response.statusText}`);
-    }
-
-    const data = await response.json();
-    return data as CropAdvisoryResponse;
-
   } catch (error) {
     console.error("❌ Crop Advisory Backend Error:", error);
     
@@ -291,7 +278,7 @@ export const getFarmPlanBackend = async (
   request: FarmPlanRequest
 ): Promise<FarmPlanResponse> => {
   try {
-    const response = await fetch(`${BASE_URL}/farm-plan`, {
+    return await apiRequest<FarmPlanResponse>(`${BASE_URL}/farm-plan`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -303,13 +290,6 @@ export const getFarmPlanBackend = async (
         landSize: request.landSize,
       }),
     });
-
-    if (!response.ok) {
-      throw new Error(`Backend returned ${response.status}: ${response.statusText}`);
-    }
-
-    const data = await response.json();
-    return data as FarmPlanResponse;
   } catch (error) {
     console.error("❌ Farm Plan Backend Error:", error);
 
@@ -362,6 +342,7 @@ export interface SmartPlanRequest {
   water_source: string;
   season: string;
   sowing_month?: string;
+  language?: string;
 }
 
 export interface SmartPlanResponse {
@@ -382,19 +363,13 @@ export const getSmartPlanBackend = async (
   request: SmartPlanRequest
 ): Promise<SmartPlanResponse> => {
   try {
-    const response = await fetch(`${BASE_URL}/generate-smart-plan`, {
+    return await apiRequest<SmartPlanResponse>(`${BASE_URL}/generate-smart-plan`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
       },
       body: JSON.stringify(request),
     });
-
-    if (!response.ok) {
-      throw new Error(`Backend returned ${response.status}: ${response.statusText}`);
-    }
-
-    return response.json();
   } catch (error) {
     console.error("❌ Smart Plan Backend Error:", error);
     return {
@@ -462,6 +437,9 @@ export interface MarketCrop {
 
 export interface MarketTrendsResponse {
   region: string;
+  // 'state' when no mandi matched the requested district, so `region` is its state
+  scope?: 'district' | 'state';
+  requested_region?: string;
   market_status: 'Bullish' | 'Bearish' | 'Neutral';
   analyst_note: string;
   last_updated: string;
@@ -472,19 +450,13 @@ export const getMarketTrendsBackend = async (
   region: string
 ): Promise<MarketTrendsResponse> => {
   try {
-    const response = await fetch(`${BASE_URL}/get-market-trends`, {
+    return await apiRequest<MarketTrendsResponse>(`${BASE_URL}/get-market-trends`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
       },
       body: JSON.stringify({ region }),
     });
-
-    if (!response.ok) {
-      throw new Error(`Backend returned ${response.status}`);
-    }
-
-    return response.json();
   } catch (error) {
     console.error("❌ Market Trends Backend Error:", error);
     
@@ -529,6 +501,7 @@ export interface ExecutionPlanRequest {
   soil_type: string;
   water_source: string;
   sowing_date: string;
+  language?: string;
 }
 
 export interface ExecutionPlanResponse {
@@ -554,19 +527,13 @@ export const getExecutionPlanBackend = async (
   request: ExecutionPlanRequest
 ): Promise<ExecutionPlanResponse> => {
   try {
-    const response = await fetch(`${BASE_URL}/generate-execution-plan`, {
+    return await apiRequest<ExecutionPlanResponse>(`${BASE_URL}/generate-execution-plan`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
       },
       body: JSON.stringify(request),
     });
-
-    if (!response.ok) {
-      throw new Error(`Backend returned ${response.status}: ${response.statusText}`);
-    }
-
-    return response.json();
   } catch (error) {
     console.error("❌ Execution Plan Backend Error:", error);
     